@@ -0,0 +1,54 @@
+"""
+Compare the LongTermMemory index strategies against exact flat search.
+
+Reports build time, mean query latency and recall@k vs flat on synthetic,
+clustered unit vectors shaped like all-MiniLM-L6-v2 embeddings, with the
+inner-product metric LongTermMemory uses (cosine on normalized vectors).
+
+    python -m benchmarks.bench_memory_index --n 200000 --queries 1000 --k 10
+"""
+import argparse
+import time
+import faiss
+import numpy as np
+from core.memory.index_factory import INDEX_TYPES, build_index, recall_at_k
+
+
+def make_vectors(n: int, dimension: int, clusters: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.5 * rng.normal(size=(n, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000, help="number of stored vectors")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    args = parser.parse_args()
+
+    data = make_vectors(args.n + args.queries, args.dimension, args.clusters)
+    vectors, queries = data[:args.n], data[args.n:]
+
+    exact_ids = None
+    print(f"{'index':<8}{'build s':>10}{'query ms':>10}{'recall@' + str(args.k):>12}")
+    for kind in INDEX_TYPES:
+        started = time.perf_counter()
+        index = build_index(kind, args.dimension, vectors, metric=faiss.METRIC_INNER_PRODUCT)
+        build_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        _, ids = index.search(queries, args.k)
+        query_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+        if exact_ids is None:
+            exact_ids = ids  # "flat" runs first and is the ground truth
+        print(f"{kind:<8}{build_s:>10.2f}{query_ms:>10.3f}{recall_at_k(exact_ids, ids):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
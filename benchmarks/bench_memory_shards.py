@@ -0,0 +1,86 @@
+"""
+Load test for per-user long-term memory shards.
+
+Writes `--users` synthetic stores of `--memories` entries each, then opens
+and searches every one through MemoryShards (at most `--max-open` open at
+a time) and reports resident memory. Run once with and once without
+--no-mmap to compare memory-mapped and fully loaded snapshots.
+
+    python -m benchmarks.bench_memory_shards --users 500 --memories 5000 --max-open 64
+"""
+from pathlib import Path
+import argparse
+import resource
+import tempfile
+import time
+import faiss
+from benchmarks.bench_memory_index import make_vectors
+from core.memory.index_factory import build_index
+from core.memory.longterm_memory import user_memory_dir
+from core.memory.memory_log import MemoryLog
+from core.memory.shards import MemoryShards
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB (Linux), else the peak reported by getrusage."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_stores(root: Path, users: int, memories: int, dimension: int):
+    for u in range(users):
+        base_dir = user_memory_dir(f"user{u}", root)
+        base_dir.mkdir(parents=True, exist_ok=True)
+        log = MemoryLog(base_dir, dimension, fsync=False)
+        if log.manifest_path.exists():
+            continue
+        vectors = make_vectors(memories, dimension, clusters=20, seed=u)
+        log.append(vectors, [f"user{u} memory {i}" for i in range(memories)])
+        log.snapshot(build_index("flat", dimension, vectors, metric=faiss.METRIC_INNER_PRODUCT))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--memories", type=int, default=2000, help="entries per user")
+    parser.add_argument("--max-open", type=int, default=32)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--root", help="data dir to reuse between runs (default: a temporary one)")
+    parser.add_argument("--no-mmap", action="store_true", help="load snapshots fully into RAM")
+    args = parser.parse_args()
+
+    root = Path(args.root or tempfile.mkdtemp(prefix="nexcai-shards-"))
+    started = time.perf_counter()
+    write_stores(root, args.users, args.memories, args.dimension)
+    print(f"{args.users} stores x {args.memories} memories in {root} ({time.perf_counter() - started:.1f}s)")
+
+    shards = MemoryShards(root, max_open=args.max_open, mmap=not args.no_mmap)
+    shards.get("warmup")  # load the shared encoder before measuring
+    baseline = rss_mb()
+    query = make_vectors(1, args.dimension, clusters=1, seed=args.users)
+
+    peak = baseline
+    started = time.perf_counter()
+    for u in range(args.users):
+        shards.get(f"user{u}").index.search(query, 3)
+        peak = max(peak, rss_mb())
+    elapsed = time.perf_counter() - started
+
+    store_mb = args.memories * args.dimension * 4 / 2**20
+    print(f"mode            {'in-RAM' if args.no_mmap else 'mmap'}")
+    print(f"open / evicted  {shards.stats()['open']} / {shards.stats()['evicted']}")
+    print(f"open + search   {elapsed * 1000 / args.users:.2f} ms per user")
+    print(f"RSS baseline    {baseline:.1f} MB")
+    print(f"RSS peak        {peak:.1f} MB (+{peak - baseline:.1f} MB; one store's vectors: {store_mb:.1f} MB)")
+    shards.close()
+    print(f"RSS after close {rss_mb():.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Summary time of the old dict-walking preprocessing vs the columnar
+WeatherFrame, on recorded Open-Meteo payloads.
+
+The legacy path looks every field up per day and converts hourly lists
+slice by slice; the frame converts each series once and aggregates
+windows with NumPy. Each window is measured on the payload the agent
+fetches for it (plan_forecast_request): two days for today/tomorrow,
+all sixteen only when the question covers them. For two-day windows
+the frame stays a few tens of microseconds behind the legacy walk
+(building the arrays costs more than the lookups it saves), which is
+noise next to parsing the response and the LLM call; from a week on it
+is ahead.
+
+    python -m benchmarks.bench_weather_frame --repeat 500
+"""
+import argparse
+import time
+import numpy as np
+from core.agents.weather.agent import SUMMARY_DAILY_FIELDS, SUMMARY_HOURLY_FIELDS, WeatherAgent
+from core.agents.weather.frame import WeatherFrame
+from benchmarks.bench_weather_payload import load_fixture, planned_payload
+
+
+def legacy_summary(weather_data: dict, start_day: int, days: int) -> dict:
+    """The per-field, per-day dictionary walk the agent used before WeatherFrame."""
+    daily = weather_data.get("daily", {})
+    hourly = weather_data.get("hourly", {})
+    rows = []
+    for i in range(start_day, min(start_day + days, len(daily.get("time", [])))):
+        rows.append({
+            "date": daily["time"][i],
+            "t_min": daily.get("temperature_2m_min", [None])[i],
+            "t_max": daily.get("temperature_2m_max", [None])[i],
+            "precip_mm": daily.get("precipitation_sum", [None])[i],
+            "precip_prob": daily.get("precipitation_probability_max", [None])[i],
+            "sunshine_hours": round((daily.get("sunshine_duration", [0])[i] or 0) / 3600, 1),
+            "weathercode": daily.get("weathercode", [None])[i],
+            "avg_temp": float(np.nanmean(np.array(hourly["temperature_2m"][i * 24:(i + 1) * 24], dtype=float))),
+            "avg_clouds": float(np.nanmean(np.array(hourly["cloud_cover"][i * 24:(i + 1) * 24], dtype=float))),
+        })
+    return {"days": rows}
+
+
+def frame_summary(weather_data: dict, start_day: int, days: int) -> dict:
+    frame = WeatherFrame(weather_data)
+    rows = frame.summarize_days(start_day, days)
+    temps = frame.hourly_by_day("temperature_2m")
+    clouds = frame.hourly_by_day("cloud_cover")
+    for i, row in enumerate(rows, start=start_day):
+        row["avg_temp"] = float(temps[i])
+        row["avg_clouds"] = float(clouds[i])
+    return {"days": rows}
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    recorded = load_fixture()
+
+    cases = {
+        "today+tomorrow": (0, 2),
+        "weekend": (5, 2),
+        "next 7 days": (0, 7),
+        "full 16 days": (0, 16),
+    }
+    print(f"{'window':<16}{'fetched':>8}{'legacy ms':>12}{'frame ms':>12}{'reused ms':>12}")
+    for name, (start_day, days) in cases.items():
+        fetched = max(2, start_day + days)  # as plan_forecast_request asks for
+        payload = planned_payload(recorded, fetched, SUMMARY_HOURLY_FIELDS, SUMMARY_DAILY_FIELDS)
+        frame = WeatherFrame(payload)
+        legacy_ms = timed(lambda: legacy_summary(payload, start_day, days), args.repeat)
+        frame_ms = timed(lambda: frame_summary(payload, start_day, days), args.repeat)
+        # aggregations only, on an already-built frame
+        reused_ms = timed(lambda: (frame.summarize_days(start_day, days),
+                                   frame.hourly_by_day("temperature_2m")), args.repeat)
+        print(f"{name:<16}{fetched:>7}d{legacy_ms:>12.3f}{frame_ms:>12.3f}{reused_ms:>12.3f}")
+
+    payload = planned_payload(recorded, 7, SUMMARY_HOURLY_FIELDS, SUMMARY_DAILY_FIELDS)
+    agent_ms = timed(lambda: WeatherAgent.preprocess_weather_data(payload, (0, 7)), args.repeat)
+    print(f"\npreprocess_weather_data (next 7 days): {agent_ms:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
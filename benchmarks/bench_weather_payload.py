@@ -0,0 +1,91 @@
+"""
+Payload size and parse time of the full Open-Meteo request vs the fields and
+horizon that WeatherAgent actually plans for a query.
+
+Measured on a recorded 16-day Open-Meteo response for Munich
+(fixtures/open_meteo_munich_16d.json, every field of the full request).
+A planned request is the same response cut to its days and fields, which
+is what the API returns for it, so no network access is needed.
+`--record` replaces the fixture with a live response.
+
+    python -m benchmarks.bench_weather_payload --repeat 200
+    python -m benchmarks.bench_weather_payload --record 48.14 11.58
+"""
+from pathlib import Path
+import argparse
+import json
+import time
+import requests
+from core.agents.weather.agent import WeatherAgent, plan_forecast_request
+from core.agents.weather.fetcher import API_URL, DAILY_FIELDS, HOURLY_FIELDS, WeatherClient
+
+FIXTURE = Path(__file__).resolve().parent / "fixtures" / "open_meteo_munich_16d.json"
+
+
+def load_fixture(path=FIXTURE) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def planned_payload(recorded: dict, forecast_days: int, hourly_fields, daily_fields) -> dict:
+    """The recorded response as the API answers a request for fewer days and fields."""
+    payload = {k: v for k, v in recorded.items() if k not in ("hourly", "hourly_units", "daily", "daily_units")}
+    for block, fields, per_day in (("hourly", hourly_fields, 24), ("daily", daily_fields, 1)):
+        keep = ("time",) + tuple(fields)
+        payload[f"{block}_units"] = {f: u for f, u in recorded[f"{block}_units"].items() if f in keep}
+        payload[block] = {f: recorded[block][f][:forecast_days * per_day] for f in keep}
+    return payload
+
+
+def record(lat: float, lon: float, path=FIXTURE):
+    """Save a live response to the full request as the fixture."""
+    params = WeatherClient._params(lat, lon, 16, HOURLY_FIELDS, DAILY_FIELDS)
+    response = requests.get(API_URL, params=params, timeout=(3.05, 10))
+    response.raise_for_status()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(response.json(), f, ensure_ascii=False, separators=(",", ":"))
+    print(f"Recorded {len(response.content)} bytes to {path}")
+
+
+def measure(raw: bytes, repeat: int):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        data = json.loads(raw)
+    parse_ms = (time.perf_counter() - started) * 1000 / repeat
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        WeatherAgent.preprocess_weather_data(data)
+    summary_ms = (time.perf_counter() - started) * 1000 / repeat
+    return parse_ms, summary_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--query", default="Will it rain tomorrow in Munich?")
+    parser.add_argument("--record", nargs=2, type=float, metavar=("LAT", "LON"))
+    args = parser.parse_args()
+
+    if args.record:
+        record(*args.record)
+        return
+
+    recorded = load_fixture()
+    plan = plan_forecast_request(args.query)
+    cases = {
+        "full (16d)": recorded,
+        f"planned ({plan['forecast_days']}d)": planned_payload(recorded, plan["forecast_days"],
+                                                               plan["hourly"], plan["daily"]),
+    }
+
+    print(f"query: {args.query!r}")
+    print(f"{'request':<16}{'bytes':>10}{'parse ms':>10}{'summary ms':>12}")
+    for name, payload in cases.items():
+        raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        parse_ms, summary_ms = measure(raw, args.repeat)
+        print(f"{name:<16}{len(raw):>10}{parse_ms:>10.3f}{summary_ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,159 @@
 import json
 import os
-import re
 from datetime import datetime, timedelta
+from functools import partial
 import pytz
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
-from core.utils.llm_interface import LLMInterface
+from core.utils.prompts import PromptTemplate
+from core.utils.shared import get_llm
 from core.utils.credentials import load_token, save_token
 from core.memory.conversation_memory import ConversationMemory
+from .date_ranges import parse_calendar_query
+from .event_store import EventStore, iter_pages
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
 TZ = pytz.timezone("Europe/Berlin")
+BATCH_LIMIT = 50  # requests per batch call accepted by the Calendar API
+LIST_PAGE_SIZE = 50
+LIST_LIMIT = 25  # events shown before "more not shown"
+LIST_FIELDS = "nextPageToken,items(id,summary,start)"
+
+ACTIONS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "actions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "intent": {"type": "string", "enum": ["create", "list", "delete"]},
+                    "event": {
+                        "type": "object",
+                        "properties": {
+                            "summary": {"type": "string"},
+                            "start_time": {"type": "string"},
+                            "end_time": {"type": "string"},
+                            "description": {"type": ["string", "null"]},
+                            "location": {"type": ["string", "null"]},
+                        },
+                        "required": ["summary", "start_time", "end_time"],
+                    },
+                    "start_time": {"type": ["string", "null"]},
+                    "end_time": {"type": ["string", "null"]},
+                    "days": {"type": ["integer", "null"]},
+                    "summary": {"type": "string"},
+                },
+                "required": ["intent"],
+            },
+        },
+    },
+    "required": ["actions"],
+}
+
+INTERPRET_PROMPT = PromptTemplate(
+    "calendar",
+    system="""
+    You are NEXCAI — a precise AI assistant that controls the user's Google Calendar.
+
+    Goals:
+    - Detect intent: "create" | "list" | "delete".
+    - For "create": resolve all relative times to ISO 8601 in Europe/Berlin.
+    - For "list": if the user mentions a specific period like "tomorrow", "today",
+      "this week", "next week", "on Monday", etc., return explicit ISO 8601
+      "start_time" and "end_time" covering that whole period
+      (e.g., "tomorrow" => 00:00 to 23:59:59 of tomorrow in Europe/Berlin).
+      If the user says only "next N days", you may return "days": N instead.
+    - For "delete": return a partial "summary" to match events by title.
+
+    Respond ONLY with valid JSON:
+    {
+      "actions": [
+        {
+          "intent": "create",
+          "event": {
+            "summary": "Title",
+            "start_time": "YYYY-MM-DDTHH:MM:SS±HH:MM",
+            "end_time":   "YYYY-MM-DDTHH:MM:SS±HH:MM",
+            "description": "optional",
+            "location": "optional"
+          }
+        },
+        {
+          "intent": "list",
+          "start_time": "YYYY-MM-DDTHH:MM:SS±HH:MM",
+          "end_time":   "YYYY-MM-DDTHH:MM:SS±HH:MM",
+          "days": null
+        },
+        {
+          "intent": "delete",
+          "summary": "partial title"
+        }
+      ]
+    }
+
+    Examples:
+    - "Show me tomorrow" →
+      { "actions": [{ "intent": "list",
+        "start_time": "<tomorrow 00:00 ISO>",
+        "end_time": "<tomorrow 23:59:59 ISO>",
+        "days": null
+      }] }
+
+    - "Show next 3 days" →
+      { "actions": [{ "intent": "list", "start_time": "", "end_time": "", "days": 3 }] }
+
+    IMPORTANT: Respond only with JSON. No explanations or extra text.
+    """,
+    user="""
+    Current local time: {now} (Europe/Berlin)
+    User message: "{query}"
+    """,
+)
 
 
 class CalendarAgent:
-    def __init__(self):
-        """Initialize the agent and connect to Google Calendar."""
-        self.llm = LLMInterface(model="llama3:8b")
-        self.service = self._connect()
-        self.memory = ConversationMemory(max_length=8)
+    def __init__(self, llm=None, service=None, store: EventStore = None):
+        """
+        Initialize the agent; Google Calendar is connected on first use.
+        `service` (a Calendar v3 service) and `store` skip the OAuth login
+        and the default local copy.
+        """
+        self.llm = llm if llm is not None else get_llm("llama3:8b")
+        self._service = service
+        self._store = store
+        self.memory = ConversationMemory(max_length=8, max_tokens=800)
+
+    @property
+    def service(self):
+        # OAuth and the discovery request only happen once the calendar is actually needed
+        if self._service is None:
+            self._service = self._connect()
+        return self._service
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = EventStore(tz=TZ)
+        return self._store
+
+    def close(self):
+        """Close the local calendar copy (AgentRegistry.close calls this on shutdown)."""
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+        self.memory.close()
+
+    def _sync(self) -> bool:
+        """Fetch calendar changes since the last sync. Returns False if that failed."""
+        try:
+            self.store.sync(self.service)
+            return True
+        except Exception as e:
+            print("Calendar sync failed:", e)
+            return False
 
     # ---------------------------------------------------------------
     # Connect to Google Calendar (WSL compatible)
@@ -54,80 +188,19 @@ class CalendarAgent:
     def interpret_query(self, query: str):
         now = datetime.now(TZ)
         today_str = now.strftime("%A, %B %d, %Y %H:%M %Z")
-        tz_name = "Europe/Berlin"
-
-        prompt = f"""
-        You are NEXCAI — a precise AI assistant that controls the user's Google Calendar.
-
-        Current local time: {today_str} ({tz_name})
-        User message: "{query}"
-
-        Goals:
-        - Detect intent: "create" | "list" | "delete".
-        - For "create": resolve all relative times to ISO 8601 in {tz_name}.
-        - For "list": if the user mentions a specific period like "tomorrow", "today",
-          "this week", "next week", "on Monday", etc., return explicit ISO 8601
-          "start_time" and "end_time" covering that whole period
-          (e.g., "tomorrow" => 00:00 to 23:59:59 of tomorrow in {tz_name}).
-          If the user says only "next N days", you may return "days": N instead.
-        - For "delete": return a partial "summary" to match events by title.
-
-        Respond ONLY with valid JSON:
-        {{
-          "actions": [
-            {{
-              "intent": "create",
-              "event": {{
-                "summary": "Title",
-                "start_time": "YYYY-MM-DDTHH:MM:SS±HH:MM",
-                "end_time":   "YYYY-MM-DDTHH:MM:SS±HH:MM",
-                "description": "optional",
-                "location": "optional"
-              }}
-            }},
-            {{
-              "intent": "list",
-              "start_time": "YYYY-MM-DDTHH:MM:SS±HH:MM",
-              "end_time":   "YYYY-MM-DDTHH:MM:SS±HH:MM",
-              "days": null
-            }},
-            {{
-              "intent": "delete",
-              "summary": "partial title"
-            }}
-          ]
-        }}
-
-        Examples:
-        - "Show me tomorrow" →
-          {{ "actions": [{{ "intent": "list",
-            "start_time": "<tomorrow 00:00 ISO>",
-            "end_time": "<tomorrow 23:59:59 ISO>",
-            "days": null
-          }}] }}
-
-        - "Show next 3 days" →
-          {{ "actions": [{{ "intent": "list", "start_time": "", "end_time": "", "days": 3 }}] }}
-
-        IMPORTANT: Respond only with JSON. No explanations or extra text.
-        """
-
-        response = self.llm.chat(prompt)
 
-        try:
-            # Extract only the first {...} JSON block
-            json_str = re.search(r"\{[\s\S]*\}", response).group(0)
-            parsed = json.loads(json_str)
-            return parsed.get("actions", [])
-        except Exception as e:
-            print("LLM returned invalid JSON. Raw output below:\n", response)
-            print("Error:", e)
-            return []
+        messages = INTERPRET_PROMPT.messages(now=today_str, query=query)
+        parsed = self.llm.chat_json(messages, schema=ACTIONS_SCHEMA, max_tokens=400, label=INTERPRET_PROMPT.name)
+        return parsed["actions"] if parsed else []
 
     # ---------------------------------------------------------------
     # Create event
     # ---------------------------------------------------------------
     def create_event(self, summary, start_time, end_time, description=None, location=None):
+        request = self._insert_request(summary, start_time, end_time, description, location)
+        return self._report_create(summary, self._execute_batch([request]))
+
+    def _insert_request(self, summary, start_time, end_time, description=None, location=None):
         event = {
             "summary": summary,
             "location": location,
@@ -135,14 +208,19 @@ class CalendarAgent:
             "start": {"dateTime": start_time, "timeZone": "Europe/Berlin"},
             "end": {"dateTime": end_time, "timeZone": "Europe/Berlin"},
         }
+        return self.service.events().insert(calendarId="primary", body=event)
 
-        result = self.service.events().insert(calendarId="primary", body=event).execute()
-        return f"Event '{result['summary']}' created! {result['htmlLink']}"
+    def _report_create(self, summary, results):
+        response, error = results[0]
+        if error is not None:
+            return f"Could not create '{summary}': {self._error_text(error)}"
+        self.store.put(response)
+        return f"Event '{response['summary']}' created! {response['htmlLink']}"
 
     # ---------------------------------------------------------------
     # List events (supports either explicit time range or N days)
     # ---------------------------------------------------------------
-    def list_events(self, start_time=None, end_time=None, days=None):
+    def list_events(self, start_time=None, end_time=None, days=None, limit: int = LIST_LIMIT):
         now = datetime.now(TZ)
 
         if start_time and end_time:
@@ -154,110 +232,199 @@ class CalendarAgent:
             start_time = now.isoformat()
             end_time = (now + timedelta(days=days)).isoformat()
 
-        events = (
-            self.service.events()
-            .list(
-                calendarId="primary",
-                timeMin=start_time,
-                timeMax=end_time,
-                singleEvents=True,
-                orderBy="startTime",
-            )
-            .execute()
-            .get("items", [])
-        )
-
-        if not events:
-            return "No upcoming events found."
+        # one event past the limit tells us whether there are more
+        if self._sync():
+            events = self.store.between(start_time, end_time, limit=limit + 1)
+        else:
+            events = self.iter_events(start_time, end_time, limit=limit + 1)
 
         formatted = []
         for e in events:
-            # Get the ISO string (dateTime or all-day date)
-            dt_str = e["start"].get("dateTime", e["start"].get("date"))
+            if len(formatted) == limit:
+                formatted.append("• … more events not shown")
+                break
+            formatted.append(self._format_event(e))
 
-            # Convert to datetime and extract local time if possible
-            try:
-                event_time = datetime.fromisoformat(dt_str).astimezone(TZ)
-                time_str = event_time.strftime("%H:%M")
-            except Exception:
-                # Fallback (for all-day events without a specific time)
-                time_str = "All day"
+        if not formatted:
+            return "No upcoming events found."
+        return "Upcoming events:\n" + "\n".join(formatted)
 
-            formatted.append(f"• {e['summary']} — {time_str}")
+    def iter_events(self, start_time, end_time, page_size: int = LIST_PAGE_SIZE, limit: int = None):
+        """
+        Stream events in a time range straight from the API, page by page.
+        Only id/summary/start are requested, and no further pages are
+        fetched once `limit` events have been yielded.
+        """
+        pages = iter_pages(
+            self.service,
+            calendarId="primary",
+            timeMin=start_time,
+            timeMax=end_time,
+            singleEvents=True,
+            orderBy="startTime",
+            maxResults=page_size,
+            fields=LIST_FIELDS,
+        )
+        count = 0
+        for page in pages:
+            for e in page.get("items", []):
+                yield e
+                count += 1
+                if limit and count >= limit:
+                    return
+
+    @staticmethod
+    def _format_event(e) -> str:
+        # Get the ISO string (dateTime or all-day date)
+        dt_str = e["start"].get("dateTime", e["start"].get("date"))
+
+        # Convert to datetime and extract local time if possible
+        try:
+            event_time = datetime.fromisoformat(dt_str).astimezone(TZ)
+            time_str = event_time.strftime("%H:%M")
+        except Exception:
+            # Fallback (for all-day events without a specific time)
+            time_str = "All day"
 
-        return "Upcoming events:\n" + "\n".join(formatted)
+        return f"• {e.get('summary', '(no title)')} — {time_str}"
 
     # ---------------------------------------------------------------
     # Delete event (cancel)
     # ---------------------------------------------------------------
     def delete_event(self, summary_part):
         """Find events matching title substring and delete them."""
-        now = datetime.utcnow().isoformat() + "Z"
-        events = (
-            self.service.events()
-            .list(calendarId="primary", timeMin=now, maxResults=20, singleEvents=True, orderBy="startTime")
-            .execute()
-            .get("items", [])
-        )
-
-        matches = [e for e in events if summary_part.lower() in e["summary"].lower()]
-
+        matches = self._delete_candidates(summary_part)
         if not matches:
             return f"No event found matching '{summary_part}'."
+        results = self._execute_batch([self._delete_request(e) for e in matches])
+        return self._report_delete(matches, results)
+
+    def _delete_candidates(self, summary_part):
+        self._sync()
+        events = self.store.upcoming(limit=20)
+        return [e for e in events if summary_part.lower() in e.get("summary", "").lower()]
+
+    def _delete_request(self, event):
+        return self.service.events().delete(calendarId="primary", eventId=event["id"])
+
+    def _report_delete(self, matches, results):
+        deleted, failed = [], []
+        for e, (_, error) in zip(matches, results):
+            # 404/410: already gone on Google's side, which is what the user wanted
+            if error is None or self._status(error) in (404, 410):
+                self.store.remove(e["id"])
+                deleted.append(e.get("summary", "(no title)"))
+            else:
+                failed.append(f"{e.get('summary', '(no title)')} ({self._error_text(error)})")
+
+        lines = []
+        if deleted:
+            lines.append(f"Deleted events: {', '.join(deleted)}")
+        if failed:
+            lines.append(f"Could not delete: {', '.join(failed)}")
+        return "\n".join(lines)
 
-        deleted = []
-        for e in matches:
-            self.service.events().delete(calendarId="primary", eventId=e["id"]).execute()
-            deleted.append(e["summary"])
-
-        return f"Deleted events: {', '.join(deleted)}"
+    # ---------------------------------------------------------------
+    # Batch execution
+    # ---------------------------------------------------------------
+    def _execute_batch(self, requests):
+        """
+        Execute API requests in as few round-trips as possible.
+        Returns a (response, error) pair per request, in order; a failing
+        request does not stop the others.
+        """
+        results = [(None, None)] * len(requests)
+        if len(requests) == 1:
+            try:
+                results[0] = (requests[0].execute(), None)
+            except HttpError as e:
+                results[0] = (None, e)
+            return results
+
+        def callback(request_id, response, exception):
+            results[int(request_id)] = (response, exception)
+
+        for start in range(0, len(requests), BATCH_LIMIT):
+            batch = self.service.new_batch_http_request(callback=callback)
+            for i, request in enumerate(requests[start:start + BATCH_LIMIT], start=start):
+                batch.add(request, request_id=str(i))
+            batch.execute()
+        return results
+
+    @staticmethod
+    def _status(error):
+        resp = getattr(error, "resp", None)
+        return getattr(resp, "status", None)
+
+    @staticmethod
+    def _error_text(error):
+        return getattr(error, "reason", None) or str(error)
 
     # ---------------------------------------------------------------
     # Run the query
     # ---------------------------------------------------------------
     def run(self, query: str):
         self.memory.add("user", query)
-        context = self.memory.get_context()
-        contextual_query = f"""
-            Previous conversation:
-            {context}
 
-            Current user message: "{query}"
+        # Plain reads and deletes ("what's on tomorrow?") are parsed without the LLM
+        actions = parse_calendar_query(query, datetime.now(TZ), TZ)
+        if actions is None:
+            context = self.memory.get_context()
+            contextual_query = f"""
+                Previous conversation:
+                {context}
 
-            Use previous context if needed to understand references like
-            'same time', 'that meeting', or 'tomorrow's event'.
-        """
-        actions = self.interpret_query(contextual_query)
+                Current user message: "{query}"
+
+                Use previous context if needed to understand references like
+                'same time', 'that meeting', or 'tomorrow's event'.
+            """
+            actions = self.interpret_query(contextual_query)
 
         if not actions:
             response_text = "I couldn't understand your request."
             self.memory.add("assistant", response_text)
             return response_text
 
-        responses = []
-        for action in actions:
+        # Creates and deletes of all actions go out in one batch; lists run afterwards
+        # so they show the calendar as it is after the changes.
+        responses = [None] * len(actions)
+        requests, reports, lists = [], [], []
+        for slot, action in enumerate(actions):
             intent = action.get("intent")
 
             if intent == "create":
                 event = action.get("event", {})
-                responses.append(self.create_event(**event))
+                requests.append(self._insert_request(**event))
+                reports.append((slot, 1, partial(self._report_create, event.get("summary"))))
 
             elif intent == "list":
-                start_time = action.get("start_time")
-                end_time = action.get("end_time")
-                days = action.get("days")
-
-                responses.append(
-                    self.list_events(
-                        start_time=start_time,
-                        end_time=end_time,
-                        days=days if days is not None else 1
-                    )
-                )
+                lists.append((slot, action))
 
             elif intent == "delete":
                 summary = action.get("summary", "")
-                responses.append(self.delete_event(summary))
+                matches = self._delete_candidates(summary)
+                if not matches:
+                    responses[slot] = f"No event found matching '{summary}'."
+                    continue
+                requests.extend(self._delete_request(e) for e in matches)
+                reports.append((slot, len(matches), partial(self._report_delete, matches)))
+
+        results = self._execute_batch(requests) if requests else []
+        offset = 0
+        for slot, count, report in reports:
+            responses[slot] = report(results[offset:offset + count])
+            offset += count
+
+        for slot, action in lists:
+            days = action.get("days")
+            responses[slot] = self.list_events(
+                start_time=action.get("start_time"),
+                end_time=action.get("end_time"),
+                days=days if days is not None else 1
+            )
+
+        responses = [r for r in responses if r is not None]
         final_response = "\n\n".join(responses)
         self.memory.add("assistant", final_response)
         return "\n\n".join(responses)
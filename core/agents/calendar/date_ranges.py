@@ -0,0 +1,92 @@
+"""
+Rule-based understanding of common calendar reads and deletes.
+
+"What's on tomorrow?", "show my events for the next 3 days" or "cancel
+the dentist appointment" produce the same action JSON the LLM would,
+without a model call. Anything else (creating events, references to
+earlier messages, mixed requests, past or multi-part periods, dates we
+do not recognise) returns None and is left to the LLM.
+"""
+from datetime import date, datetime, time
+import re
+from core.utils.periods import MONTHS, find_period
+
+CREATE_PATTERN = re.compile(
+    r"\b(add|create|book|set up|put|plan|remind|schedule (a|an|my|the)|new (event|meeting|appointment)|"
+    r"move|reschedule|change|rename|invite)\b"
+)
+DELETE_PATTERN = re.compile(r"\b(delete|remove|cancel)\b")
+LIST_PATTERN = re.compile(
+    r"\b(show|list|what'?s|what is|what do i have|anything|agenda|schedule|events?|plans|"
+    r"appointments?|meetings?|busy|free|coming up|upcoming)\b"
+)
+# references that need the conversation to resolve
+CONTEXT_PATTERN = re.compile(r"\b(it|that|those|them|this one|same|again|instead)\b")
+# find_period reads one period from today on: the past, spans and alternatives need the LLM
+UNSUPPORTED_PATTERN = re.compile(
+    r"\b(yesterday|last|ago|previous|past|earlier|did|was|were|had|"
+    r"until|till|through|thru|between|since|(?<!day )after|before|rest of|or)\b|\bfrom\b.*\bto\b"
+)
+# Deletes match titles by substring, so the rules only take a plain title ("team meeting");
+# anything scoped by date or time, or by quantity, is the LLM's job
+DELETE_DATE_PATTERN = re.compile(
+    r"\d|\b(am|pm|noon|midnight|morning|afternoon|evening|night|day|days|week|weeks|weekend|month|"
+    + "|".join(MONTHS + [m[:3] for m in MONTHS] + ["sept"]) + r")\b"
+)
+DELETE_QUANTITY_PATTERN = re.compile(r"\b(all|every|everything|any|anything|each|both|some)\b")
+TITLE_PREFIX = re.compile(r"^((the|my|a|an|our)\s+)+")
+TITLE_SUFFIX = re.compile(r"\s+((from|in|on) (my |the )?(calendar|agenda|schedule)|please)$")
+GENERIC_WORDS = {"calendar", "agenda", "schedule", "event", "events", "meeting", "meetings",
+                 "appointment", "appointments", "entry", "entries", "plans"}
+PREPOSITIONS = {"from", "on", "at", "in", "for", "to", "with", "by", "of", "about"}
+
+
+def _at(tz, day: date, t: time) -> datetime:
+    naive = datetime.combine(day, t)
+    return tz.localize(naive) if hasattr(tz, "localize") else naive.replace(tzinfo=tz)
+
+
+def parse_calendar_query(query: str, now: datetime, tz):
+    """
+    Actions for a list or delete request, in the LLM's JSON shape, or None
+    when the message should go to the LLM.
+    """
+    text = " ".join(query.lower().replace("’", "'").split()).rstrip("?!. ")
+    if CREATE_PATTERN.search(text) or UNSUPPORTED_PATTERN.search(text):
+        return None
+
+    if DELETE_PATTERN.search(text):
+        return _delete_action(text, now.date())
+
+    if not LIST_PATTERN.search(text) or " and " in text:
+        return None
+    period = find_period(text, now.date())
+    if period is None:
+        # a period we could not read ("in the holidays") is the LLM's job
+        if re.search(r"\b(on|for|in|during)\b", text):
+            return None
+        return [{"intent": "list", "start_time": "", "end_time": "", "days": None}]
+    if period[0] == "days":
+        return [{"intent": "list", "start_time": "", "end_time": "", "days": period[1]}]
+
+    _, first, last, start = period
+    return [{
+        "intent": "list",
+        "start_time": _at(tz, first, start).isoformat(),
+        "end_time": _at(tz, last, time(23, 59, 59)).isoformat(),
+        "days": None,
+    }]
+
+
+def _delete_action(text: str, today: date):
+    if CONTEXT_PATTERN.search(text) or " and " in text:
+        return None
+    if find_period(text, today) or DELETE_DATE_PATTERN.search(text) or DELETE_QUANTITY_PATTERN.search(text):
+        return None
+    # the title is whatever follows the verb, minus articles and "from my calendar"
+    title = DELETE_PATTERN.split(text, maxsplit=1)[-1].strip()
+    title = TITLE_SUFFIX.sub("", TITLE_PREFIX.sub("", title))
+    words = re.sub(r"[^\w' -]", " ", title).split()
+    if not words or set(words) <= GENERIC_WORDS or words[-1] in PREPOSITIONS:
+        return None
+    return [{"intent": "delete", "summary": " ".join(words)}]
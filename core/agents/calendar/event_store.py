@@ -0,0 +1,177 @@
+from datetime import datetime
+from pathlib import Path
+import json
+import os
+import sqlite3
+import threading
+import time
+from googleapiclient.errors import HttpError
+from core.utils.shared import data_dir
+
+DB_NAME = "calendar.sqlite3"  # under data_dir() unless a path is given
+SYNC_INTERVAL = 30  # seconds a synced calendar is trusted before asking Google for deltas
+PAGE_SIZE = 250
+# partial response: only what the store and the formatter need
+SYNC_FIELDS = "nextPageToken,nextSyncToken,items(id,status,summary,start,end)"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    calendar_id TEXT NOT NULL,
+    id          TEXT NOT NULL,
+    summary     TEXT NOT NULL DEFAULT '',
+    start_ts    REAL NOT NULL,
+    end_ts      REAL NOT NULL,
+    data        TEXT NOT NULL,
+    PRIMARY KEY (calendar_id, id)
+);
+CREATE INDEX IF NOT EXISTS events_by_start ON events (calendar_id, start_ts);
+CREATE TABLE IF NOT EXISTS sync_state (
+    calendar_id TEXT PRIMARY KEY,
+    sync_token  TEXT,
+    synced_at   REAL NOT NULL
+);
+"""
+
+
+class EventStore:
+    """
+    Local SQLite copy of a Google Calendar.
+
+    The first sync downloads every event and keeps the `nextSyncToken`;
+    later syncs send that token and only receive what changed (cancelled
+    events arrive with status "cancelled" and are removed). When Google
+    expires the token (HTTP 410) the calendar is re-downloaded.
+    Time-range reads are answered from an index on the start time.
+    """
+
+    def __init__(self, path=None, tz=None, sync_interval: float = SYNC_INTERVAL):
+        path = path if path is not None else data_dir() / DB_NAME
+        self.path = Path(path)
+        self.tz = tz
+        self.sync_interval = sync_interval
+        if str(path) != ":memory:":
+            os.makedirs(self.path.parent, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.RLock()
+
+    # ---------------------------------------------------------------
+    # Sync
+    # ---------------------------------------------------------------
+    def sync(self, service, calendar_id: str = "primary", force: bool = False):
+        """Bring the local copy up to date. Skipped if synced within `sync_interval`."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT sync_token, synced_at FROM sync_state WHERE calendar_id = ?", (calendar_id,)
+            ).fetchone()
+            if row and not force and time.time() - row[1] < self.sync_interval:
+                return
+            token = row[0] if row else None
+            full = token is None
+
+            try:
+                changes, token = self._download(service, calendar_id, token)
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                print("Calendar sync token expired, downloading the full calendar again.")
+                changes, token = self._download(service, calendar_id, None)
+                full = True
+
+            with self._db:
+                if full:
+                    self._db.execute("DELETE FROM events WHERE calendar_id = ?", (calendar_id,))
+                for event in changes:
+                    if event.get("status") == "cancelled":
+                        self._db.execute("DELETE FROM events WHERE calendar_id = ? AND id = ?",
+                                         (calendar_id, event["id"]))
+                    else:
+                        self._upsert(calendar_id, event)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sync_state (calendar_id, sync_token, synced_at) VALUES (?, ?, ?)",
+                    (calendar_id, token, time.time()),
+                )
+
+    @staticmethod
+    def _download(service, calendar_id: str, sync_token):
+        """All pages of a full (no token) or incremental listing. Returns (events, next sync token)."""
+        params = {"calendarId": calendar_id, "singleEvents": True, "maxResults": PAGE_SIZE, "fields": SYNC_FIELDS}
+        if sync_token:
+            params["syncToken"] = sync_token
+        events, page = [], {}
+        for page in iter_pages(service, **params):
+            events.extend(page.get("items", []))
+        return events, page.get("nextSyncToken")
+
+    # ---------------------------------------------------------------
+    # Local writes (keep the copy current after our own mutations)
+    # ---------------------------------------------------------------
+    def put(self, event: dict, calendar_id: str = "primary"):
+        with self._lock, self._db:
+            self._upsert(calendar_id, event)
+
+    def remove(self, event_id: str, calendar_id: str = "primary"):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM events WHERE calendar_id = ? AND id = ?", (calendar_id, event_id))
+
+    def _upsert(self, calendar_id: str, event: dict):
+        start = self._timestamp(event.get("start", {}))
+        end = self._timestamp(event.get("end", {}))
+        if start is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO events (calendar_id, id, summary, start_ts, end_ts, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (calendar_id, event["id"], event.get("summary", ""), start, end if end is not None else start,
+             json.dumps(event)),
+        )
+
+    def _timestamp(self, when: dict):
+        """Epoch seconds of a Calendar start/end; all-day dates count from local midnight."""
+        if "dateTime" in when:
+            return datetime.fromisoformat(when["dateTime"].replace("Z", "+00:00")).timestamp()
+        if "date" in when:
+            day = datetime.fromisoformat(when["date"])
+            return (self.tz.localize(day) if self.tz else day).timestamp()
+        return None
+
+    # ---------------------------------------------------------------
+    # Reads
+    # ---------------------------------------------------------------
+    def between(self, start_time: str, end_time: str, calendar_id: str = "primary", limit: int = None):
+        """Events overlapping [start_time, end_time) (ISO 8601), ordered by start, like events().list."""
+        start = datetime.fromisoformat(start_time.replace("Z", "+00:00")).timestamp()
+        end = datetime.fromisoformat(end_time.replace("Z", "+00:00")).timestamp()
+        sql = ("SELECT data FROM events WHERE calendar_id = ? AND start_ts < ? AND end_ts > ? "
+               "ORDER BY start_ts")
+        args = [calendar_id, end, start]
+        if limit:
+            sql += " LIMIT ?"
+            args.append(limit)
+        with self._lock:
+            return [json.loads(data) for (data,) in self._db.execute(sql, args)]
+
+    def upcoming(self, calendar_id: str = "primary", limit: int = 20):
+        """Events not yet over, soonest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT data FROM events WHERE calendar_id = ? AND end_ts > ? ORDER BY start_ts LIMIT ?",
+                (calendar_id, time.time(), limit),
+            )
+            return [json.loads(data) for (data,) in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def iter_pages(service, **params):
+    """Yield the pages of an events().list call one at a time, following nextPageToken."""
+    page_token = None
+    while True:
+        if page_token:
+            params["pageToken"] = page_token
+        page = service.events().list(**params).execute()
+        yield page
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            return
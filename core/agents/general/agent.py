@@ -1,7 +1,25 @@
-from core.utils.llm_interface import LLMInterface
+from concurrent.futures import ThreadPoolExecutor
+from core.utils.prompts import PromptTemplate
+from core.utils.shared import get_llm, get_response_cache
 from core.memory.conversation_memory import ConversationMemory
 from core.memory.longterm_memory import LongTermMemory
 
+GENERAL_PROMPT = PromptTemplate(
+    "general",
+    system="""
+    You are NEXCAI, a helpful, polite, and context-aware personal assistant.
+    Use the user's long-term memories and the earlier conversation when they are relevant.
+    Respond naturally in English.
+    """,
+    user="""
+    User's relevant long-term memories:
+    {memories}
+
+    {summary}Now respond to the user's message:
+    "{query}"
+    """,
+)
+
 
 class GeneralAgent:
     """
@@ -11,53 +29,100 @@ class GeneralAgent:
     - long-term semantic memory (FAISS-based user facts)
     """
 
-    def __init__(self):
+    def __init__(self, longterm_memory: LongTermMemory = None, llm=None, memory: ConversationMemory = None,
+                 response_cache=None):
+        """
+        `longterm_memory` lets several agents (server sessions) share one store.
+        `llm`, `memory` and `response_cache` default to the process-wide
+        LLM, a fresh conversation memory and the shared response cache.
+        """
         # Initialize LLM and both memory systems
-        self.llm = LLMInterface(model="llama3:8b")
-        self.memory = ConversationMemory(max_length=10)
-        self.longterm_memory = LongTermMemory()
+        self.llm = llm if llm is not None else get_llm("llama3:8b")
+        # Older turns are folded into a running summary so the prompt stays bounded
+        self.memory = memory if memory is not None else ConversationMemory(max_length=10, max_tokens=1500,
+                                                                           llm=self.llm)
+        self._owns_longterm = longterm_memory is None
+        self.longterm_memory = longterm_memory if longterm_memory is not None else LongTermMemory()
+        self.response_cache = response_cache if response_cache is not None else get_response_cache()
+        # Retrieval can run while the router is still deciding
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="general-prefetch")
+        self._prefetched = None
+
+    def prefetch(self, query: str):
+        """
+        Start retrieving long-term memories for `query` in the background.
+        Called before routing; `run_stream` picks the result up if the
+        query ends up here.
+        """
+        self._prefetched = (query, self._executor.submit(self.longterm_memory.search, query, 3))
+
+    def _retrieve(self, query: str):
+        prefetched, self._prefetched = self._prefetched, None
+        if prefetched and prefetched[0] == query:
+            return prefetched[1].result()
+        return self.longterm_memory.search(query, k=3)
+
+    def close(self):
+        """Finish queued memory writes and stop background workers."""
+        self._executor.shutdown(wait=True)
+        self.memory.close()
+        if self._owns_longterm:
+            self.longterm_memory.close()
 
     def run(self, query: str):
         """
-        Run the General Agent:
+        Run the General Agent and return the full reply.
+        See `run_stream` for the individual steps.
+        """
+        return "".join(self.run_stream(query)).strip()
+
+    def run_stream(self, query: str):
+        """
+        Run the General Agent, yielding the reply as it is generated:
         1. Add user's message to short-term memory
         2. Retrieve relevant long-term memories
-        3. Send combined context to LLM
+        3. Send combined context to LLM and stream the answer
         4. Add assistant's reply to memory
-        5. Teach LTM (if LLM deems it valuable)
+        5. Queue LTM teaching (if LLM deems it valuable) off the reply path
         """
 
         # ---- Add to short-term memory ---
+        history = self.memory.get_messages()
         self.memory.add("user", query)
-        context = self.memory.get_context()
 
         # --- Retrieve relevant long-term memories ---
-        related_memories = self.longterm_memory.search(query, k=3)
+        related_memories = self._retrieve(query)
         memory_context = "\n".join(related_memories) if related_memories else "None"
 
-        # --- Build the prompt with both contexts ---
-        prompt = f"""
-        You are NEXCAI, a helpful, polite, and context-aware personal assistant.
-
-        User's relevant long-term memories:
-        {memory_context}
+        # --- Reuse the answer to an equivalent question in the same context ---
+        # the earlier turns are grounding too: "and tomorrow?" means something else in every conversation
+        grounding = {"memories": related_memories, "history": history, "summary": self.memory.summary}
+        if self.response_cache is not None:
+            cached = self.response_cache.get(query, grounding)
+            if cached is not None:
+                self.memory.add("assistant", cached)
+                yield cached
+                return
 
-        Recent conversation:
-        {context}
-
-        Now respond naturally in English to the user's message:
-        "{query}"
-
-        Assistant:
-        """
+        # --- Build the prompt: static instructions, earlier turns, then this turn ---
+        # Earlier turns are sent as plain chat messages. Only this turn carries the memories
+        # and summary (history keeps the bare question), so the next prompt repeats this one
+        # up to the previous exchange and the server only prefills the last two turns, until
+        # the window slides or the summary changes.
+        summary = f"Earlier in the conversation: {grounding['summary']}\n\n" if grounding["summary"] else ""
+        messages = GENERAL_PROMPT.messages(history, memories=memory_context, summary=summary, query=query)
 
         # --- Generate response ---
-        response = self.llm.chat(prompt)
-
-        # --- Store new memory (if valuable) ---
-        self.longterm_memory.add(query)
+        response = ""
+        for piece in self.llm.chat_stream(messages, label=GENERAL_PROMPT.name):
+            response += piece
+            yield piece
+        response = response.strip()
 
         # --- Add assistant reply to short-term memory ---
         self.memory.add("assistant", response)
+        if self.response_cache is not None:
+            self.response_cache.put(query, response, grounding)
 
-        return response
\ No newline at end of file
+        # --- Store new memory (if valuable) in the background ---
+        self.longterm_memory.add_async(query)
@@ -1,7 +1,12 @@
 import json
+from datetime import date
 import numpy as np
-from core.utils.llm_interface import LLMInterface
-from .fetcher import get_weather
+from core.utils.periods import find_period
+from core.utils.prompts import PromptTemplate
+from core.utils.shared import get_llm, get_response_cache
+from .fetcher import get_weather, get_weather_many
+from .frame import WeatherFrame, reduce_rows, scalar, stack_daily
+from .gazetteer import fold, get_gazetteer, pick
 
 
 def interpret_weathercode(code: int):
@@ -37,54 +42,201 @@ def interpret_weathercode(code: int):
     return codes.get(code, "Unknown")
 
 
+# Everything preprocess_weather_data() reads; nothing else is downloaded
+SUMMARY_HOURLY_FIELDS = ("temperature_2m", "cloud_cover", "precipitation_probability")
+SUMMARY_DAILY_FIELDS = (
+    "temperature_2m_max", "temperature_2m_min", "precipitation_sum",
+    "precipitation_probability_max", "sunshine_duration", "weathercode",
+)
+
+PLACE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "city": {"type": ["string", "null"]},
+        "lat": {"type": ["number", "null"]},
+        "lon": {"type": ["number", "null"]},
+    },
+    "required": ["city", "lat", "lon"],
+}
+
+PLACE_PROMPT = PromptTemplate(
+    "weather-place",
+    system="""
+    Extract from the question:
+    1. City name
+    2. Approximate latitude and longitude (decimal degrees)
+
+    Respond **only** with JSON in this format (null if no city is mentioned):
+    {"city": "<city>", "lat": <latitude>, "lon": <longitude>}
+    """,
+    user='Question: "{query}"{hint}',
+)
+PLACE_HINT = '\nOnly locate the place called "{place}", as meant in this question.'
+SUMMARY_PROMPT = PromptTemplate(
+    "weather",
+    system="""
+    You are NEXCAI, an advanced and precise weather analyst.
+    You receive the user's question, the city and structured weather data.
+
+    Instructions:
+    - Understand weather codes: 0=clear,1=mainly clear,2=partly cloudy,3=overcast,
+      45–48=fog,51–67=drizzle/rain,71–77=snow,80–82=showers,95–99=thunderstorm.
+    - precipitation_sum < 1 → "mostly dry", 1–5 → "light rain", 5–20 → "moderate rain", >20 → "heavy rain".
+    - sunshine_hours > 5 → "mostly sunny".
+    - precipitation_prob > 70 → "high chance of rain".
+    - Answer for only the requested day. If today is asked give today, if tomorrow is asked, give tomorrow only.
+    - If the question is specific (like 'will it rain tomorrow?'), answer directly yes/no and short explanation.
+    - If general (like 'how will it be tomorrow?'), summarize temperature, cloudiness, and rain probability in 1 paragraph.
+    - Be factual, concise, 3 4 sentences max and sound like an energetic weather reporter.
+    """,
+    user="""
+    The user asked: "{query}"
+    City: {city}
+    Here's the structured weather data:
+    {data}
+    """,
+)
+COMPARE_PROMPT = PromptTemplate(
+    "weather-compare",
+    system="""
+    You are NEXCAI, an advanced and precise weather analyst.
+    You receive the user's question and structured weather data for each city over the requested period.
+
+    Instructions:
+    - precip_mm_total < 1 → "mostly dry", 1–5 → "light rain", 5–20 → "moderate rain", >20 → "heavy rain".
+    - max_precip_prob > 70 → "high chance of rain".
+    - Compare the cities directly: say which is warmer, wetter or sunnier when it matters.
+    - If the question is specific (like 'where will it rain?'), answer it directly first.
+    - Be factual, concise, 3 5 sentences max and sound like an energetic weather reporter.
+    """,
+    user="""
+    The user asked: "{query}"
+    Cities: {cities}
+    {data}
+    """,
+)
+
+MAX_FORECAST_DAYS = 16
+DEFAULT_WINDOW = (0, 2)  # today and tomorrow
+
+def query_window(query: str, today: date = None):
+    """
+    Which days a question is about, as (start_day, days) with 0 = today.
+    Defaults to today and tomorrow when no period is mentioned; days of the
+    period that are already over ("this week" on a Thursday) are left out.
+    """
+    today = today or date.today()
+    period = find_period(" ".join(query.lower().split()), today)
+    if period is None:
+        return DEFAULT_WINDOW
+    if period[0] == "days":
+        return 0, min(period[1], MAX_FORECAST_DAYS)
+    _, first, last, _ = period
+    first = max(first, today)
+    return (first - today).days, (last - first).days + 1
+
+
+def plan_forecast_request(query: str) -> dict:
+    """
+    Decide which fields and how many forecast days a query needs:
+    just enough days to cover the period it asks about.
+    """
+    start_day, days = query_window(query)
+    # "next_24h" runs from the current hour, so it reaches into tomorrow even for same-day questions
+    return {
+        "forecast_days": max(2, min(start_day + days, MAX_FORECAST_DAYS)),
+        "hourly": SUMMARY_HOURLY_FIELDS,
+        "daily": SUMMARY_DAILY_FIELDS,
+    }
+
+
 class WeatherAgent:
-    def __init__(self):
-        self.llm = LLMInterface(model="llama3:8b")
+    def __init__(self, llm=None, response_cache=None):
+        """`llm` and `response_cache` default to the process-wide ones (the cache is None unless enabled)."""
+        self.llm = llm if llm is not None else get_llm("llama3:8b")
+        self.response_cache = response_cache if response_cache is not None else get_response_cache()
         self.last_city = None
         self.last_coords = None
+        # folded place name -> (city, lat, lon) resolved earlier in this session
+        self.known_places = {}
 
     def extract_city_and_coords(self, query: str):
-        prompt = f"""
-        Extract from the question:
-        1. City name
-        2. Approximate latitude and longitude (decimal degrees)
-        
-        Respond **only** in this format:
-        City: <city>
-        Lat: <latitude>
-        Lon: <longitude>
-        
-        Question: "{query}"
         """
-        response = self.llm.chat(prompt)
-        city, lat, lon = None, None, None
-        for line in response.splitlines():
-            if line.lower().startswith("city:"):
-                city = line.split(":", 1)[1].strip()
-                if city.lower() == "none" or city == "":
-                    city = None
-            elif line.lower().startswith("lat:"):
-                try:
-                    lat = float(line.split(":", 1)[1].strip())
-                except ValueError:
-                    lat = None
-            elif line.lower().startswith("lon:"):
-                try:
-                    lon = float(line.split(":", 1)[1].strip())
-                except ValueError:
-                    lon = None
+        Find the city in the question and its coordinates.
+        Places seen earlier in the session and the offline gazetteer are
+        tried first; the LLM is only asked when neither gives a clear answer.
+        """
+        place, ambiguous = self._resolve_locally(query)
+        if place:
+            return place
+
+        city, lat, lon = self._extract_with_llm(query)
+        # which homonym was meant depends on this question ("Valencia, Venezuela"); don't reuse it
+        if city and lat is not None and lon is not None and not ambiguous:
+            self.known_places[fold(city)] = (city, lat, lon)
         return city, lat, lon
 
+    def _resolve_locally(self, query: str):
+        """(place or None, whether the gazetteer found several homonyms)."""
+        padded = f" {fold(query)} "
+        for key, place in self.known_places.items():
+            if f" {key} " in padded:
+                return place, False
+
+        city, ambiguous = get_gazetteer().resolve(query)
+        if city is None:
+            return None, ambiguous
+        place = (city["name"], city["lat"], city["lon"])
+        self.known_places[fold(city["name"])] = place
+        return place, False
+
+    def extract_places(self, query: str):
+        """
+        Every place mentioned in the question, in order, as (city, lat, lon).
+        Homonyms the gazetteer cannot settle are asked to the LLM one by one,
+        with the whole question as context; those answers are not cached.
+        """
+        return self._find_places(query)[0]
+
+    def _find_places(self, query: str):
+        """(places, whether the LLM was asked)."""
+        places, asked = [], False
+        for phrase, cities in get_gazetteer().find(query):
+            place = self.known_places.get(fold(phrase))
+            if place is None:
+                city, _ = pick(cities)
+                if city:
+                    place = (city["name"], city["lat"], city["lon"])
+                    self.known_places[fold(city["name"])] = place
+                else:
+                    place = self._extract_with_llm(query, phrase)
+                    asked = True
+                    if not place[0] or place[1] is None or place[2] is None:
+                        continue
+            if place not in places:
+                places.append(place)
+        return places, asked
+
+    def _extract_with_llm(self, query: str, place: str = None):
+        hint = PLACE_HINT.format(place=place) if place else ""
+        messages = PLACE_PROMPT.messages(query=query, hint=hint)
+        data = self.llm.chat_json(messages, schema=PLACE_SCHEMA, max_tokens=48, label=PLACE_PROMPT.name)
+        if not data or not data.get("city"):
+            return None, None, None
+        return data["city"], data.get("lat"), data.get("lon")
+
     @staticmethod
-    def preprocess_weather_data(weather_data: dict):
+    def preprocess_weather_data(weather_data: dict, window=None):
         """
         Summarize the raw weather JSON into a structured but concise form
-        readable by the LLM.
+        readable by the LLM. `window` is a (start_day, days) pair from
+        `query_window`; periods other than today/tomorrow get their own block.
         """
+        frame = weather_data if isinstance(weather_data, WeatherFrame) else WeatherFrame(weather_data)
         summary = {}
 
         # --- Current ---
-        current = weather_data.get("current_weather", {})
+        current = frame.current
         summary["current"] = {
             "temperature": current.get("temperature"),
             "windspeed": current.get("windspeed"),
@@ -94,36 +246,34 @@ class WeatherAgent:
         }
 
         # --- Daily forecast ---
-        daily = weather_data.get("daily", {})
-        times = daily.get("time", [])
-        if times:
-            for i, date in enumerate(times[:2]):
-                tag = "today" if i == 0 else "tomorrow"
-                summary[tag] = {
-                    "date": date,
-                    "t_min": daily.get("temperature_2m_min", [None])[i],
-                    "t_max": daily.get("temperature_2m_max", [None])[i],
-                    "precip_mm": daily.get("precipitation_sum", [None])[i],
-                    "precip_prob": daily.get("precipitation_probability_max", [None])[i],
-                    "sunshine_hours": round(
-                        (daily.get("sunshine_duration", [0])[i] or 0) / 3600, 1
-                    ),
-                    "weathercode": daily.get("weathercode", [None])[i],
-                    "description": interpret_weathercode(
-                        daily.get("weathercode", [None])[i]
-                    ),
+        for tag, row in zip(("today", "tomorrow"), frame.summarize_days(0, 2)):
+            row["description"] = interpret_weathercode(row["weathercode"])
+            summary[tag] = row
+
+        # --- Requested period (e.g. "this weekend", "next 3 days") ---
+        if window and tuple(window) != DEFAULT_WINDOW:
+            start_day, days = window
+            rows = frame.summarize_days(start_day, days)
+            for row in rows:
+                row["description"] = interpret_weathercode(row["weathercode"])
+            if rows:
+                summary["requested_period"] = {
+                    "start": rows[0]["date"],
+                    "end": rows[-1]["date"],
+                    "t_min": frame.daily_stat("temperature_2m_min", "min", start_day, days),
+                    "t_max": frame.daily_stat("temperature_2m_max", "max", start_day, days),
+                    "precip_mm_total": frame.daily_stat("precipitation_sum", "sum", start_day, days),
+                    "max_precip_prob": frame.daily_stat("precipitation_probability_max", "max", start_day, days),
+                    "days": rows,
                 }
 
-        # --- Hourly summary (next 24h) ---
-        hourly = weather_data.get("hourly", {})
-        if "temperature_2m" in hourly:
-            temps = np.array(hourly.get("temperature_2m", [])[:24])
-            clouds = np.array(hourly.get("cloud_cover", [])[:24])
-            probs = np.array(hourly.get("precipitation_probability", [])[:24])
+        # --- Hourly summary (next 24h from the current hour) ---
+        if "temperature_2m" in frame.hourly:
+            start = frame.current_hour_index()
             summary["next_24h"] = {
-                "avg_temp": float(np.nanmean(temps)) if len(temps) else None,
-                "avg_clouds": float(np.nanmean(clouds)) if len(clouds) else None,
-                "max_precip_prob": float(np.nanmax(probs)) if len(probs) else None,
+                "avg_temp": frame.hourly_stat("temperature_2m", "mean", start, 24),
+                "avg_clouds": frame.hourly_stat("cloud_cover", "mean", start, 24),
+                "max_precip_prob": frame.hourly_stat("precipitation_probability", "max", start, 24),
             }
 
         return summary
@@ -132,33 +282,91 @@ class WeatherAgent:
         if not weather_data:
             return "Sorry, I couldn't retrieve the weather data."
 
-        summary = self.preprocess_weather_data(weather_data)
+        frame = WeatherFrame(weather_data)
+        today = frame.dates[0].item() if frame.n_days else None
+        summary = self.preprocess_weather_data(frame, query_window(query, today))
         compact_json = json.dumps(summary, indent=2)
 
-        prompt = f"""
-        You are NEXCAI, an advanced and precise weather analyst.
-
-        The user asked: "{query}"
-        City: {city}
-        Here's the structured weather data:
-        {compact_json}
-
-        Instructions:
-        - Understand weather codes: 0=clear,1=mainly clear,2=partly cloudy,3=overcast,
-          45–48=fog,51–67=drizzle/rain,71–77=snow,80–82=showers,95–99=thunderstorm.
-        - precipitation_sum < 1 → "mostly dry", 1–5 → "light rain", 5–20 → "moderate rain", >20 → "heavy rain".
-        - sunshine_hours > 5 → "mostly sunny".
-        - precipitation_prob > 70 → "high chance of rain".
-        - Answer for only the requested day. If today is asked give today, if tomorrow is asked, give tomorrow only.
-        - If the question is specific (like 'will it rain tomorrow?'), answer directly yes/no and short explanation.
-        - If general (like 'how will it be tomorrow?'), summarize temperature, cloudiness, and rain probability in 1 paragraph.
-        - Be factual, concise, 3 4 sentences max and sound like an energetic weather reporter.
+        grounding = {"city": city, "summary": summary}
+        if self.response_cache is not None:
+            cached = self.response_cache.get(query, grounding)
+            if cached is not None:
+                return cached
+
+        messages = SUMMARY_PROMPT.messages(query=query, city=city, data=compact_json)
+        answer = self.llm.chat(messages, label=SUMMARY_PROMPT.name)
+        if self.response_cache is not None:
+            self.response_cache.put(query, answer, grounding)
+        return answer
+
+    @staticmethod
+    def compare_locations(names, frames, window=DEFAULT_WINDOW):
         """
+        Side-by-side summary of several locations over one window.
+        Each daily field is stacked into a (locations, days) matrix and
+        reduced for all locations at once.
+        """
+        start_day, days = window
+        t_min = reduce_rows(stack_daily(frames, "temperature_2m_min", start_day, days), "min")
+        t_max = reduce_rows(stack_daily(frames, "temperature_2m_max", start_day, days), "max")
+        precip = reduce_rows(stack_daily(frames, "precipitation_sum", start_day, days), "sum")
+        precip_prob = reduce_rows(stack_daily(frames, "precipitation_probability_max", start_day, days), "max")
+        sunshine = reduce_rows(stack_daily(frames, "sunshine_duration", start_day, days), "sum") / 3600
+        codes = stack_daily(frames, "weathercode", start_day, days)
+        worst_code = reduce_rows(codes, "max")
+
+        def value(x):
+            return None if np.isnan(x) else scalar(x)
 
-        return self.llm.chat(prompt)
+        locations = {}
+        for i, (name, frame) in enumerate(zip(names, frames)):
+            current = frame.current
+            code = None if np.isnan(worst_code[i]) else int(worst_code[i])
+            locations[name] = {
+                "current_temperature": current.get("temperature"),
+                "current_description": interpret_weathercode(current.get("weathercode")),
+                "t_min": value(t_min[i]),
+                "t_max": value(t_max[i]),
+                "precip_mm_total": value(precip[i]),
+                "max_precip_prob": value(precip_prob[i]),
+                "sunshine_hours": value(sunshine[i]),
+                "worst_weather": interpret_weathercode(code) if code is not None else None,
+            }
+
+        summary = {"period_days": days, "locations": locations}
+        if frames and frames[0].n_days > start_day:
+            summary["start"] = str(frames[0].dates[start_day])
+        if not np.isnan(t_max).all():
+            summary["warmest"] = names[int(np.nanargmax(t_max))]
+        if not np.isnan(precip).all():
+            summary["wettest"] = names[int(np.nanargmax(precip))]
+        return summary
+
+    def summarize_many(self, names, query: str, weather_data: list):
+        frames = [WeatherFrame(data) for data in weather_data if data]
+        names = [name for name, data in zip(names, weather_data) if data]
+        if not frames:
+            return "Sorry, I couldn't retrieve the weather data."
+
+        today = frames[0].dates[0].item() if frames[0].n_days else None
+        summary = self.compare_locations(names, frames, query_window(query, today))
+        compact_json = json.dumps(summary, indent=2)
+
+        messages = COMPARE_PROMPT.messages(query=query, cities=", ".join(names), data=compact_json)
+        return self.llm.chat(messages, label=COMPARE_PROMPT.name)
 
     def run(self, query: str):
-        city, lat, lon = self.extract_city_and_coords(query)
+        places, asked = self._find_places(query)
+        if len(places) > 1:
+            weather_data = get_weather_many([(lat, lon) for _, lat, lon in places], **plan_forecast_request(query))
+            return self.summarize_many([city for city, _, _ in places], query, weather_data)
+
+        if places:
+            city, lat, lon = places[0]
+        elif asked:  # the LLM already had its say on the only place mentioned
+            city = lat = lon = None
+        else:
+            city, lat, lon = self.extract_city_and_coords(query)
         if not city or not lat or not lon:
             if self.last_city and self.last_coords:
                 city, (lat, lon) = self.last_city, self.last_coords
@@ -168,5 +376,5 @@ class WeatherAgent:
             self.last_city = city
             self.last_coords = (lat, lon)
 
-        weather_data = get_weather(lat, lon)
+        weather_data = get_weather(lat, lon, **plan_forecast_request(query))
         return self.summarize_weather(city, query, weather_data)
@@ -1,29 +1,226 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def get_weather(lat: float, lon: float, forecast_days: int = 16):
+API_URL = "https://api.open-meteo.com/v1/forecast"
+
+HOURLY_FIELDS = (
+    "temperature_2m", "apparent_temperature", "precipitation", "precipitation_probability",
+    "cloud_cover", "cloud_cover_low", "cloud_cover_mid", "cloud_cover_high", "weathercode",
+    "windspeed_10m", "winddirection_10m", "visibility",
+)
+DAILY_FIELDS = (
+    "temperature_2m_max", "temperature_2m_min", "apparent_temperature_max", "apparent_temperature_min",
+    "precipitation_sum", "precipitation_hours", "precipitation_probability_max", "sunshine_duration",
+    "uv_index_max", "weathercode", "wind_speed_10m_max", "wind_gusts_10m_max", "sunrise", "sunset",
+)
+
+UPDATE_INTERVAL = 3600  # Open-Meteo refreshes its forecasts hourly
+STALE_GRACE = 6 * 3600  # how long past expiry a forecast may still be served while refreshing
+COORD_DECIMALS = 2  # ~1 km; nearby requests share one cache entry
+
+
+class WeatherClient:
+    """
+    Open-Meteo client with a pooled session and a forecast cache.
+
+    - Responses are cached per (rounded coordinates, requested fields) until
+      the next forecast update boundary.
+    - Concurrent identical requests share one HTTP call.
+    - Several locations can be requested together; the ones not cached are
+      fetched in a single call using Open-Meteo's comma-separated coordinates.
+    - Expired entries are served for up to `stale_grace` seconds while a
+      background refresh runs (stale-while-revalidate), and as a fallback
+      when the API is unreachable.
+    """
+
+    def __init__(self, base_url: str = API_URL, timeout=(3.05, 10), retries: int = 3,
+                 update_interval: int = UPDATE_INTERVAL, stale_grace: int = STALE_GRACE,
+                 max_entries: int = 256):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.update_interval = update_interval
+        self.stale_grace = stale_grace
+        self.max_entries = max_entries
+
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",))
+        self.session.mount("https://", HTTPAdapter(max_retries=retry, pool_maxsize=8))
+        self.session.mount("http://", HTTPAdapter(max_retries=retry, pool_maxsize=8))
+
+        self._cache = OrderedDict()  # key -> (expires_at, data)
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _params(lat: float, lon: float, forecast_days: int, hourly, daily) -> dict:
+        return {
+            "latitude": round(lat, COORD_DECIMALS),
+            "longitude": round(lon, COORD_DECIMALS),
+            "current_weather": "true",
+            "hourly": ",".join(hourly),
+            "daily": ",".join(daily),
+            "forecast_days": forecast_days,
+            "timezone": "auto",
+        }
+
+    def get_weather(self, lat: float, lon: float, forecast_days: int = 16,
+                    hourly=HOURLY_FIELDS, daily=DAILY_FIELDS):
+        params = self._params(lat, lon, forecast_days, hourly, daily)
+        key = tuple(sorted(params.items()))
+        now = time.time()
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry:
+                self._cache.move_to_end(key)
+                expires_at, data = entry
+                if now < expires_at:
+                    return data
+                if now < expires_at + self.stale_grace:
+                    self._start_fetch(key, params, background=True)
+                    return data
+            future, leader = self._start_fetch(key, params)
+
+        if leader:
+            self._fetch(key, params, future)
+        return future.result()
+
+    def get_weather_many(self, coords, forecast_days: int = 16,
+                         hourly=HOURLY_FIELDS, daily=DAILY_FIELDS):
+        """
+        Weather for several (lat, lon) pairs, in the same order.
+        Cached locations are answered from the cache; all others go out in
+        one request.
+        """
+        all_params = [self._params(lat, lon, forecast_days, hourly, daily) for lat, lon in coords]
+        keys = [tuple(sorted(params.items())) for params in all_params]
+        now = time.time()
+
+        results = {}
+        futures = {}  # key -> Future, for locations fetched or being fetched
+        missing = []  # (key, params) this call has to fetch
+        with self._lock:
+            for key, params in zip(keys, all_params):
+                if key in results or key in futures:
+                    continue
+                entry = self._cache.get(key)
+                if entry:
+                    self._cache.move_to_end(key)
+                    expires_at, data = entry
+                    if now < expires_at:
+                        results[key] = data
+                        continue
+                    if now < expires_at + self.stale_grace:
+                        self._start_fetch(key, params, background=True)
+                        results[key] = data
+                        continue
+                future, leader = self._start_fetch(key, params)
+                futures[key] = future
+                if leader:
+                    missing.append((key, params))
+
+        if len(missing) == 1:
+            self._fetch(*missing[0], futures[missing[0][0]])
+        elif missing:
+            self._fetch_many(missing, futures)
+        for key, future in futures.items():
+            results[key] = future.result()
+        return [results[key] for key in keys]
+
+    # ---------------------------------------------------------------
+    # Single-flight fetching
+    # ---------------------------------------------------------------
+    def _start_fetch(self, key, params, background: bool = False):
+        """Join the in-flight request for `key` or register a new one. Lock held."""
+        future = self._inflight.get(key)
+        if future is not None:
+            return future, False
+        future = Future()
+        self._inflight[key] = future
+        if background:
+            threading.Thread(target=self._fetch, args=(key, params, future), daemon=True).start()
+            return future, False
+        return future, True
+
+    def _fetch(self, key, params, future):
+        try:
+            r = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            r.raise_for_status()
+            data = r.json()
+            self._store(key, data)
+        except Exception as e:
+            print("Weather API error:", e)
+            data = self._fallback(key)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        future.set_result(data)
+
+    def _fetch_many(self, missing, futures):
+        """Fetch several locations in one request; the response is a list in request order."""
+        params = dict(missing[0][1])
+        params["latitude"] = ",".join(str(p["latitude"]) for _, p in missing)
+        params["longitude"] = ",".join(str(p["longitude"]) for _, p in missing)
+        try:
+            r = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            r.raise_for_status()
+            data = r.json()
+            if isinstance(data, dict):
+                data = [data]
+            if len(data) != len(missing):
+                raise ValueError(f"expected {len(missing)} locations, got {len(data)}")
+            for (key, _), item in zip(missing, data):
+                self._store(key, item)
+        except Exception as e:
+            print("Weather API error:", e)
+            data = [self._fallback(key) for key, _ in missing]
+        finally:
+            with self._lock:
+                for key, _ in missing:
+                    self._inflight.pop(key, None)
+        for (key, _), item in zip(missing, data):
+            futures[key].set_result(item)
+
+    def _store(self, key, data):
+        with self._lock:
+            self._cache[key] = (self._next_update(time.time()), data)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _fallback(self, key):
+        """Whatever we had for `key`, however old."""
+        with self._lock:
+            entry = self._cache.get(key)
+        return entry[1] if entry else {}
+
+    def _next_update(self, now: float) -> float:
+        """Forecasts change on update boundaries, so cache until the next one."""
+        return (now // self.update_interval + 1) * self.update_interval
+
+
+_default_client = WeatherClient()
+
+
+def get_weather(lat: float, lon: float, forecast_days: int = 16, hourly=HOURLY_FIELDS, daily=DAILY_FIELDS):
     """
-    Fetch detailed multi-day weather data from Open-Meteo (max info).
-    Returns current, hourly, and daily data for up to 16 days.
+    Fetch weather data from Open-Meteo.
+    By default returns current, hourly, and daily data (max info) for up to
+    16 days; pass `hourly`/`daily` field lists and a shorter `forecast_days`
+    to download only what is needed.
     """
+    return _default_client.get_weather(lat, lon, forecast_days, hourly=hourly, daily=daily)
 
-    url = (
-        "https://api.open-meteo.com/v1/forecast?"
-        f"latitude={lat}&longitude={lon}"
-        "&current_weather=true"
-        "&hourly=temperature_2m,apparent_temperature,precipitation,precipitation_probability,"
-        "cloud_cover,cloud_cover_low,cloud_cover_mid,cloud_cover_high,weathercode,"
-        "windspeed_10m,winddirection_10m,visibility"
-        "&daily=temperature_2m_max,temperature_2m_min,apparent_temperature_max,apparent_temperature_min,"
-        "precipitation_sum,precipitation_hours,precipitation_probability_max,sunshine_duration,"
-        "uv_index_max,weathercode,wind_speed_10m_max,wind_gusts_10m_max,sunrise,sunset"
-        f"&forecast_days={forecast_days}"
-        "&timezone=auto"
-    )
-
-    try:
-        r = requests.get(url)
-        r.raise_for_status()
-        return r.json()
-    except Exception as e:
-        print("Weather API error:", e)
-        return {}
+
+def get_weather_many(coords, forecast_days: int = 16, hourly=HOURLY_FIELDS, daily=DAILY_FIELDS):
+    """
+    Fetch weather for several (lat, lon) pairs with a single Open-Meteo call.
+    Returns one response dict per pair, in the same order.
+    """
+    return _default_client.get_weather_many(coords, forecast_days, hourly=hourly, daily=daily)
@@ -0,0 +1,169 @@
+import warnings
+import numpy as np
+
+# Daily fields holding timestamps rather than numbers
+DAILY_TIME_FIELDS = ("sunrise", "sunset")
+
+AGGREGATIONS = {
+    "mean": np.nanmean,
+    "min": np.nanmin,
+    "max": np.nanmax,
+    "sum": np.nansum,
+}
+
+
+def scalar(value, digits: int = 1):
+    """
+    A float32 value as a short JSON number: rounded to the API's precision
+    (28.6, not 28.600000381469727) and whole numbers as ints.
+    """
+    value = round(float(value), digits)
+    return int(value) if value.is_integer() else value
+
+
+class WeatherFrame:
+    """
+    Columnar view of an Open-Meteo response.
+
+    The JSON is walked once: every numeric series becomes a contiguous
+    float32 array (NaN where the API returned null) and the time axes
+    become datetime64 arrays, so any day or hour window can be aggregated
+    with vectorized NumPy calls instead of per-field Python lookups.
+    """
+
+    def __init__(self, weather_data: dict):
+        self.current = weather_data.get("current_weather", {}) or {}
+
+        daily = weather_data.get("daily", {}) or {}
+        self.dates = np.array(daily.get("time", []), dtype="datetime64[D]")
+        self.daily = {}
+        for name, values in daily.items():
+            if name == "time" or len(values) != len(self.dates):
+                continue
+            if name in DAILY_TIME_FIELDS:
+                self.daily[name] = np.array([v or "NaT" for v in values], dtype="datetime64[m]")
+            else:
+                self.daily[name] = np.array(values, dtype=np.float32)
+
+        hourly = weather_data.get("hourly", {}) or {}
+        self.hours = np.array(hourly.get("time", []), dtype="datetime64[m]")
+        self.hourly = {
+            name: np.array(values, dtype=np.float32)
+            for name, values in hourly.items()
+            if name != "time" and len(values) == len(self.hours)
+        }
+
+    @property
+    def n_days(self) -> int:
+        return len(self.dates)
+
+    # ---------------------------------------------------------------
+    # Windows
+    # ---------------------------------------------------------------
+    def current_hour_index(self) -> int:
+        """Position of the current observation on the hourly axis (0 if unknown)."""
+        if not len(self.hours) or not self.current.get("time"):
+            return 0
+        now = np.datetime64(self.current["time"], "m")
+        index = np.searchsorted(self.hours, now, side="right") - 1
+        return int(np.clip(index, 0, len(self.hours) - 1))
+
+    def day_slice(self, start_day: int = 0, days: int = 1) -> slice:
+        start = max(0, min(start_day, self.n_days))
+        return slice(start, min(start + days, self.n_days))
+
+    def hour_slice(self, start_hour: int = 0, hours: int = 24) -> slice:
+        start = max(0, min(start_hour, len(self.hours)))
+        return slice(start, min(start + hours, len(self.hours)))
+
+    # ---------------------------------------------------------------
+    # Aggregations
+    # ---------------------------------------------------------------
+    @staticmethod
+    def _aggregate(values, how: str):
+        if not len(values) or np.isnan(values).all():
+            return None
+        return scalar(AGGREGATIONS[how](values))
+
+    def daily_stat(self, field: str, how: str = "mean", start_day: int = 0, days: int = 1):
+        """Aggregate a daily series over `days` days starting at `start_day` (0 = today)."""
+        if field not in self.daily:
+            return None
+        return self._aggregate(self.daily[field][self.day_slice(start_day, days)], how)
+
+    def hourly_stat(self, field: str, how: str = "mean", start_hour: int = 0, hours: int = 24):
+        """Aggregate an hourly series over an hour window (offsets from the first hour)."""
+        if field not in self.hourly:
+            return None
+        return self._aggregate(self.hourly[field][self.hour_slice(start_hour, hours)], how)
+
+    def hourly_by_day(self, field: str, how: str = "mean"):
+        """Per-day aggregate of an hourly series, one value per date (vectorized reshape)."""
+        if field not in self.hourly:
+            return np.array([], dtype=np.float32)
+        full_days = len(self.hourly[field]) // 24
+        values = self.hourly[field][:full_days * 24].reshape(full_days, 24)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN days stay NaN
+            return AGGREGATIONS[how](values, axis=1)
+
+    def rolling(self, field: str, window: int, how: str = "mean"):
+        """Rolling mean/sum of an hourly series; NaNs are skipped, windows with no data give NaN."""
+        values = self.hourly.get(field)
+        if values is None or len(values) < window:
+            return np.array([], dtype=np.float32)
+        valid = ~np.isnan(values)
+        sums = np.convolve(np.where(valid, values, 0), np.ones(window, dtype=np.float32), mode="valid")
+        if how == "sum":
+            return sums
+        counts = np.convolve(valid.astype(np.float32), np.ones(window, dtype=np.float32), mode="valid")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, sums / counts, np.nan).astype(np.float32)
+
+    def summarize_days(self, start_day: int = 0, days: int = 1) -> list:
+        """Per-day summary rows for a window, built from column slices."""
+        window = self.day_slice(start_day, days)
+        columns = {
+            "t_min": "temperature_2m_min",
+            "t_max": "temperature_2m_max",
+            "precip_mm": "precipitation_sum",
+            "precip_prob": "precipitation_probability_max",
+            "weathercode": "weathercode",
+        }
+        sliced = {key: self.daily[field][window] if field in self.daily else None for key, field in columns.items()}
+        sunshine = self.daily.get("sunshine_duration")
+        sunshine = np.round(np.nan_to_num(sunshine[window]) / 3600, 1) if sunshine is not None else None
+
+        rows = []
+        for i, date in enumerate(self.dates[window]):
+            row = {"date": str(date)}
+            for key, values in sliced.items():
+                row[key] = None if values is None or np.isnan(values[i]) else scalar(values[i])
+            if row["weathercode"] is not None:
+                row["weathercode"] = int(row["weathercode"])
+            row["sunshine_hours"] = scalar(sunshine[i]) if sunshine is not None else 0
+            rows.append(row)
+        return rows
+
+
+def stack_daily(frames, field: str, start_day: int = 0, days: int = 1):
+    """
+    One daily series for several locations as a (locations, days) matrix,
+    NaN where a location has no value, so they can be compared in one pass.
+    """
+    matrix = np.full((len(frames), days), np.nan, dtype=np.float32)
+    for i, frame in enumerate(frames):
+        if field in frame.daily:
+            values = frame.daily[field][frame.day_slice(start_day, days)]
+            matrix[i, :len(values)] = values
+    return matrix
+
+
+def reduce_rows(matrix, how: str = "mean"):
+    """Aggregate each row of a stacked matrix; all-NaN rows stay NaN."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        values = AGGREGATIONS[how](matrix, axis=1)
+    if how == "sum":
+        values[np.isnan(matrix).all(axis=1)] = np.nan
+    return values
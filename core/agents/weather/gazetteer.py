@@ -0,0 +1,247 @@
+from bisect import bisect_left
+from difflib import SequenceMatcher
+from pathlib import Path
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+import numpy as np
+
+DEFAULT_SOURCE = Path(__file__).resolve().parent / "data" / "cities.tsv"
+DEFAULT_CACHE_DIR = Path(os.path.expanduser("~/.cache/nexcai/gazetteer"))
+
+MAX_NGRAM = 4  # longest place name (in words) looked up in a query
+FUZZY_MIN_LENGTH = 5  # shorter words are only matched exactly
+FUZZY_MIN_RATIO = 0.85
+DOMINANCE = 10  # a homonym wins outright if it is this many times more populous
+
+# Place names that are also everyday words; only matched when capitalized
+COMMON_WORDS = {"nice", "essen", "bath", "reading", "split", "mobile", "orange", "rio", "sofia", "santiago"}
+STOPWORDS = {
+    "what", "whats", "will", "would", "weather", "forecast", "today", "tomorrow", "tonight",
+    "there", "their", "where", "about", "going", "which", "should", "could", "rain", "raining",
+    "sunny", "cloudy", "windy", "temperature", "weekend", "morning", "evening", "afternoon",
+    "compare", "between", "outside", "please", "umbrella", "jacket", "degrees",
+}
+
+
+def fold(text: str) -> str:
+    """Lowercase, strip accents and punctuation: 'München' -> 'munchen'."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.findall(r"\w+", text))
+
+
+class _SortedKeys:
+    """Read-only sequence view over the concatenated, sorted key blob (for bisect)."""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+
+class Gazetteer:
+    """
+    Offline place-name index for resolving cities to coordinates.
+
+    The source is either the bundled `data/cities.tsv` (name, alternate
+    names, lat, lon, country, population) or a GeoNames `citiesXXXX.txt`
+    dump. It is compiled once into flat NumPy arrays (a sorted key blob
+    with offsets plus posting lists into per-city columns) cached on disk,
+    and later loads memory-map those arrays instead of re-parsing.
+    Lookups are a binary search over the sorted keys; prefix ranges of the
+    same index serve fuzzy matching for misspelled names.
+    """
+
+    def __init__(self, source=DEFAULT_SOURCE, cache_dir=DEFAULT_CACHE_DIR):
+        self.source = Path(source)
+        self.cache_dir = Path(cache_dir)
+        self._arrays = self._load()
+        a = self._arrays
+        self._keys = _SortedKeys(a["key_blob"], a["key_offsets"])
+        self._names = _SortedKeys(a["name_blob"], a["name_offsets"])
+
+    # ---------------------------------------------------------------
+    # Compile / load
+    # ---------------------------------------------------------------
+    def _cache_path(self) -> Path:
+        stat = self.source.stat()
+        tag = hashlib.sha1(f"{self.source.resolve()}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:16]
+        return self.cache_dir / tag
+
+    def _load(self):
+        names = ("key_blob", "key_offsets", "post_offsets", "postings",
+                 "name_blob", "name_offsets", "lat", "lon", "country", "population")
+        path = self._cache_path()
+        try:
+            return {n: np.load(path / f"{n}.npy", mmap_mode="r") for n in names}
+        except (OSError, ValueError):
+            pass
+
+        arrays = self._compile()
+        try:
+            tmp = path.with_suffix(".tmp")
+            os.makedirs(tmp, exist_ok=True)
+            for n, array in arrays.items():
+                np.save(tmp / f"{n}.npy", array)
+            os.replace(tmp, path)
+        except OSError as e:
+            print("Could not cache gazetteer index:", e)
+        return arrays
+
+    def _read_source(self):
+        with open(self.source, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                cols = line.rstrip("\n").split("\t")
+                if len(cols) >= 19:  # GeoNames dump
+                    yield cols[1], [cols[2]] + cols[3].split(","), cols[4], cols[5], cols[8], cols[14]
+                else:
+                    yield cols[0], cols[1].split(","), cols[2], cols[3], cols[4], cols[5]
+
+    def _compile(self):
+        postings = {}
+        display, lat, lon, country, population = [], [], [], [], []
+        for city_id, (name, alternates, la, lo, cc, pop) in enumerate(self._read_source()):
+            display.append(name)
+            lat.append(float(la))
+            lon.append(float(lo))
+            country.append(cc)
+            population.append(int(pop or 0))
+            for alias in [name] + alternates:
+                key = fold(alias)
+                if key:
+                    postings.setdefault(key, set()).add(city_id)
+
+        keys = sorted(k.encode("utf-8") for k in postings)
+        key_offsets = np.cumsum([0] + [len(k) for k in keys], dtype=np.int64)
+        lists = [sorted(postings[k.decode("utf-8")]) for k in keys]
+        post_offsets = np.cumsum([0] + [len(p) for p in lists], dtype=np.int64)
+        encoded_names = [n.encode("utf-8") for n in display]
+        return {
+            "key_blob": np.frombuffer(b"".join(keys), dtype=np.uint8),
+            "key_offsets": key_offsets,
+            "post_offsets": post_offsets,
+            "postings": np.array([i for p in lists for i in p], dtype=np.int32),
+            "name_blob": np.frombuffer(b"".join(encoded_names), dtype=np.uint8),
+            "name_offsets": np.cumsum([0] + [len(n) for n in encoded_names], dtype=np.int64),
+            "lat": np.array(lat, dtype=np.float32),
+            "lon": np.array(lon, dtype=np.float32),
+            "country": np.array(country, dtype="S2"),
+            "population": np.array(population, dtype=np.int64),
+        }
+
+    # ---------------------------------------------------------------
+    # Lookup
+    # ---------------------------------------------------------------
+    def _city(self, city_id: int) -> dict:
+        a = self._arrays
+        return {
+            "name": self._names[city_id].decode("utf-8"),
+            "lat": round(float(a["lat"][city_id]), 4),
+            "lon": round(float(a["lon"][city_id]), 4),
+            "country": a["country"][city_id].decode("ascii"),
+            "population": int(a["population"][city_id]),
+        }
+
+    def _postings(self, key_index: int):
+        a = self._arrays
+        return a["postings"][a["post_offsets"][key_index]:a["post_offsets"][key_index + 1]]
+
+    def lookup(self, name: str):
+        """All cities whose name or alternate name equals `name` (folded), most populous first."""
+        key = fold(name).encode("utf-8")
+        i = bisect_left(self._keys, key)
+        if i == len(self._keys) or self._keys[i] != key:
+            return []
+        cities = [self._city(int(c)) for c in self._postings(i)]
+        return sorted(cities, key=lambda c: -c["population"])
+
+    def fuzzy_lookup(self, word: str):
+        """Closest single key sharing the first two letters of `word`, if similar enough."""
+        key = fold(word)
+        prefix = key[:2].encode("utf-8")
+        start = bisect_left(self._keys, prefix)
+        end = bisect_left(self._keys, prefix + b"\xff")
+        best, best_ratio = None, FUZZY_MIN_RATIO
+        for i in range(start, end):
+            candidate = self._keys[i].decode("utf-8")
+            if abs(len(candidate) - len(key)) > 3:
+                continue
+            ratio = SequenceMatcher(None, key, candidate).ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = candidate, ratio
+        return self.lookup(best) if best else []
+
+    def find(self, query: str):
+        """
+        Find place mentions in free text.
+        Returns a list of (matched text, candidate cities) in query order;
+        longer names win over the words inside them ("Frankfurt am Main").
+        """
+        tokens = re.findall(r"[^\W\d_]+(?:[-'][^\W\d_]+)*", query)
+        found, i = [], 0
+        while i < len(tokens):
+            for n in range(min(MAX_NGRAM, len(tokens) - i), 0, -1):
+                words = tokens[i:i + n]
+                phrase = " ".join(words)
+                if n == 1 and not self._could_be_place(words[0]):
+                    continue
+                cities = self.lookup(phrase)
+                if not cities and n == 1 and len(words[0]) >= FUZZY_MIN_LENGTH:
+                    cities = self.fuzzy_lookup(phrase)
+                if cities:
+                    found.append((phrase, cities))
+                    i += n
+                    break
+            else:
+                i += 1
+        return found
+
+    @staticmethod
+    def _could_be_place(word: str) -> bool:
+        folded = fold(word)
+        if folded in STOPWORDS:
+            return False
+        if folded in COMMON_WORDS and not word[:1].isupper():
+            return False
+        return True
+
+    def resolve(self, query: str):
+        """
+        Resolve the first place mentioned in `query`.
+        Returns (city, ambiguous): `city` is a dict or None; `ambiguous` is
+        True when several similarly sized homonyms match (e.g. Valencia ES/VE).
+        """
+        found = self.find(query)
+        if not found:
+            return None, False
+        return pick(found[0][1])
+
+
+def pick(cities):
+    """Choose among homonyms: the most populous wins if it clearly dominates."""
+    if len(cities) == 1 or cities[0]["population"] >= DOMINANCE * max(cities[1]["population"], 1):
+        return cities[0], False
+    return None, True
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    """Return the process-wide gazetteer built from the bundled city list."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Gazetteer()
+        return _default
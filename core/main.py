@@ -1,33 +1,98 @@
-from core.orchestrator.router import route_query
-from core.agents.weather.agent import WeatherAgent
-from core.agents.general.agent import GeneralAgent
-from core.agents.calendar.agent import CalendarAgent
+import argparse
+import time
+
+_started = time.perf_counter()
+from core.orchestrator.router import IntentRouter
+from core.orchestrator.registry import AgentRegistry
+from core.utils.llm_interface import prefix_stats
+from core.utils.shared import TIMINGS, enable_response_cache, get_encoder, record_timing
+record_timing("import core (router, registry)", time.perf_counter() - _started)
+
+
+def print_startup_profile(registry: AgentRegistry):
+    """Load everything up front and report where the cold start goes."""
+    for name in registry.specs:
+        try:
+            registry.get(name)
+        except Exception as e:
+            print(f"Could not load {name} agent:", e)
+    print("\nStartup profile (nested steps are included in their parents):")
+    for label, seconds in sorted(TIMINGS, key=lambda t: t[1], reverse=True):
+        print(f"  {seconds:8.3f}s  {label}")
+    print()
+
+
+def print_prompt_stats():
+    """How often prompts started with the same cached system prefix as the previous call."""
+    stats = prefix_stats()
+    if not stats:
+        return
+    print("\nPrompt prefix reuse:")
+    for label, s in sorted(stats.items()):
+        reused = f", ~{s['reused_fraction']:.0%} of prompt tokens reused" if "reused_fraction" in s else ""
+        print(f"  {label:<16} {s['calls']:4d} calls, prefix hit rate {s['prefix_hit_rate']:.0%}{reused}")
+
+
 def main():
+    parser = argparse.ArgumentParser(description="NEXCAI modular assistant")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="load every agent at startup and print import/load times")
+    parser.add_argument("--no-prewarm", action="store_true",
+                        help="do not pre-load agents in the background")
+    parser.add_argument("--cache-answers", action="store_true",
+                        help="reuse answers to repeated questions while their grounding data is unchanged")
+    parser.add_argument("--prompt-stats", action="store_true",
+                        help="print prompt prefix reuse statistics on exit")
+    args = parser.parse_args()
+
+    if args.cache_answers:
+        enable_response_cache()
+
+    registry = AgentRegistry()
+    # Shared with long-term memory; the model itself loads on first use
+    router = IntentRouter(encoder=get_encoder())
+
+    if args.profile_startup:
+        print_startup_profile(registry)
+    elif not args.no_prewarm:
+        # Calendar is left out: connecting may need interactive OAuth
+        registry.prewarm(["general", "weather"])
+
     print("🤖 NEXCAI Modular Assistant Ready")
     print("(type 'exit' to quit)\n")
 
-    weather_agent = WeatherAgent()
-    general_agent = GeneralAgent()
-    calendar_agent = CalendarAgent()
+    try:
+        while True:
+            query = input("You: ")
+            if query.lower() in ["exit", "quit", "q"]:
+                print("Goodbye!")
+                break
 
-    while True:
-        query = input("You: ")
-        if query.lower() in ["exit", "quit", "q"]:
-            print("Goodbye!")
-            break
+            # Retrieval does not depend on the route, so start it right away
+            if registry.is_loaded("general"):
+                registry.get("general").prefetch(query)
 
-        intent = route_query(query)
-        print(f"[Router → {intent.upper()}]")
+            route = router.route(query)
+            intent = route["intent"]
+            confidence = f"{route['confidence']:.2f}" if route["confidence"] is not None else "n/a"
+            print(f"[Router → {intent.upper()} via {route['tier']}, confidence {confidence}]")
 
-        if intent == "weather":
-            reply = weather_agent.run(query)
-        elif intent == "calendar":
-            reply = calendar_agent.run(query)
-        else:
-            reply = general_agent.run(query)
+            if intent == "general":
+                # Render the general answer token by token as it is generated
+                print("NEXCAI: ", end="", flush=True)
+                for piece in registry.get("general").run_stream(query):
+                    print(piece, end="", flush=True)
+                print("\n")
+                continue
 
-        print("NEXCAI:", reply)
-        print()
+            reply = registry.get(intent).run(query)
+            print("NEXCAI:", reply)
+            print()
+    finally:
+        # Let queued long-term memory writes land before exiting
+        registry.close()
+        if args.prompt_stats:
+            print_prompt_stats()
 
 if __name__ == "__main__":
     main()
@@ -1,30 +1,163 @@
-from typing import List, Dict
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict
+import threading
+from core.utils.llm_interface import background
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English with llama tokenizers)."""
+    return len(text) // 4 + 1
+
 
 class ConversationMemory:
     """
         Keeps track of the last few chat turns between user and assistant.
         This allows Jarvis to maintain short-term context.
+
+        The context is bounded both in messages (`max_length`) and in
+        estimated tokens (`max_tokens`), and single messages longer than
+        `max_message_tokens` are shortened, so prompt size stays flat no
+        matter how long the conversation gets. If an `llm` is given,
+        turns that fall out of the window are folded into a short running
+        summary in the background.
     """
 
-    def __init__(self, max_length: int=10):
-        # stores messages as [{"role": "user"/"assistant", "content": "..."}]
-        self.history: List[Dict[str, str]] = []
+    def __init__(self, max_length: int = 10, max_tokens: int = 1024, max_message_tokens: int = 300,
+                 llm=None, summary_tokens: int = 120, summarize_every: int = 200):
+        # stores messages as {"role": "user"/"assistant", "content": "...", "tokens": n}
+        self.history: Deque[Dict] = deque()
         self.max_length = max_length
-    def add(self, role:str, content:str):
+        self.max_tokens = max_tokens
+        self.max_message_tokens = max_message_tokens
+        self.llm = llm
+        self.summary_tokens = summary_tokens
+        self.summarize_every = summarize_every  # evicted tokens collected before asking for a summary
+
+        self.summary = ""
+        self._tokens = 0
+        self._context = None  # rendered history, rebuilt only after evictions
+        self._evicted = []
+        self._evicted_tokens = 0
+        self._summarizing = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def add(self, role: str, content: str):
         """
             Add a new message to memory.
         """
-        self.history.append({"role": role, "content": content})
-        if len(self.history) > self.max_length:
-            self.history.pop(0)
-        
+        content = self._shorten(content)
+        message = {"role": role, "content": content, "tokens": estimate_tokens(content)}
+        with self._lock:
+            self.history.append(message)
+            self._tokens += message["tokens"]
+            if self._context is not None:
+                line = self._render(message)
+                self._context = f"{self._context}\n{line}" if self._context else line
+
+            # always keep the newest message, however long
+            while len(self.history) > 1 and (len(self.history) > self.max_length or self._tokens > self.max_tokens):
+                evicted = self.history.popleft()
+                self._tokens -= evicted["tokens"]
+                self._evicted.append(self._render(evicted))
+                self._evicted_tokens += evicted["tokens"]
+                self._context = None
+        self._maybe_summarize()
+
     def get_context(self) -> str:
         """
             Return concatenated conversation history as text context.
         """
-        context_lines = [f"{m['role'].capitalize()}: {m['content']}" for m in self.history]
-        return "\n".join(context_lines)
+        with self._lock:
+            if self._context is None:
+                self._context = "\n".join(self._render(m) for m in self.history)
+            if self.summary:
+                return f"Earlier in the conversation: {self.summary}\n{self._context}"
+            return self._context
+
+    def get_messages(self):
+        """History as chat messages, oldest first (the running summary is not included)."""
+        with self._lock:
+            return [{"role": m["role"], "content": m["content"]} for m in self.history]
+
+    def token_count(self) -> int:
+        """Estimated tokens of the context returned by `get_context`."""
+        return self._tokens + (estimate_tokens(self.summary) if self.summary else 0)
 
     def clear(self):
         """Clear the conversation memory."""
-        self.history = []
\ No newline at end of file
+        with self._lock:
+            self.history.clear()
+            self.summary = ""
+            self._tokens = 0
+            self._context = None
+            self._evicted = []
+            self._evicted_tokens = 0
+
+    def close(self):
+        """Wait for a running summary to finish."""
+        executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True)
+
+    # ---------------------------------------------------------------
+    # Helpers
+    # ---------------------------------------------------------------
+    @staticmethod
+    def _render(message: Dict) -> str:
+        return f"{message['role'].capitalize()}: {message['content']}"
+
+    def _shorten(self, content: str) -> str:
+        """Keep the head and tail of an overlong message (pasted logs, documents)."""
+        limit = self.max_message_tokens * 4
+        if len(content) <= limit:
+            return content
+        head = content[:limit * 2 // 3]
+        tail = content[-(limit // 3):]
+        return f"{head} […] {tail}"
+
+    # ---------------------------------------------------------------
+    # Rolling summary of evicted turns
+    # ---------------------------------------------------------------
+    def _maybe_summarize(self):
+        if self.llm is None:
+            with self._lock:
+                self._evicted = []
+                self._evicted_tokens = 0
+            return
+
+        with self._lock:
+            if self._evicted_tokens < self.summarize_every:
+                return
+            if self._summarizing is not None and not self._summarizing.done():
+                return
+            lines, self._evicted, self._evicted_tokens = self._evicted, [], 0
+            previous = self.summary
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-summary")
+            self._summarizing = self._executor.submit(self._summarize, previous, lines)
+
+    def _summarize(self, previous: str, lines):
+        prompt = f"""
+        Update the summary of an ongoing conversation between a user and an assistant.
+        Keep names, facts, dates and open requests; drop small talk.
+        Answer with the new summary only, in at most 3 sentences.
+
+        Current summary:
+        {previous or "None"}
+
+        Messages to add:
+        {chr(10).join(lines)}
+        """
+        try:
+            with background():  # nobody is waiting on the summary, so replies go first
+                summary = self.llm.chat(prompt).strip()
+        except Exception as e:
+            print("Could not summarize conversation:", e)
+            return
+        if not summary or summary.startswith("Error:"):
+            return
+        limit = self.summary_tokens * 4
+        with self._lock:
+            self.summary = summary if len(summary) <= limit else summary[:limit].rsplit(" ", 1)[0] + "…"
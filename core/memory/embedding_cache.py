@@ -0,0 +1,127 @@
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import os
+import threading
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache in front of a sentence encoder.
+
+    Entries are keyed by a hash of the model name and the normalized text,
+    so the same sentence is only run through the model once no matter how
+    many components ask for it. If `cache_dir` is given, embeddings are
+    also kept on disk and survive restarts.
+
+    Exposes `encode(texts)` and can be used wherever the raw model is.
+    Pass `model=None` and a `loader` to defer loading the model until the
+    first cache miss.
+    """
+
+    def __init__(self, model, model_name: str, max_entries: int = 2048, cache_dir=None, loader=None):
+        self._model = model
+        self._loader = loader
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self._loader()
+        return self._model
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        # all-MiniLM-L6-v2 is uncased, so case and spacing do not change the embedding
+        return " ".join(text.casefold().split())
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\0{self.normalize(text)}".encode("utf-8")).hexdigest()
+
+    def encode(self, texts):
+        """Return float32 embeddings for `texts`, encoding only the cache misses (in one batch)."""
+        keys = [self.key(t) for t in texts]
+        vectors = [None] * len(texts)
+        missing = []
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._get(key)
+                if vector is None:
+                    missing.append(i)
+                else:
+                    vectors[i] = vector
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            # texts repeated within one call are encoded once
+            pending = {keys[i]: texts[i] for i in missing}
+            encoded = np.asarray(self.model.encode(list(pending.values())), dtype=np.float32)
+            by_key = dict(zip(pending, encoded))
+            with self._lock:
+                for key, vector in by_key.items():
+                    self._put(key, vector)
+            for i in missing:
+                vectors[i] = by_key[keys[i]]
+
+        if not vectors:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.stack(vectors)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+        }
+
+    # ---------------------------------------------------------------
+    # Storage (callers hold the lock)
+    # ---------------------------------------------------------------
+    def _get(self, key: str):
+        vector = self._entries.get(key)
+        if vector is not None:
+            self._entries.move_to_end(key)
+            return vector
+        path = self._disk_path(key)
+        if path is not None and path.exists():
+            vector = np.load(path)
+            self._remember(key, vector)
+            return vector
+        return None
+
+    def _put(self, key: str, vector):
+        self._remember(key, vector)
+        path = self._disk_path(key)
+        if path is not None and not path.exists():
+            os.makedirs(path.parent, exist_ok=True)
+            tmp = path.with_suffix(".tmp.npy")
+            np.save(tmp, vector)
+            os.replace(tmp, path)
+
+    def _remember(self, key: str, vector):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key: str):
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / key[:2] / f"{key}.npy"
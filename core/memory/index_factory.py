@@ -0,0 +1,78 @@
+import math
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+
+
+def default_nlist(n: int) -> int:
+    """Number of IVF cells for `n` vectors (~4·sqrt(n), at least 39 training points per cell)."""
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def build_index(kind: str, dimension: int, vectors=None, metric=faiss.METRIC_L2,
+                nlist: int = None, hnsw_m: int = 32, pq_m: int = 16, refine_k: int = 64):
+    """
+    Build a FAISS index of the given kind and fill it with `vectors`.
+
+    - flat:  exact brute-force search
+    - hnsw:  graph-based ANN, no training needed
+    - ivf:   inverted lists over k-means cells, trained on `vectors`
+    - ivfpq: IVF with product-quantized codes (pq_m bytes per vector); the
+             codes only pick `refine_k` x k candidates, which are re-ranked
+             exactly against the full vectors (PQ distances alone rank too
+             coarsely for memory retrieval)
+    """
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{kind}', expected one of {INDEX_TYPES}")
+    vectors = np.empty((0, dimension), dtype=np.float32) if vectors is None else \
+        np.ascontiguousarray(vectors, dtype=np.float32)
+    n = len(vectors)
+
+    if kind == "flat":
+        index = faiss.IndexFlat(dimension, metric)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m, metric)
+        index.hnsw.efConstruction = 80
+        index.hnsw.efSearch = 64
+    else:
+        if n == 0:
+            raise ValueError(f"'{kind}' index needs training vectors")
+        nlist = nlist or default_nlist(n)
+        quantizer = faiss.IndexFlat(dimension, metric)
+        if kind == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, metric)
+        else:
+            # 8-bit codebooks need ~10k training points; use fewer bits for small stores
+            nbits = max(1, min(8, int(math.log2(max(n // 39, 2)))))
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, nbits, metric)
+        index.train(vectors)
+        index.nprobe = max(1, nlist // 8)
+        if kind == "ivfpq":
+            index = faiss.IndexRefineFlat(index)
+            index.k_factor = refine_k
+
+    if n:
+        index.add(vectors)
+    return index
+
+
+def index_kind(index) -> str:
+    """Inverse of build_index: report which kind an index is."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexRefine):
+        return index_kind(index.base_index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def recall_at_k(exact_ids, approx_ids) -> float:
+    """Fraction of the exact top-k neighbours that the approximate search also found."""
+    k = exact_ids.shape[1]
+    hits = sum(len(set(e) & set(a)) for e, a in zip(exact_ids, approx_ids))
+    return hits / (len(exact_ids) * k)
@@ -1,44 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
+import hashlib
 import os
+import re
+import threading
 import faiss
 import json
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from core.utils.llm_interface import LLMInterface
+from core.utils.llm_interface import background
+from core.utils.shared import data_dir, get_encoder, get_llm
+from core.memory.memory_log import MemoryLog
+from core.memory.index_factory import INDEX_TYPES, build_index, default_nlist, index_kind
+
+MIN_TRAINING_VECTORS = 1000  # IVF variants stay flat until there is enough to train on
+FILTER_BATCH_SIZE = 25  # texts judged per memorability prompt in add_many()
+COMPACT_RATIO = 0.25  # compact the log once this share of its text records is superseded
+DEFAULT_USER = "default"
+STORE_FILES = ("vectors.f32", "memories.jsonl", "index.snapshot", "snapshot.json", "faiss_index.bin", "memories.json")
+
+
+def user_memory_dir(user_id: str = DEFAULT_USER, root=None) -> Path:
+    """Directory of one user's store; ids are made filesystem-safe and kept distinct by a hash suffix."""
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", user_id)[:40].strip("_") or "user"
+    digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:10]
+    return Path(root or data_dir()) / "memory" / f"{slug}-{digest}"
+
+
+def _adopt_package_store(target: Path):
+    """Move a store written inside the package directory (older versions) to `target`."""
+    package_dir = Path(__file__).resolve().parent
+    if any((target / name).exists() for name in STORE_FILES):
+        return
+    if not any((package_dir / name).exists() for name in ("memories.jsonl", "memories.json")):
+        return
+    for name in STORE_FILES:
+        if (package_dir / name).exists():
+            os.replace(package_dir / name, target / name)
+    print(f"Moved long-term memory to {target}.")
+
+
+def simhash(text: str, bits: int = 64) -> int:
+    """SimHash over word trigrams of the normalized text; equal for near-identical wording."""
+    words = re.findall(r"\w+", text.casefold())
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+    weights = [0] * bits
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for b in range(bits):
+            weights[b] += 1 if h >> b & 1 else -1
+    return sum(1 << b for b in range(bits) if weights[b] > 0)
+
+
+class MemoryClosed(RuntimeError):
+    """Raised when writing to a LongTermMemory after close()."""
 
 
 class LongTermMemory:
     """
     FAISS-based vector database for persistent user-specific memory.
     Uses an LLM to decide which pieces of information are worth storing.
+
+    `index_type` is one of "flat", "ivf", "hnsw", "ivfpq" or "auto".
+    "auto" searches exactly until the store reaches `promote_at` entries,
+    then switches to the `promote_to` ANN index.
+
+    Embeddings are L2-normalized and indexed by inner product, so search
+    scores are cosine similarities. A new text whose nearest memory scores
+    at least `dedup_threshold` (or, with `text_fingerprints`, has the same
+    SimHash) is merged into that memory instead of being stored again.
+
+    The store lives in `base_dir`, by default the "default" user's
+    directory under `data_dir()`. With `mmap`, an up-to-date flat or HNSW
+    snapshot is memory-mapped rather than loaded, so many mostly idle
+    stores can be open at once (see core.memory.shards). After `close()`
+    the store rejects writes with MemoryClosed.
+
+    `encoder` and `llm` default to the process-wide ones. The encoder's
+    model is not loaded to open an existing store: the dimension comes
+    from `dimension`, else the store's snapshot manifest, and only then
+    from the model.
     """
 
-    def __init__(self, base_dir=None):
-        # --- dynamic base directory ---
+    def __init__(self, base_dir=None, snapshot_every: int = 1000, index_type: str = "auto",
+                 promote_to: str = "hnsw", promote_at: int = 50_000, encoder=None, dimension: int = None,
+                 llm=None, dedup_threshold: float = 0.9, text_fingerprints: bool = False, mmap: bool = True):
+        if index_type != "auto" and index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}'")
+        if promote_to not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{promote_to}'")
+
+        # --- per-user directory under the data dir ---
+        adopt = base_dir is None
         if base_dir is None:
-            base_dir = Path(__file__).resolve().parent  # => core/memory/
+            base_dir = user_memory_dir(DEFAULT_USER)
+        base_dir = Path(base_dir)
         os.makedirs(base_dir, exist_ok=True)
+        if adopt:
+            _adopt_package_store(base_dir)
+        self.base_dir = base_dir
 
-        self.index_path = base_dir / "faiss_index.bin"
-        self.meta_path  = base_dir / "memories.json"
+        # --- embeddings + LLM (shared with the rest of the process) ---
+        # search(), add() and the router usually see the same text within one turn
+        self.encoder = encoder if encoder is not None else get_encoder("all-MiniLM-L6-v2")
+        self._dimension = dimension or MemoryLog.saved_dimension(base_dir)
+        self.llm = llm if llm is not None else get_llm("llama3:8b")
 
-        # --- embeddings + LLM ---
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
-        self.dimension = self.model.get_sentence_embedding_dimension()
-        self.llm = LLMInterface(model="llama3:8b")
+        # --- append-only persistence ---
+        self.log = MemoryLog(base_dir, self.dimension)
+        self.snapshot_every = snapshot_every  # inserts between FAISS snapshots
+        self.index_type = index_type
+        self.promote_to = promote_to
+        self.promote_at = promote_at
+        self.dedup_threshold = dedup_threshold
+        self.text_fingerprints = text_fingerprints
+        self.mmap = mmap
+        self.index, self.memories = self._load()
+        # SimHash → memory id, for near-exact duplicates
+        self._fingerprints = {simhash(t): i for i, t in enumerate(self.memories)} if text_fingerprints else {}
 
-        # --- load FAISS index ---
-        if self.index_path.exists():
-            self.index = faiss.read_index(str(self.index_path))
-        else:
-            self.index = faiss.IndexFlatL2(self.dimension)
+        # --- background ingestion ---
+        # index/memories are shared between the caller and the writer thread
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()
+        self._writer = None
+        self._pending = set()
+        self._closed = False
 
-        # --- load stored text metadata ---
-        if self.meta_path.exists():
-            with open(self.meta_path, "r") as f:
-                self.memories = json.load(f)
-        else:
-            self.memories = []
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = self.encoder.model.get_sentence_embedding_dimension()
+        return self._dimension
 
     # ---------------------------------------------------------------
     # LLM check — is this fact worth remembering?
@@ -70,27 +162,217 @@ class LongTermMemory:
         result = self.llm.chat(prompt).strip().lower()
         return result.startswith("yes")
 
+    def _memorable_batch(self, texts):
+        """One LLM call deciding memorability for several texts at once."""
+        numbered = "\n".join(f"{i}. {json.dumps(t)}" for i, t in enumerate(texts, 1))
+        prompt = f"""
+        You are NEXCAI, a highly selective assistant memory filter.
+
+        For each numbered statement below, decide if it contains meaningful, personal,
+        or factual information about the user that should be stored in long-term memory.
+
+        Examples of "YES":
+        - "I live in Munich."
+        - "I'm studying Data Science at LMU."
+        - "Tomorrow I will have an interview at Sony."
+
+        Examples of "NO":
+        - "Hi"
+        - "Thank you"
+        - "What time is it?"
+
+        Respond ONLY with one line per statement, in order, formatted as
+        <number>: YES
+        or
+        <number>: NO
+
+        Statements:
+        {numbered}
+        """
+
+        decisions = [False] * len(texts)  # unanswered items are not stored
+        for number, answer in re.findall(r"(\d+)\s*[:.)-]\s*(yes|no)", self.llm.chat(prompt), re.IGNORECASE):
+            i = int(number) - 1
+            if 0 <= i < len(texts):
+                decisions[i] = answer.lower() == "yes"
+        return decisions
+
     # ---------------------------------------------------------------
     # Add new memory entry (LLM-filtered)
     # ---------------------------------------------------------------
     def add(self, text: str):
+        self._check_open()
+        self._add(text)
+
+    def _add(self, text: str):
         if not self._is_memorable(text):
             return  # skip if LLM says not important
 
-        # check duplicates
-        if self.memories:
-            matches = self.search(text, k=1)
-            if matches:
-                from difflib import SequenceMatcher
-                ratio = SequenceMatcher(None, text.lower(), matches[0].lower()).ratio()
-                if ratio > 0.8:
-                    return  # skip duplicate-like
+        vector = self._embed([text])
+        with self._lock:
+            # near-duplicates update the existing memory instead of adding a new one
+            duplicate = self._fingerprint_match(text)
+            if duplicate is None and self.memories:
+                scores, ids = self.index.search(vector, 1)
+                if ids[0, 0] >= 0 and scores[0, 0] >= self.dedup_threshold:
+                    duplicate = int(ids[0, 0])
+            if duplicate is not None:
+                self._merge(duplicate, text)
+                return
+
+            self._store(vector, [text])
 
-        # encode + store
-        vector = self.model.encode([text])
-        self.index.add(np.array(vector, dtype=np.float32))
-        self.memories.append(text)
-        self._save()
+        if self._needs_rebuild(self.index, len(self.memories)):
+            self._rebuild()
+
+    # ---------------------------------------------------------------
+    # Bulk import (batched filter, encode, dedup and save)
+    # ---------------------------------------------------------------
+    def add_many(self, texts, filter_batch_size: int = FILTER_BATCH_SIZE):
+        """
+        Add many texts at once.
+        Memorability is judged `filter_batch_size` texts per LLM call, all
+        survivors are encoded in one batch, duplicates (against the store and
+        within the batch) are found with one vectorized search, and the log
+        is appended once. Returns the texts that were stored as new memories.
+        """
+        self._check_open()
+        texts = [t for t in texts if t and t.strip()]
+        keep = []
+        for start in range(0, len(texts), filter_batch_size):
+            chunk = texts[start:start + filter_batch_size]
+            keep.extend(t for t, ok in zip(chunk, self._memorable_batch(chunk)) if ok)
+        if not keep:
+            return []
+
+        vectors = self._embed(keep)
+
+        with self._lock:
+            # nearest stored neighbour of every candidate, in one search
+            if self.memories:
+                stored_scores, stored_ids = self.index.search(vectors, 1)
+            else:
+                stored_scores = np.full((len(keep), 1), -np.inf, dtype=np.float32)
+                stored_ids = np.full((len(keep), 1), -1)
+
+            # nearest earlier candidate within the batch
+            similarity = vectors @ vectors.T
+            similarity[np.triu_indices(len(keep))] = -np.inf
+            batch_ids = similarity.argmax(axis=1)
+            batch_scores = similarity[np.arange(len(keep)), batch_ids]
+
+            # where each candidate ended up: ("stored", memory id) or ("new", position)
+            placed = []
+            new_rows, new_texts = [], []
+            for i, text in enumerate(keep):
+                duplicate = self._fingerprint_match(text)
+                if duplicate is None and stored_ids[i, 0] >= 0 and stored_scores[i, 0] >= self.dedup_threshold:
+                    duplicate = int(stored_ids[i, 0])
+                if duplicate is not None:
+                    self._merge(duplicate, text)
+                    placed.append(("stored", duplicate))
+                elif i > 0 and batch_scores[i] >= self.dedup_threshold:
+                    kind, ref = placed[batch_ids[i]]
+                    if kind == "stored":
+                        self._merge(ref, text)
+                    else:
+                        new_texts[ref] = text  # the later wording wins
+                    placed.append((kind, ref))
+                else:
+                    placed.append(("new", len(new_texts)))
+                    new_rows.append(i)
+                    new_texts.append(text)
+
+            if new_rows:
+                self._store(vectors[new_rows], new_texts)
+
+        if self._needs_rebuild(self.index, len(self.memories)):
+            self._rebuild()
+        return new_texts
+
+    # ---------------------------------------------------------------
+    # Embedding + dedup helpers (callers hold the lock where noted)
+    # ---------------------------------------------------------------
+    def _embed(self, texts):
+        vectors = np.array(self.encoder.encode(texts), dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        return vectors
+
+    def _fingerprint_match(self, text: str):
+        if not self.text_fingerprints:
+            return None
+        return self._fingerprints.get(simhash(text))
+
+    def _store(self, vectors, texts):
+        # lock held
+        first_id = len(self.memories)
+        self.index.add(vectors)
+        self.memories.extend(texts)
+        self._save(vectors, texts)
+        if self.text_fingerprints:
+            for offset, text in enumerate(texts):
+                self._fingerprints[simhash(text)] = first_id + offset
+
+    def _merge(self, memory_id: int, text: str):
+        """Upsert: keep the existing vector, but store the newest wording. Lock held."""
+        if self.memories[memory_id] == text:
+            return
+        self.memories[memory_id] = text
+        self.log.update(memory_id, text)
+        if self.text_fingerprints:
+            self._fingerprints[simhash(text)] = memory_id
+        if self.log.superseded > max(100, COMPACT_RATIO * len(self.memories)):
+            self.log.compact(self.log.read_vectors(len(self.memories)), self.memories)
+            self.log.snapshot(self.index)
+            self._unsnapshotted = 0
+
+    # ---------------------------------------------------------------
+    # Background ingestion (keeps the LLM filter off the reply path)
+    # ---------------------------------------------------------------
+    def add_async(self, text: str):
+        """Queue `add(text)` on the background writer and return its Future."""
+        with self._lock:
+            self._check_open()
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ltm-writer")
+            future = self._writer.submit(self._add_logged, text)
+            self._pending.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    def _forget(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def _add_logged(self, text: str):
+        try:
+            with background():  # wait behind user requests rather than being rejected
+                self._add(text)  # queued before close(), which waits for it
+        except Exception as e:
+            print("Long-term memory write failed:", e)
+
+    def _check_open(self):
+        if self._closed:
+            raise MemoryClosed(f"long-term memory in {self.base_dir} is closed")
+
+    def flush(self, timeout: float = None):
+        """Block until every queued memory write has finished."""
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending, timeout=timeout)
+
+    def close(self):
+        """Refuse new writes, finish the queued ones and stop the background writer."""
+        with self._lock:
+            self._closed = True
+        self.flush()
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+        with self._lock:
+            if self._unsnapshotted:
+                self.log.snapshot(self.index)
+                self._unsnapshotted = 0
 
     # ---------------------------------------------------------------
     # Search by similarity
@@ -98,15 +380,88 @@ class LongTermMemory:
     def search(self, query: str, k: int = 3):
         if len(self.memories) == 0:
             return []
-        q_vec = self.model.encode([query])
-        D, I = self.index.search(np.array(q_vec, dtype=np.float32), k)
-        results = [self.memories[i] for i in I[0] if i < len(self.memories)]
+        q_vec = self._embed([query])
+        with self._lock:
+            D, I = self.index.search(q_vec, k)
+            results = [self.memories[i] for i in I[0] if 0 <= i < len(self.memories)]
         return results
 
     # ---------------------------------------------------------------
-    # Save FAISS index + metadata
+    # Load FAISS index + metadata
+    # ---------------------------------------------------------------
+    def _load(self):
+        vectors, memories = self.log.load()
+        index, count = self.log.load_snapshot(mmap=self.mmap)
+        if index is not None and self.mmap and index_kind(index) in ("ivf", "ivfpq"):
+            # memory-mapped inverted lists are read-only, so add() would fail: read them in
+            index, count = self.log.load_snapshot()
+        if index is None or count > len(memories) or index.ntotal != count:
+            index, count = build_index("flat", self.dimension, metric=faiss.METRIC_INNER_PRODUCT), 0
+
+        # only the rows appended after the last snapshot need indexing
+        if len(vectors) > count:
+            index.add(self._normalized(vectors[count:]))
+        self._unsnapshotted = len(memories) - count
+
+        if self._needs_rebuild(index, len(memories)):
+            index = build_index(self._target_kind(len(memories)), self.dimension,
+                                self._normalized(vectors), metric=faiss.METRIC_INNER_PRODUCT)
+            self.log.snapshot(index)
+            self._unsnapshotted = 0
+        return index, memories
+
+    # ---------------------------------------------------------------
+    # Index strategy (flat → ANN promotion, IVF retraining)
+    # ---------------------------------------------------------------
+    def _target_kind(self, n: int) -> str:
+        kind = self.index_type
+        if kind == "auto":
+            kind = self.promote_to if n >= self.promote_at else "flat"
+        if kind in ("ivf", "ivfpq") and n < MIN_TRAINING_VECTORS:
+            kind = "flat"
+        return kind
+
+    @staticmethod
+    def _normalized(vectors):
+        # stores written before cosine dedup may hold unnormalized L2 vectors
+        vectors = np.array(vectors, dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        return vectors
+
+    def _needs_rebuild(self, index, n: int) -> bool:
+        kind = self._target_kind(n)
+        if index_kind(index) != kind or index.metric_type != faiss.METRIC_INNER_PRODUCT:
+            return True
+        # IVF cells were sized for the store at training time; retrain once it has grown well past that
+        if kind in ("ivf", "ivfpq"):
+            return default_nlist(n) >= 2 * faiss.extract_index_ivf(index).nlist
+        return False
+
+    def _rebuild(self):
+        # one rebuild at a time: a writer that crossed the threshold meanwhile finds nothing left to do
+        with self._rebuild_lock:
+            with self._lock:
+                n = len(self.memories)
+                if not self._needs_rebuild(self.index, n):
+                    return
+            kind = self._target_kind(n)
+            print(f"Rebuilding long-term memory index as '{kind}' ({n} entries)...")
+            index = build_index(kind, self.dimension, self._normalized(self.log.read_vectors(n)),
+                                metric=faiss.METRIC_INNER_PRODUCT)
+            with self._lock:
+                # rows stored while the new index was being built
+                if len(self.memories) > n:
+                    index.add(self._normalized(self.log.read_vectors(len(self.memories))[n:]))
+                self.index = index
+                self.log.snapshot(index)
+                self._unsnapshotted = 0
+
+    # ---------------------------------------------------------------
+    # Save new entries (append-only, periodic snapshot)
     # ---------------------------------------------------------------
-    def _save(self):
-        faiss.write_index(self.index, str(self.index_path))
-        with open(self.meta_path, "w") as f:
-            json.dump(self.memories, f, indent=2)
+    def _save(self, vectors, texts):
+        self.log.append(vectors, texts)
+        self._unsnapshotted += len(texts)
+        if self._unsnapshotted >= self.snapshot_every:
+            self.log.snapshot(self.index)
+            self._unsnapshotted = 0
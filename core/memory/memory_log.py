@@ -0,0 +1,214 @@
+from pathlib import Path
+import json
+import os
+import faiss
+import numpy as np
+
+
+class MemoryLog:
+    """
+    Append-only on-disk store for LongTermMemory.
+
+    Layout inside `base_dir`:
+    - vectors.f32     raw float32 rows, one per memory (memory-mappable)
+    - memories.jsonl  one {"text"} record per memory, same order as the vectors,
+                      plus {"id", "text"} records that replace an earlier text
+    - index.snapshot  periodic FAISS snapshot covering the first `count` rows
+    - snapshot.json   manifest for the snapshot ({"count": n, "dimension": d})
+
+    Inserts only append to the two log files, so their cost does not grow
+    with the store. Snapshots and compactions are written to a temporary
+    file first and atomically renamed into place.
+    """
+
+    def __init__(self, base_dir, dimension: int, fsync: bool = True):
+        self.base_dir = Path(base_dir)
+        self.dimension = dimension
+        self.fsync = fsync  # flush appends to disk before returning
+
+        self.vectors_path = self.base_dir / "vectors.f32"
+        self.texts_path = self.base_dir / "memories.jsonl"
+        self.snapshot_path = self.base_dir / "index.snapshot"
+        self.manifest_path = self.base_dir / "snapshot.json"
+
+        # pre-append-log files, migrated on first load
+        self.legacy_index_path = self.base_dir / "faiss_index.bin"
+        self.legacy_meta_path = self.base_dir / "memories.json"
+
+        self.superseded = 0  # update records a compaction would drop
+
+    @staticmethod
+    def saved_dimension(base_dir):
+        """Vector dimension recorded by the last snapshot in `base_dir`, or None."""
+        try:
+            with open(Path(base_dir) / "snapshot.json", "r") as f:
+                return json.load(f).get("dimension")
+        except (OSError, ValueError):
+            return None
+
+    # ---------------------------------------------------------------
+    # Load
+    # ---------------------------------------------------------------
+    def load(self):
+        """
+        Return (vectors, texts) for every complete record on disk.
+        `vectors` is a read-only memory map of shape (n, dimension).
+        A torn tail left by a crash mid-append is truncated away.
+        """
+        if not self.texts_path.exists() and self.legacy_meta_path.exists():
+            self._migrate_legacy()
+
+        texts, text_ends = self._read_texts()
+        row_bytes = 4 * self.dimension
+        n_rows = self._size(self.vectors_path) // row_bytes
+
+        n = min(n_rows, len(texts))
+        expected_text_bytes = text_ends[n - 1] if n else 0
+        if (self._size(self.vectors_path) != n * row_bytes
+                or self._size(self.texts_path) != expected_text_bytes):
+            self._truncate(n, expected_text_bytes)
+            texts = texts[:n]
+
+        return self.read_vectors(n), texts
+
+    def read_vectors(self, n: int):
+        """Memory-map the first `n` vector rows (read-only)."""
+        if n == 0:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(n, self.dimension))
+
+    def _read_texts(self):
+        # ends[i] is the byte offset just past the i-th memory's record
+        texts, ends = [], []
+        self.superseded = 0
+        if not self.texts_path.exists():
+            return texts, ends
+        offset = 0
+        with open(self.texts_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn final line
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                offset += len(line)
+                if "id" in record:
+                    if record["id"] < len(texts):
+                        texts[record["id"]] = record["text"]
+                        self.superseded += 1
+                    if ends:
+                        ends[-1] = offset
+                    continue
+                texts.append(record["text"])
+                ends.append(offset)
+        return texts, ends
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        return path.stat().st_size if path.exists() else 0
+
+    def _truncate(self, n: int, text_bytes: int):
+        if self.vectors_path.exists():
+            os.truncate(self.vectors_path, n * 4 * self.dimension)
+        if self.texts_path.exists():
+            os.truncate(self.texts_path, text_bytes)
+
+    # ---------------------------------------------------------------
+    # Append
+    # ---------------------------------------------------------------
+    def append(self, vectors, texts):
+        """Append records to the end of the log."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        lines = "".join(json.dumps({"text": t}) + "\n" for t in texts)
+
+        # vectors first: a crash in between leaves an extra row, which load() drops
+        with open(self.vectors_path, "ab") as f:
+            f.write(vectors.tobytes())
+            self._sync(f)
+        with open(self.texts_path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            self._sync(f)
+
+    def update(self, memory_id: int, text: str):
+        """Replace the text of an existing memory (its vector is kept)."""
+        with open(self.texts_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"id": memory_id, "text": text}) + "\n")
+            self._sync(f)
+        self.superseded += 1
+
+    def _sync(self, f):
+        if self.fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+    # ---------------------------------------------------------------
+    # Snapshots
+    # ---------------------------------------------------------------
+    def load_snapshot(self, mmap: bool = False):
+        """
+        Return (index, count) from the last snapshot, or (None, 0).
+        With `mmap`, the index data is memory-mapped from the snapshot file
+        instead of read into RAM, so idle stores cost little resident memory.
+        """
+        if not (self.snapshot_path.exists() and self.manifest_path.exists()):
+            return None, 0
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+            if manifest.get("dimension") != self.dimension:
+                return None, 0
+            flags = faiss.IO_FLAG_MMAP if mmap else 0
+            return faiss.read_index(str(self.snapshot_path), flags), manifest["count"]
+        except Exception as e:
+            print("Ignoring unreadable memory snapshot:", e)
+            return None, 0
+
+    def snapshot(self, index):
+        """Atomically persist `index` as covering the first `index.ntotal` rows."""
+        tmp_index = self.snapshot_path.with_suffix(".tmp")
+        faiss.write_index(index, str(tmp_index))
+        os.replace(tmp_index, self.snapshot_path)
+        self._write_json_atomic(self.manifest_path, {"count": index.ntotal, "dimension": self.dimension})
+
+    # ---------------------------------------------------------------
+    # Compaction
+    # ---------------------------------------------------------------
+    def compact(self, vectors, texts):
+        """Rewrite both log files from scratch and swap them in atomically."""
+        tmp_vectors = self.vectors_path.with_suffix(".tmp")
+        tmp_texts = self.texts_path.with_suffix(".tmp")
+        with open(tmp_vectors, "wb") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            self._sync(f)
+        with open(tmp_texts, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps({"text": t}) + "\n" for t in texts)
+            self._sync(f)
+        # a snapshot is only valid for the log it was taken from
+        if self.manifest_path.exists():
+            os.remove(self.manifest_path)
+        os.replace(tmp_vectors, self.vectors_path)
+        os.replace(tmp_texts, self.texts_path)
+        self.superseded = 0
+
+    def _write_json_atomic(self, path: Path, data):
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+            self._sync(f)
+        os.replace(tmp, path)
+
+    def _migrate_legacy(self):
+        with open(self.legacy_meta_path, "r") as f:
+            texts = json.load(f)
+        if self.legacy_index_path.exists():
+            index = faiss.read_index(str(self.legacy_index_path))
+            vectors = index.reconstruct_n(0, index.ntotal)
+        else:
+            vectors = np.empty((0, self.dimension), dtype=np.float32)
+        n = min(len(texts), len(vectors))
+        self.compact(vectors[:n], texts[:n])
+        os.replace(self.legacy_meta_path, self.legacy_meta_path.with_suffix(".json.bak"))
+        if self.legacy_index_path.exists():
+            os.replace(self.legacy_index_path, self.legacy_index_path.with_suffix(".bin.bak"))
+        print(f"Migrated {n} memories to the append-only log.")
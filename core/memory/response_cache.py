@@ -0,0 +1,85 @@
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+import time
+import numpy as np
+from core.memory.embedding_cache import EmbeddingCache
+
+
+class SemanticResponseCache:
+    """
+    Reuses LLM answers for questions that were already answered.
+
+    An entry matches when the new question embeds within `threshold`
+    cosine similarity of a cached one *and* the grounding the answer was
+    built from (weather summary, retrieved memories, ...) is identical,
+    compared by fingerprint. New grounding data therefore never gets an
+    old answer. Entries expire after `ttl` seconds; beyond `max_entries`
+    the least recently used entry is evicted.
+    """
+
+    def __init__(self, encoder, threshold: float = 0.95, ttl: float = 3600, max_entries: int = 256):
+        self.encoder = encoder
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (fingerprint, question) -> (vector, expires_at, answer)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(grounding) -> str:
+        if not isinstance(grounding, str):
+            grounding = json.dumps(grounding, sort_keys=True, default=str)
+        return hashlib.sha1(grounding.encode("utf-8")).hexdigest()
+
+    def _embed(self, question: str):
+        vector = np.asarray(self.encoder.encode([question])[0], dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def get(self, question: str, grounding=None):
+        """Cached answer for a similar question over the same grounding, or None."""
+        fingerprint = self.fingerprint(grounding)
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (_, expires_at, _) in self._entries.items() if expires_at <= now]:
+                del self._entries[key]
+            keys = [k for k in self._entries if k[0] == fingerprint]
+        if not keys:
+            self.misses += 1
+            return None
+
+        vector = self._embed(question)
+        with self._lock:
+            keys = [k for k in keys if k in self._entries]
+            if keys:
+                scores = np.stack([self._entries[k][0] for k in keys]) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self._entries.move_to_end(keys[best])
+                    self.hits += 1
+                    return self._entries[keys[best]][2]
+        self.misses += 1
+        return None
+
+    def put(self, question: str, answer: str, grounding=None):
+        if not answer or answer.startswith("Error:"):
+            return
+        key = (self.fingerprint(grounding), EmbeddingCache.normalize(question))
+        vector = self._embed(question)
+        with self._lock:
+            self._entries[key] = (vector, time.time() + self.ttl, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,169 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+import time
+from core.memory.longterm_memory import LongTermMemory, user_memory_dir
+
+
+class MemoryShards:
+    """
+    One LongTermMemory per user, under `<data dir>/memory/<user>/`.
+
+    At most `max_open` stores are kept open, least recently used first;
+    beyond that, or after `idle_timeout` seconds without use, a store is
+    flushed, snapshotted and dropped, and reopened from disk (memory-mapped)
+    on its next use. A store in use (see `use`) is only closed once the
+    call using it returns. The encoder and LLM client are shared by all
+    stores.
+    """
+
+    def __init__(self, root=None, max_open: int = 64, idle_timeout: float = 600, **memory_kwargs):
+        self.root = root  # None: data_dir(), resolved per store
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self.memory_kwargs = memory_kwargs
+        self._open = OrderedDict()  # user_id -> (LongTermMemory, last used)
+        self._closing = {}  # user_id -> Event set once its evicted store is closed
+        self._pins = {}  # id(store) -> calls using it
+        self._lock = threading.Lock()
+        self._unpinned = threading.Condition(self._lock)
+        self.opened = 0
+        self.evicted = 0
+
+    def get(self, user_id: str, pin: bool = False) -> LongTermMemory:
+        """
+        The user's store, opening it (and evicting the least recently used)
+        if needed. A pinned store must be released with `_unpin`.
+        """
+        while True:
+            with self._lock:
+                if user_id in self._open:
+                    memory, _ = self._open.pop(user_id)
+                    self._open[user_id] = (memory, time.monotonic())
+                    if pin:
+                        self._pin(memory)
+                    return memory
+                closing = self._closing.get(user_id)
+            if closing is None:
+                break
+            closing.wait()  # never open a second store on files still being written
+
+        memory = LongTermMemory(base_dir=user_memory_dir(user_id, self.root), **self.memory_kwargs)
+        with self._lock:
+            if user_id in self._open:  # opened concurrently; keep the first one
+                memory, _ = self._open[user_id]
+                if pin:
+                    self._pin(memory)
+                return memory
+            self._open[user_id] = (memory, time.monotonic())
+            if pin:
+                self._pin(memory)
+            self.opened += 1
+            evicted = []
+            while len(self._open) > self.max_open:
+                evicted.append(self._take_oldest())
+        self._close(evicted)
+        return memory
+
+    @contextmanager
+    def use(self, user_id: str):
+        """The user's store, kept open until the block ends even if it is evicted meanwhile."""
+        memory = self.get(user_id, pin=True)
+        try:
+            yield memory
+        finally:
+            self._unpin(memory)
+
+    def handle(self, user_id: str) -> "UserMemory":
+        """A LongTermMemory-like view of the user's store that survives eviction."""
+        return UserMemory(self, user_id)
+
+    def evict_idle(self) -> int:
+        """Close stores unused for `idle_timeout` seconds; returns how many."""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            evicted = []
+            while self._open and next(iter(self._open.values()))[1] < cutoff:
+                evicted.append(self._take_oldest())
+        self._close(evicted)
+        return len(evicted)
+
+    def close(self):
+        with self._lock:
+            evicted = [self._take_oldest() for _ in range(len(self._open))]
+        self._close(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"open": len(self._open), "opened": self.opened, "evicted": self.evicted}
+
+    # ---------------------------------------------------------------
+    # Eviction
+    # ---------------------------------------------------------------
+    def _take_oldest(self):
+        # lock held
+        user_id, (memory, _) = self._open.popitem(last=False)
+        self._closing[user_id] = threading.Event()
+        self.evicted += 1
+        return user_id, memory
+
+    def _pin(self, memory):
+        # lock held
+        self._pins[id(memory)] = self._pins.get(id(memory), 0) + 1
+
+    def _unpin(self, memory):
+        with self._lock:
+            self._pins[id(memory)] -= 1
+            if not self._pins[id(memory)]:
+                del self._pins[id(memory)]
+                self._unpinned.notify_all()
+
+    def _close(self, evicted):
+        for user_id, memory in evicted:
+            with self._lock:
+                while id(memory) in self._pins:  # let running calls finish first
+                    self._unpinned.wait()
+            try:
+                memory.close()
+            except Exception as e:
+                print(f"Error closing memory of {user_id}:", e)
+            finally:
+                with self._lock:
+                    self._closing.pop(user_id).set()
+
+
+class UserMemory:
+    """
+    Stand-in for one user's LongTermMemory that looks the store up on
+    every call, so an agent may hold it while the store itself is evicted
+    and reopened. Each call keeps the store it uses open until it returns.
+    Closing it does nothing; MemoryShards owns the stores.
+    """
+
+    def __init__(self, shards: MemoryShards, user_id: str):
+        self.shards = shards
+        self.user_id = user_id
+
+    def search(self, query: str, k: int = 3):
+        with self.shards.use(self.user_id) as memory:
+            return memory.search(query, k)
+
+    def add(self, text: str):
+        with self.shards.use(self.user_id) as memory:
+            return memory.add(text)
+
+    def add_async(self, text: str):
+        # the queued write is finished by the store's close(), so pinning the submission is enough
+        with self.shards.use(self.user_id) as memory:
+            return memory.add_async(text)
+
+    def add_many(self, texts, **kwargs):
+        with self.shards.use(self.user_id) as memory:
+            return memory.add_many(texts, **kwargs)
+
+    def flush(self, timeout: float = None):
+        with self.shards.use(self.user_id) as memory:
+            memory.flush(timeout)
+
+    def close(self):
+        pass
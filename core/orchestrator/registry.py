@@ -0,0 +1,75 @@
+import importlib
+import threading
+import time
+from core.utils.shared import record_timing
+
+# intent → "module:Class"; modules are only imported when the agent is first needed
+AGENT_SPECS = {
+    "weather": "core.agents.weather.agent:WeatherAgent",
+    "calendar": "core.agents.calendar.agent:CalendarAgent",
+    "general": "core.agents.general.agent:GeneralAgent",
+}
+
+
+class AgentRegistry:
+    """
+    Lazily imports and constructs agents the first time they are routed to.
+    Agents can also be pre-warmed in a background thread so the first
+    prompt does not wait for heavy imports and model loads.
+    """
+
+    def __init__(self, specs: dict = None, kwargs: dict = None):
+        """`kwargs` maps an agent name to keyword arguments for its constructor."""
+        self.specs = dict(specs or AGENT_SPECS)
+        self.kwargs = dict(kwargs or {})
+        self._agents = {}
+        self._locks = {name: threading.Lock() for name in self.specs}
+
+    def get(self, name: str):
+        """Return the agent for an intent, creating it on first use."""
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+
+        with self._locks[name]:
+            if name not in self._agents:
+                module_name, class_name = self.specs[name].split(":")
+
+                started = time.perf_counter()
+                module = importlib.import_module(module_name)
+                record_timing(f"import {module_name}", time.perf_counter() - started)
+
+                started = time.perf_counter()
+                self._agents[name] = getattr(module, class_name)(**self.kwargs.get(name, {}))
+                record_timing(f"init {class_name}", time.perf_counter() - started)
+            return self._agents[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._agents
+
+    def prewarm(self, names=None, extra=()):
+        """
+        Load agents (and any extra zero-argument callables) in a background thread.
+        Returns the thread.
+        """
+        names = list(names if names is not None else self.specs)
+
+        def warm():
+            for task in extra:
+                task()
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"\nCould not pre-load {name} agent:", e)
+
+        thread = threading.Thread(target=warm, name="agent-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        """Give loaded agents a chance to finish background work."""
+        for agent in self._agents.values():
+            close = getattr(agent, "close", None)
+            if close:
+                close()
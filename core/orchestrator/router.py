@@ -1,13 +1,17 @@
-import json
-from core.utils.llm_interface import LLMInterface
+import re
+import numpy as np
+from core.utils.prompts import PromptTemplate
+from core.utils.shared import get_llm
 
-def route_query(user_message: str) -> str:
-    """
-    Sends the user's message to the LLM for intent classification.
-    Returns one of: "weather", "calendar", or "general".
-    """
-
-    prompt = f"""
+INTENTS = ["weather", "calendar", "general"]
+INTENT_SCHEMA = {
+    "type": "object",
+    "properties": {"intent": {"type": "string", "enum": INTENTS}},
+    "required": ["intent"],
+}
+INTENT_PROMPT = PromptTemplate(
+    "router",
+    system="""
     You are a precise intent classifier for a modular AI assistant called NEXCAI.
 
     Your job is to analyze the user's message and decide which type of agent should handle it.
@@ -18,20 +22,169 @@ def route_query(user_message: str) -> str:
     - general → for normal conversation, greetings, or unrelated questions.
 
     Respond only in pure JSON format like:
-    {{"intent": "weather"}}
+    {"intent": "weather"}
+    """,
+    user='User message: "{message}"',
+)
+
+# ---------------------------------------------------------------
+# Tier 1: keyword rules
+# ---------------------------------------------------------------
+# Only whole-request phrasings count: a bare topic word ("cloud computing",
+# "a poem about rain", "events that led to WW1") says little about the
+# intent, so such messages go on to the embedding and LLM tiers.
+KEYWORD_PATTERNS = {
+    "weather": re.compile(
+        r"^\s*(?:"
+        r"(?:what(?:'?s| is)|how(?:'?s| is)) (?:the )?(?:weather|forecast)\b"
+        r"|(?:what(?:'?s| is) )?(?:the )?(?:weather|forecast|temperature) "
+        r"(?:in|for|at|outside|now|today|tonight|tomorrow|this|next|on)\b"
+        r"|(?:the )?(?:weather|forecast)\s*[?.!]*$"
+        r"|(?:will|is|does) it (?:going to |gonna )?(?:be )?"
+        r"(?:rain|snow|storm|hail|sunny|windy|cloudy|foggy|hot|cold|warm|freezing)\w*"
+        r"|how (?:hot|cold|warm|windy) (?:is|will) it\b"
+        r"|(?:do|should|will) i (?:need|take|bring|wear) (?:an? )?(?:umbrella|jacket|coat|sunscreen)\b"
+        r")",
+        re.IGNORECASE,
+    ),
+    "calendar": re.compile(
+        r"^\s*(?:"
+        r"what(?:'?s| is) (?:on )?my (?:calendar|schedule|agenda)\b"
+        r"|what(?:'?s| is) on (?:today|tonight|tomorrow|this|next|on|for|monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b"
+        r"|(?:show|list|check|open|read) (?:me )?my (?:calendar|schedule|agenda|meetings|appointments|events)\b"
+        r"|(?:add|create|schedule|book|set up|put) (?:a |an |me |my )?(?:new )?"
+        r"(?:meeting|appointment|event|call|reminder)\b"
+        r"|(?:cancel|delete|remove|reschedule|move) (?:my |the |all )?(?:\w+ )?(?:meetings?|appointments?|events?|calls?)\b"
+        r"|(?:do i have|have i got) (?:any )?(?:meetings?|appointments?|events?|anything planned)\b"
+        r"|am i free (?:today|tonight|tomorrow|on|at|this|next)\b"
+        r"|remind me to\b|set (?:a|me a) reminder\b"
+        r")",
+        re.IGNORECASE,
+    ),
+    "general": re.compile(
+        r"^\s*(hi|hello|hey|thanks|thank you|ok(ay)?|bye|good (morning|night|evening))\b[\s!.?]*$",
+        re.IGNORECASE,
+    ),
+}
+KEYWORD_CONFIDENCE = 0.9
 
-    User message: "{user_message}"
+# ---------------------------------------------------------------
+# Tier 2: embedding centroids
+# ---------------------------------------------------------------
+INTENT_EXAMPLES = {
+    "weather": [
+        "What's the weather like today?",
+        "Will it rain tomorrow in Munich?",
+        "How hot will it be this weekend?",
+        "Do I need a jacket tonight?",
+        "Is it going to be sunny in Berlin?",
+        "What's the forecast for next week?",
+    ],
+    "calendar": [
+        "Create a meeting tomorrow at 3pm.",
+        "What's on my schedule today?",
+        "Show me my events for next week.",
+        "Cancel my dentist appointment.",
+        "Add lunch with Anna on Friday at noon.",
+        "Do I have anything planned on Monday?",
+    ],
+    "general": [
+        "Hi, how are you?",
+        "Tell me a joke.",
+        "What is the capital of France?",
+        "I'm studying Data Science at LMU.",
+        "Explain how neural networks work.",
+        "Thank you, that was helpful.",
+    ],
+}
+
+
+class IntentRouter:
+    """
+    Tiered intent classifier for NEXCAI.
+    Tries cheap local classifiers first and only asks the LLM when
+    none of them is confident enough:
+    1. keyword rules
+    2. cosine similarity to per-intent embedding centroids (if an encoder is given)
+    3. LLM classification
     """
 
-    llm = LLMInterface(model="llama3:8b")
-    response = llm.chat(prompt)
+    def __init__(self, encoder=None, llm=None, confidence_threshold: float = 0.75, temperature: float = 20.0):
+        # encoder: a SentenceTransformer-compatible model, e.g. LongTermMemory.model
+        self.encoder = encoder
+        self.llm = llm or get_llm("llama3:8b")
+        self.confidence_threshold = confidence_threshold
+        self.temperature = temperature  # sharpens cosine similarities before softmax
+        self._centroids = None
+
+    def route(self, user_message: str) -> dict:
+        """
+        Classify a message.
+        Returns {"intent": str, "confidence": float | None, "tier": "keyword" | "embedding" | "llm"}.
+        """
+        result = self._classify_keywords(user_message)
+        if result and result["confidence"] >= self.confidence_threshold:
+            return result
+
+        if self.encoder is not None:
+            result = self._classify_embedding(user_message)
+            if result["confidence"] >= self.confidence_threshold:
+                return result
+
+        return self._classify_llm(user_message)
 
-    try:
-        data = json.loads(response)
-        intent = data.get("intent", "general").lower()
-        if intent not in ["weather", "calendar", "general"]:
-            intent = "general"
-    except Exception:
-        intent = "general"
+    # ---------------------------------------------------------------
+    # Tier 1
+    # ---------------------------------------------------------------
+    @staticmethod
+    def _classify_keywords(user_message: str):
+        hits = [intent for intent, pattern in KEYWORD_PATTERNS.items() if pattern.search(user_message)]
+        if len(hits) != 1:
+            return None  # nothing matched, or ambiguous
+        return {"intent": hits[0], "confidence": KEYWORD_CONFIDENCE, "tier": "keyword"}
 
-    return intent
+    # ---------------------------------------------------------------
+    # Tier 2
+    # ---------------------------------------------------------------
+    def _encode(self, texts):
+        vectors = np.asarray(self.encoder.encode(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _get_centroids(self):
+        if self._centroids is None:
+            centroids = [self._encode(INTENT_EXAMPLES[intent]).mean(axis=0) for intent in INTENTS]
+            centroids = np.stack(centroids)
+            self._centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+        return self._centroids
+
+    def _classify_embedding(self, user_message: str) -> dict:
+        similarities = self._get_centroids() @ self._encode([user_message])[0]
+        scores = np.exp(self.temperature * (similarities - similarities.max()))
+        probs = scores / scores.sum()
+        best = int(np.argmax(probs))
+        return {"intent": INTENTS[best], "confidence": float(probs[best]), "tier": "embedding"}
+
+    # ---------------------------------------------------------------
+    # Tier 3
+    # ---------------------------------------------------------------
+    def _classify_llm(self, user_message: str) -> dict:
+        messages = INTENT_PROMPT.messages(message=user_message)
+        data = self.llm.chat_json(messages, schema=INTENT_SCHEMA, max_tokens=16, label=INTENT_PROMPT.name)
+        intent = data["intent"] if data else "general"
+
+        return {"intent": intent, "confidence": None, "tier": "llm"}
+
+
+_default_router = None
+
+
+def route_query(user_message: str) -> str:
+    """
+    Classifies the user's message with the default (encoder-less) router.
+    Returns one of: "weather", "calendar", or "general".
+    """
+    global _default_router
+    if _default_router is None:
+        _default_router = IntentRouter()
+    return _default_router.route(user_message)["intent"]
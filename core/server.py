@@ -0,0 +1,383 @@
+"""
+NEXCAI as a local HTTP server: many users, one process.
+
+    python -m core.server --port 8765
+
+POST /chat            {"session": "<id>", "user": "<id>", "message": "...", "stream": true}
+                      Streams newline-delimited JSON events:
+                      {"type": "route", ...}, {"type": "delta", "text": ...}, ..., {"type": "done"}
+                      With "stream": false the answer is one JSON object.
+                      "user" selects the long-term memory; it defaults to the session id,
+                      and a session only ever answers for the user that opened it (else 403).
+DELETE /sessions/<id> End a session and free its agents.
+GET /health           Open sessions and LLM scheduler state.
+
+Every session has its own agents (conversation memory, last city, ...)
+and every user their own long-term memory shard; the LLM client and
+encoder are shared. The calendar agent is not served: it acts on the
+operator's own Google account and may need an interactive login. Agents are blocking, so they run on a thread pool;
+all LLM requests go through one bounded scheduler, and requests beyond
+its queue get HTTP 503. At most `llm_concurrency + llm_queue` messages
+are answered at once (each waits for one LLM request at a time) and the
+pool has a thread for every one of them, so overload shows up as 503s
+rather than as requests waiting for a thread.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import asyncio
+import json
+import threading
+import time
+from core.memory.shards import MemoryShards
+from core.orchestrator.registry import AGENT_SPECS, AgentRegistry
+from core.orchestrator.router import IntentRouter
+from core.utils.llm_interface import set_scheduler
+from core.utils.llm_scheduler import LLMScheduler, SchedulerFull
+from core.utils.shared import get_encoder
+
+MAX_BODY = 64 * 1024
+REQUEST_TIMEOUT = 30  # seconds to receive the request head and body
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+# agents a session may use; the calendar is the operator's, not the HTTP clients'
+SERVER_AGENTS = {name: spec for name, spec in AGENT_SPECS.items() if name != "calendar"}
+UNAVAILABLE = "Sorry, I can't help with your {intent} here: it is only available in the local assistant."
+_DONE = object()
+
+
+class Session:
+    """One user's conversation: their own agents, used by one message at a time."""
+
+    def __init__(self, session_id: str, user_id: str, registry: AgentRegistry):
+        self.id = session_id
+        self.user_id = user_id
+        self.registry = registry
+        self.lock = asyncio.Lock()  # messages of a session are answered in order
+        self.last_seen = time.monotonic()
+
+
+class SessionManager:
+    """
+    Open sessions, least recently used first.
+    Beyond `max_sessions`, or after `idle_timeout` seconds without a
+    message, idle sessions are dropped and their agents closed.
+    """
+
+    def __init__(self, make_registry, max_sessions: int = 256, idle_timeout: float = 1800):
+        self.make_registry = make_registry
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id: str, user_id: str):
+        """Return (session, sessions evicted to make room)."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = Session(session_id, user_id, self.make_registry(user_id))
+        self._sessions.move_to_end(session_id)
+        session.last_seen = time.monotonic()
+
+        evicted = []
+        for old_id in list(self._sessions):
+            if len(self._sessions) - len(evicted) <= self.max_sessions:
+                break
+            if old_id != session_id and not self._sessions[old_id].lock.locked():
+                evicted.append(self._sessions.pop(old_id))
+        return session, evicted
+
+    def pop(self, session_id: str):
+        return self._sessions.pop(session_id, None)
+
+    def expire(self):
+        """Remove and return sessions idle for longer than `idle_timeout`."""
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = [s for s in self._sessions.values() if s.last_seen < cutoff and not s.lock.locked()]
+        for session in expired:
+            del self._sessions[session.id]
+        return expired
+
+    def drain(self):
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        return sessions
+
+
+class AssistantServer:
+    """
+    `router`, `memories` and `make_registry` (user id -> AgentRegistry)
+    replace the intent router, the per-user memory shards and the
+    per-session agents; by default every session gets SERVER_AGENTS.
+    """
+
+    def __init__(self, max_sessions: int = 256, idle_timeout: float = 1800, llm_concurrency: int = 2,
+                 llm_queue: int = 32, max_open_memories: int = 64, router=None, memories: MemoryShards = None,
+                 make_registry=None):
+        self.scheduler = LLMScheduler(max_concurrent=llm_concurrency, max_queue=llm_queue)
+        set_scheduler(self.scheduler)
+        self.router = router if router is not None else IntentRouter(encoder=get_encoder())
+        self.max_active = llm_concurrency + llm_queue
+        self.active = 0  # messages being answered (touched on the event loop only)
+        # one thread per active message, plus a few for closing sessions and memory upkeep
+        self.executor = ThreadPoolExecutor(max_workers=self.max_active + 4, thread_name_prefix="nexcai-worker")
+        self.sessions = SessionManager(make_registry or self._make_registry, max_sessions, idle_timeout)
+        self.memories = memories if memories is not None else MemoryShards(max_open=max_open_memories,
+                                                                           idle_timeout=idle_timeout)
+
+    def _make_registry(self, user_id: str) -> AgentRegistry:
+        return AgentRegistry(SERVER_AGENTS, kwargs={"general": {"longterm_memory": self.memories.handle(user_id)}})
+
+    # ---------------------------------------------------------------
+    # Lifecycle
+    # ---------------------------------------------------------------
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765):
+        server = await asyncio.start_server(self.handle, host, port)
+        reaper = asyncio.create_task(self._reap_idle())
+        print(f"NEXCAI server listening on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            reaper.cancel()
+            await self._close_sessions(self.sessions.drain())
+            await self._run(self.memories.close)
+            self.executor.shutdown(wait=False)
+
+    async def _reap_idle(self):
+        while True:
+            await asyncio.sleep(60)
+            await self._close_sessions(self.sessions.expire())
+            await self._run(self.memories.evict_idle)
+
+    async def _close_sessions(self, sessions):
+        for session in sessions:
+            try:
+                await self._run(session.registry.close)
+            except Exception as e:
+                print(f"Error closing session {session.id}:", e)
+
+    def _run(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def _iterate(self, generator):
+        """Consume a blocking generator on the worker pool, yielding its items here."""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def pump():
+            try:
+                for item in generator:
+                    loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+                    if stop.is_set():
+                        break
+            except BaseException as e:
+                loop.call_soon_threadsafe(queue.put_nowait, (None, e))
+                return
+            finally:
+                generator.close()
+            loop.call_soon_threadsafe(queue.put_nowait, (_DONE, None))
+
+        self.executor.submit(pump)
+        try:
+            while True:
+                item, error = await queue.get()
+                if error is not None:
+                    raise error
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            stop.set()  # client went away: let the worker stop generating
+
+    # ---------------------------------------------------------------
+    # HTTP
+    # ---------------------------------------------------------------
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, path, body = await asyncio.wait_for(self._read_request(reader), REQUEST_TIMEOUT)
+            await self.dispatch(method, path, body, writer)
+        except _HTTPError as e:
+            await self._send_json(writer, e.status, {"error": e.message})
+        except (ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            await self._send_json(writer, 400, {"error": "malformed request"})
+        except ConnectionError:
+            pass
+        except Exception as e:
+            print("Error handling request:", e)
+            try:
+                await self._send_json(writer, 500, {"error": "internal error"})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader):
+        request_line = (await reader.readline()).decode("latin-1")
+        method, path, _ = request_line.split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY:
+            raise _HTTPError(413, f"body larger than {MAX_BODY} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), path, body
+
+    async def dispatch(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter):
+        if path == "/health":
+            await self._send_json(writer, 200, {"status": "ok", "sessions": len(self.sessions), "active": self.active,
+                                                "memories": self.memories.stats(), "llm": self.scheduler.stats()})
+        elif path == "/chat":
+            if method != "POST":
+                raise _HTTPError(405, "use POST")
+            request = json.loads(body or b"{}")
+            if not isinstance(request, dict):
+                raise _HTTPError(400, "the body must be a JSON object")
+            await self.chat(request, writer)
+        elif path.startswith("/sessions/"):
+            if method != "DELETE":
+                raise _HTTPError(405, "use DELETE")
+            session = self.sessions.pop(path[len("/sessions/"):])
+            if session is None:
+                raise _HTTPError(404, "no such session")
+            async with session.lock:
+                await self._close_sessions([session])
+            await self._send_json(writer, 200, {"closed": session.id})
+        else:
+            raise _HTTPError(404, "not found")
+
+    async def chat(self, request: dict, writer: asyncio.StreamWriter):
+        session_id, message = request.get("session"), request.get("message")
+        if not isinstance(session_id, str) or not session_id or not isinstance(message, str) or not message.strip():
+            raise _HTTPError(400, '"session" and "message" are required strings')
+        user_id = request.get("user") or session_id
+        if not isinstance(user_id, str):
+            raise _HTTPError(400, '"user" must be a string')
+        stream = request.get("stream", True)
+
+        if self.active >= self.max_active:
+            raise _HTTPError(503, f"{self.active} messages already being answered")
+        self.active += 1
+        try:
+            await self._answer(session_id, user_id, message, stream, writer)
+        finally:
+            self.active -= 1
+
+    async def _answer(self, session_id: str, user_id: str, message: str, stream: bool, writer: asyncio.StreamWriter):
+        session, evicted = self.sessions.get(session_id, user_id)
+        if evicted:
+            asyncio.create_task(self._close_sessions(evicted))
+        if session.user_id != user_id:
+            raise _HTTPError(403, "this session belongs to another user")
+
+        async with session.lock:
+            try:
+                route = await self._run(self.router.route, message)
+            except SchedulerFull as e:
+                raise _HTTPError(503, str(e))
+            intent = route["intent"]
+            served = intent in session.registry.specs
+
+            if not stream:
+                try:
+                    if served:
+                        agent = await self._run(session.registry.get, intent)
+                        reply = await self._run(agent.run, message)
+                    else:
+                        reply = UNAVAILABLE.format(intent=intent)
+                except SchedulerFull as e:
+                    raise _HTTPError(503, str(e))
+                except Exception as e:
+                    print(f"Error in session {session_id}:", e)
+                    raise _HTTPError(500, str(e))
+                await self._send_json(writer, 200, {"session": session_id, "intent": intent, "reply": reply})
+                return
+
+            await self._start_stream(writer)
+            await self._send_event(writer, {"type": "route", **route})
+            try:
+                if not served:
+                    await self._send_event(writer, {"type": "delta", "text": UNAVAILABLE.format(intent=intent)})
+                elif intent == "general":
+                    agent = await self._run(session.registry.get, intent)
+                    async for piece in self._iterate(agent.run_stream(message)):
+                        await self._send_event(writer, {"type": "delta", "text": piece})
+                else:
+                    agent = await self._run(session.registry.get, intent)
+                    reply = await self._run(agent.run, message)
+                    await self._send_event(writer, {"type": "delta", "text": reply})
+                await self._send_event(writer, {"type": "done"})
+            except ConnectionError:
+                raise
+            except Exception as e:
+                print(f"Error in session {session_id}:", e)
+                await self._send_event(writer, {"type": "error", "error": str(e)})
+            await self._end_stream(writer)
+
+    # ---------------------------------------------------------------
+    # Responses
+    # ---------------------------------------------------------------
+    @staticmethod
+    async def _send_json(writer: asyncio.StreamWriter, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+
+    @staticmethod
+    async def _start_stream(writer: asyncio.StreamWriter):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def _send_event(writer: asyncio.StreamWriter, event: dict):
+        data = json.dumps(event).encode("utf-8") + b"\n"
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        await writer.drain()
+
+    @staticmethod
+    async def _end_stream(writer: asyncio.StreamWriter):
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+class _HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NEXCAI multi-session HTTP server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-sessions", type=int, default=256)
+    parser.add_argument("--idle-timeout", type=float, default=1800, help="seconds before an idle session is closed")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="LLM requests generated at the same time")
+    parser.add_argument("--llm-queue", type=int, default=32, help="LLM requests allowed to wait for a slot")
+    parser.add_argument("--max-open-memories", type=int, default=64, help="user memory shards kept open")
+    args = parser.parse_args()
+
+    server = AssistantServer(args.max_sessions, args.idle_timeout, args.llm_concurrency, args.llm_queue,
+                             max_open_memories=args.max_open_memories)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("Goodbye!")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,445 @@
+import codecs
+import contextlib
+import json
+import os
+import re
 import subprocess
 import shutil
 import sys
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from core.utils.prompts import flatten
+
+DEFAULT_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+HTTP_RETRY_SECONDS = 30  # how long to stay on the CLI fallback after the server was unreachable
+
+JSON_TYPES = {
+    "object": dict, "array": list, "string": str, "integer": int,
+    "number": (int, float), "boolean": bool, "null": type(None),
+}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# Prefix reuse: the server keeps the KV cache of the previous request on a model,
+# so a request starting with the same system prompt only has to prefill the rest.
+_last_prefix = {}  # (host, model) -> system prompt of the previous chat request
+_prefix_stats = {}  # label -> counters
+_stats_lock = threading.Lock()
+
+_scheduler = None  # optional LLMScheduler shared by every client (server mode)
+
+
+_background = threading.local()
+
+
+def set_scheduler(scheduler):
+    """Route every LLM request in the process through `scheduler` (None to disable)."""
+    global _scheduler
+    _scheduler = scheduler
+
+
+@contextlib.contextmanager
+def background():
+    """
+    Mark the LLM requests this thread makes inside the block as background
+    work: the scheduler makes them wait behind user requests instead of
+    rejecting them when its queue is full.
+    """
+    previous = getattr(_background, "active", False)
+    _background.active = True
+    try:
+        yield
+    finally:
+        _background.active = previous
+
+
+def prefix_stats() -> dict:
+    """
+    Per prompt label: calls, how often the system prompt matched the
+    previous request on that model, estimated prompt tokens and the
+    tokens the server actually had to evaluate.
+    """
+    with _stats_lock:
+        report = {}
+        for label, stats in _prefix_stats.items():
+            stats = dict(stats)
+            stats["prefix_hit_rate"] = stats["prefix_hits"] / stats["calls"] if stats["calls"] else 0.0
+            if stats["prompt_tokens"] and stats["evaluated_tokens"]:
+                stats["reused_fraction"] = max(0.0, 1 - stats["evaluated_tokens"] / stats["prompt_tokens"])
+            report[label] = stats
+        return report
+
+
+def _normalize_host(host: str) -> str:
+    host = host.strip().rstrip("/")
+    if not host.startswith(("http://", "https://")):
+        host = "http://" + host
+    return host
+
+
+def matches_schema(value, schema: dict) -> bool:
+    """
+    Check a parsed value against the subset of JSON Schema used for
+    structured output: type (or list of types), enum, properties,
+    required and items.
+    """
+    types = schema.get("type")
+    if types:
+        types = types if isinstance(types, list) else [types]
+        if not any(isinstance(value, JSON_TYPES[t]) and not (t in ("integer", "number") and isinstance(value, bool))
+                   for t in types):
+            return False
+    if "enum" in schema and value not in schema["enum"]:
+        return False
+    if isinstance(value, dict):
+        if any(key not in value for key in schema.get("required", ())):
+            return False
+        for key, sub in schema.get("properties", {}).items():
+            if key in value and not matches_schema(value[key], sub):
+                return False
+    if isinstance(value, list) and "items" in schema:
+        return all(matches_schema(item, schema["items"]) for item in value)
+    return True
+
+
+def _get_session(host: str) -> requests.Session:
+    """
+    Return the pooled keep-alive session for a host.
+    Shared by every LLMInterface in the process, so short-lived instances
+    (e.g. the router) still reuse open connections.
+    """
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=8)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[host] = session
+        return session
+
 
 class LLMInterface:
     """
     A lightweight interface for local LLMs using Ollama, with streaming output.
+    Talks to the Ollama HTTP API over a pooled keep-alive session and falls back
+    to spawning `ollama run` when the server cannot be reached.
     """
 
-    def __init__(self, model: str = "llama3:8b"):
+    def __init__(
+        self,
+        model: str = "llama3:8b",
+        host: str = None,
+        keep_alive: str = "30m",
+        timeout: float = 300,
+        use_http: bool = True,
+    ):
         self.model = model
         self.ollama_path = shutil.which("ollama") or "/usr/local/bin/ollama"
+        self.host = _normalize_host(host or DEFAULT_HOST)
+        self.keep_alive = keep_alive  # keeps the model resident between calls
+        self.timeout = timeout
+        self.use_http = use_http
+        self.session = _get_session(self.host)
+        self._http_retry_at = 0.0
+        self.last_metrics = {}
 
-    def chat(self, prompt: str, stream: bool = False) -> str:
+    # ---------------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------------
+    def chat(self, prompt, stream: bool = False, label: str = None) -> str:
         """
         Sends a prompt to Ollama. If stream=True, prints the output as it comes in.
         Returns the full text response.
+        `prompt` is either a string or a list of chat messages (see
+        core.utils.prompts); messages go to /api/chat so a stable system
+        prompt can be served from the server's prefix cache.
         """
+        if stream:
+            output = ""
+            for piece in self.chat_stream(prompt, label=label):
+                print(piece, end="", flush=True)
+                output += piece
+            print()
+            return output.strip()
+
+        with self._slot():
+            if self._http_enabled():
+                try:
+                    return self._chat_http(prompt, label)
+                except requests.ConnectionError as e:
+                    self._disable_http(e)
+                except requests.RequestException as e:
+                    print("Ollama error:", e)
+                    return "Error: LLM call failed."
+
+            return self._chat_subprocess(prompt)
+
+    def chat_json(self, prompt, schema: dict = None, max_tokens: int = None, stop=None, label: str = None):
+        """
+        Ask for a JSON answer and return it parsed, or None if the model
+        did not produce valid JSON matching `schema`.
+
+        Over HTTP the schema is passed as Ollama's `format`, so decoding is
+        constrained to it; `max_tokens` and `stop` bound the generation.
+        The CLI fallback cannot constrain output, so the first JSON value
+        in the text is parsed and checked instead.
+        """
+        options = {"temperature": 0}
+        if max_tokens:
+            options["num_predict"] = max_tokens
+        if stop:
+            options["stop"] = list(stop)
+
+        text = None
+        with self._slot():
+            if self._http_enabled():
+                try:
+                    stats = self._note_prefix(prompt, label)
+                    data = self._post(prompt, stream=False, format=schema or "json", options=options).json()
+                    self._note_evaluated(stats, data)
+                    text = self._text(data)
+                except requests.ConnectionError as e:
+                    self._disable_http(e)
+                except requests.RequestException as e:
+                    print("Ollama error:", e)
+                    return None
+            if text is None:
+                text = self._chat_subprocess(prompt)
+
+        value = self._parse_json(text)
+        if value is None or (schema and not matches_schema(value, schema)):
+            print("LLM returned JSON that does not match the schema:", text[:200])
+            return None
+        return value
+
+    @staticmethod
+    def _parse_json(text: str):
+        try:
+            return json.loads(text)
+        except (TypeError, ValueError):
+            pass
+        # free text around the JSON (CLI fallback): take the outermost object or array
+        match = re.search(r"\{[\s\S]*\}|\[[\s\S]*\]", text or "")
+        if match:
+            try:
+                return json.loads(match.group(0))
+            except ValueError:
+                pass
+        return None
+
+    def chat_stream(self, prompt, label: str = None):
+        """
+        Sends a prompt to Ollama and yields text chunks as soon as they arrive.
+        Timing for the call is recorded in `self.last_metrics` once the
+        generator is exhausted.
+        """
+        with self._slot():
+            yield from self._chat_stream(prompt, label)
+
+    def _chat_stream(self, prompt, label: str = None):
+        started = time.perf_counter()
+        first_at = None
+        chunks = 0
+        eval_stats = {}
+
+        if self._http_enabled():
+            try:
+                for piece in self._stream_http(prompt, eval_stats, label):
+                    if first_at is None:
+                        first_at = time.perf_counter()
+                    chunks += 1
+                    yield piece
+                self._record_metrics("http", started, first_at, chunks, eval_stats)
+                return
+            except requests.ConnectionError as e:
+                if chunks:
+                    print("Ollama stream interrupted:", e)
+                    return
+                self._disable_http(e)
+            except requests.RequestException as e:
+                print("Ollama error:", e)
+                yield "Error: LLM call failed."
+                return
+
+        for piece in self._stream_subprocess(prompt):
+            if first_at is None:
+                first_at = time.perf_counter()
+            chunks += 1
+            yield piece
+        self._record_metrics("cli", started, first_at, chunks, eval_stats)
+
+    @staticmethod
+    def _slot():
+        """Wait for an LLM slot when a scheduler is installed (server mode)."""
+        if _scheduler is None:
+            return contextlib.nullcontext()
+        return _scheduler.slot(background=getattr(_background, "active", False))
+
+    # ---------------------------------------------------------------
+    # Metrics
+    # ---------------------------------------------------------------
+    def _record_metrics(self, transport, started, first_at, chunks, eval_stats):
+        total = time.perf_counter() - started
+        # Prefer the server's own token count; fall back to streamed chunks
+        tokens = eval_stats.get("eval_count") or chunks
+        gen_seconds = eval_stats.get("eval_duration", 0) / 1e9
+        if not gen_seconds and first_at is not None:
+            gen_seconds = time.perf_counter() - first_at
+        self.last_metrics = {
+            "transport": transport,
+            "ttft": (first_at - started) if first_at is not None else None,
+            "total": total,
+            "tokens": tokens,
+            "tokens_per_sec": tokens / gen_seconds if gen_seconds else None,
+        }
+
+    # ---------------------------------------------------------------
+    # HTTP transport (persistent session)
+    # ---------------------------------------------------------------
+    def _http_enabled(self) -> bool:
+        return self.use_http and time.monotonic() >= self._http_retry_at
+
+    def _disable_http(self, error):
+        print(f"Ollama server unreachable at {self.host} ({error}); using CLI fallback.")
+        self._http_retry_at = time.monotonic() + HTTP_RETRY_SECONDS
+
+    def _post(self, prompt, stream: bool, format=None, options: dict = None):
+        payload = {
+            "model": self.model,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+        }
+        if isinstance(prompt, list):
+            path = "/api/chat"
+            payload["messages"] = prompt
+        else:
+            path = "/api/generate"
+            payload["prompt"] = prompt
+        if format is not None:
+            payload["format"] = format  # "json" or a JSON schema
+        if options:
+            payload["options"] = options
+        response = self.session.post(
+            f"{self.host}{path}",
+            json=payload,
+            stream=stream,
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response
+
+    @staticmethod
+    def _text(chunk: dict) -> str:
+        if "message" in chunk:
+            return chunk["message"].get("content", "")
+        return chunk.get("response", "")
+
+    def _chat_http(self, prompt, label: str = None) -> str:
+        stats = self._note_prefix(prompt, label)
+        data = self._post(prompt, stream=False).json()
+        self._note_evaluated(stats, data)
+        return self._text(data).strip()
+
+    def _stream_http(self, prompt, eval_stats: dict, label: str = None):
+        stats = self._note_prefix(prompt, label)
+        response = self._post(prompt, stream=True)
+        with response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                piece = self._text(chunk)
+                if piece:
+                    yield piece
+                if chunk.get("done"):
+                    eval_stats["eval_count"] = chunk.get("eval_count", 0)
+                    eval_stats["eval_duration"] = chunk.get("eval_duration", 0)
+                    self._note_evaluated(stats, chunk)
+                    break
+
+    # ---------------------------------------------------------------
+    # Prefix reuse statistics
+    # ---------------------------------------------------------------
+    def _note_prefix(self, prompt, label: str = None):
+        """Count a chat request and whether its system prompt matches the previous one."""
+        key = (self.host, self.model)
+        if not isinstance(prompt, list):
+            # a plain prompt still replaces the server's cached prefix
+            with _stats_lock:
+                _last_prefix[key] = None
+            return None
+        prefix = prompt[0]["content"] if prompt and prompt[0]["role"] == "system" else ""
+        with _stats_lock:
+            stats = _prefix_stats.setdefault(label or "unlabelled", {
+                "calls": 0, "prefix_hits": 0, "prompt_tokens": 0, "evaluated_tokens": 0,
+            })
+            stats["calls"] += 1
+            stats["prefix_hits"] += int(bool(prefix) and _last_prefix.get(key) == prefix)
+            stats["prompt_tokens"] += sum(len(m["content"]) for m in prompt) // 4  # rough estimate
+            _last_prefix[key] = prefix
+        return stats
+
+    @staticmethod
+    def _note_evaluated(stats, chunk: dict):
+        if stats is not None:
+            with _stats_lock:
+                stats["evaluated_tokens"] += chunk.get("prompt_eval_count", 0)
+
+    # ---------------------------------------------------------------
+    # CLI transport (fallback)
+    # ---------------------------------------------------------------
+    def _stream_subprocess(self, prompt):
+        if isinstance(prompt, list):
+            prompt = flatten(prompt)
+        try:
+            process = subprocess.Popen(
+                [self.ollama_path, "run", self.model],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                bufsize=0  # unbuffered, so partial lines come through
+            )
+
+            # Send the prompt
+            process.stdin.write(prompt.encode("utf-8"))
+            process.stdin.close()
+
+            # Read whatever bytes are available instead of waiting for a newline
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            fd = process.stdout.fileno()
+            while True:
+                data = os.read(fd, 4096)
+                if not data:
+                    break
+                piece = decoder.decode(data)
+                if piece:
+                    yield piece
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+
+            if process.wait() != 0:
+                print("Ollama error:", process.stderr.read().decode())
+        except Exception as e:
+            print("Unexpected error:", e)
+            yield f"Error: {e}"
+
+    def _chat_subprocess(self, prompt) -> str:
+        if isinstance(prompt, list):
+            prompt = flatten(prompt)
         try:
-            if stream:
-                # Live-streaming mode
-                process = subprocess.Popen(
-                    [self.ollama_path, "run", self.model],
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    bufsize=1  # line-buffered
-                )
-
-                # Send the prompt
-                process.stdin.write(prompt)
-                process.stdin.close()
-
-                output = ""
-                for line in process.stdout:
-                    # Print as it arrives (without extra newline)
-                    print(line, end="", flush=True)
-                    output += line
-
-                process.wait()
-                return output.strip()
-
-            else:
-                # Normal blocking mode
-                result = subprocess.run(
-                    [self.ollama_path, "run", self.model],
-                    input=prompt.encode("utf-8"),
-                    capture_output=True,
-                    check=True
-                )
-                return result.stdout.decode("utf-8").strip()
+            result = subprocess.run(
+                [self.ollama_path, "run", self.model],
+                input=prompt.encode("utf-8"),
+                capture_output=True,
+                check=True
+            )
+            return result.stdout.decode("utf-8").strip()
 
         except subprocess.CalledProcessError as e:
             print("Ollama error:", e.stderr.decode())
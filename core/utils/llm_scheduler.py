@@ -0,0 +1,95 @@
+from contextlib import contextmanager
+import threading
+import time
+
+
+class SchedulerFull(Exception):
+    """Raised when an LLM request cannot be queued (queue full or waited too long)."""
+
+
+class LLMScheduler:
+    """
+    Process-wide limit on concurrent LLM requests.
+
+    At most `max_concurrent` requests run at once; up to `max_queue` more
+    wait, first come first served, for at most `queue_timeout` seconds.
+    Anything beyond that is rejected with SchedulerFull instead of piling
+    up behind a backend that can only generate so fast.
+
+    Background requests (memory writes, summaries) are never rejected:
+    nobody is waiting on them, so they queue separately without a limit
+    and only get a slot when no interactive request is waiting.
+    """
+
+    def __init__(self, max_concurrent: int = 2, max_queue: int = 32, queue_timeout: float = 120):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._running = 0
+        self._queue = []  # tickets in arrival order
+        self._background = []  # background tickets, served when _queue is empty
+        self._next_ticket = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+
+    @contextmanager
+    def slot(self, background: bool = False):
+        """Hold one LLM slot for the duration of the block."""
+        started = time.perf_counter()
+        with self._cond:
+            if background:
+                self._wait_background()
+            else:
+                self._wait()
+            self._running += 1
+            self.total_wait += time.perf_counter() - started
+            self._cond.notify_all()  # the next ticket may also fit
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1
+                self.completed += 1
+                self._cond.notify_all()
+
+    def _ticket(self) -> int:
+        ticket = self._next_ticket
+        self._next_ticket += 1
+        return ticket
+
+    def _wait(self):
+        if self._running >= self.max_concurrent and len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            raise SchedulerFull(f"{len(self._queue)} LLM requests already waiting")
+        ticket = self._ticket()
+        self._queue.append(ticket)
+        deadline = time.monotonic() + self.queue_timeout
+        while self._queue[0] != ticket or self._running >= self.max_concurrent:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._queue.remove(ticket)
+                self.rejected += 1
+                self._cond.notify_all()
+                raise SchedulerFull(f"waited {self.queue_timeout:.0f}s for an LLM slot")
+            self._cond.wait(remaining)
+        self._queue.pop(0)
+
+    def _wait_background(self):
+        ticket = self._ticket()
+        self._background.append(ticket)
+        while self._queue or self._background[0] != ticket or self._running >= self.max_concurrent:
+            self._cond.wait()
+        self._background.pop(0)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "running": self._running,
+                "queued": len(self._queue),
+                "background": len(self._background),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait": self.total_wait / self.completed if self.completed else 0.0,
+            }
@@ -0,0 +1,109 @@
+"""
+Rule-based reading of the period a message talks about ("tomorrow",
+"this weekend", "the next 3 days", "March 20th"), shared by the calendar
+and weather agents so both understand a phrase the same way.
+"""
+from datetime import date, time, timedelta
+import re
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december"]
+NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+                "eight": 8, "nine": 9, "ten": 10, "fourteen": 14, "thirty": 30}
+
+MONTH_PATTERN = r"(" + "|".join(m[:3] + r"[a-z]*" for m in MONTHS) + r")"
+DAY_PATTERN = r"(\d{1,2})(?:st|nd|rd|th)?"
+NUMBER_PATTERN = r"(\d+|" + "|".join(NUMBER_WORDS) + r")"
+
+
+def _number(text: str) -> int:
+    return int(text) if text.isdigit() else NUMBER_WORDS[text]
+
+
+def find_period(text: str, today: date):
+    """
+    The period a lower-cased message talks about.
+    Returns ("days", n) for "the next n days/weeks", ("range", first_day,
+    last_day, start_time) for named days and periods (running to the end
+    of `last_day`), or None when no period is recognised.
+    """
+    weekday = today.weekday()
+
+    match = re.search(r"\b(?:next|coming|following)\s+" + NUMBER_PATTERN + r"\s+days\b", text)
+    if match:
+        return "days", _number(match.group(1))
+    match = re.search(r"\bnext\s+" + NUMBER_PATTERN + r"\s+weeks\b", text)
+    if match:
+        return "days", 7 * _number(match.group(1))
+
+    if "day after tomorrow" in text:
+        day = today + timedelta(days=2)
+        return "range", day, day, time(0)
+    if "tomorrow" in text:
+        day = today + timedelta(days=1)
+        return "range", day, day, time(0)
+    if re.search(r"\b(tonight|this evening)\b", text):
+        return "range", today, today, time(18)
+    if re.search(r"\b(today|now|currently|this (morning|afternoon))\b", text):
+        return "range", today, today, time(0)
+
+    if "weekend" in text:
+        # on a Sunday "this weekend" is the one in progress
+        saturday = today + timedelta(days=(5 - weekday) % 7) if weekday < 6 else today - timedelta(days=1)
+        if "next weekend" in text and weekday < 5:
+            saturday += timedelta(days=7)
+        return "range", saturday, saturday + timedelta(days=1), time(0)
+    if "next week" in text:
+        monday = today + timedelta(days=7 - weekday)
+        return "range", monday, monday + timedelta(days=6), time(0)
+    if re.search(r"\b(this|the) week\b", text):
+        monday = today - timedelta(days=weekday)
+        return "range", monday, monday + timedelta(days=6), time(0)
+    if "next month" in text:
+        first = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+        last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return "range", first, last, time(0)
+    if "this month" in text:
+        first = today.replace(day=1)
+        last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return "range", first, last, time(0)
+
+    match = re.search(r"\b(next\s+)?(" + "|".join(WEEKDAYS) + r")\b", text)
+    if match:
+        ahead = (WEEKDAYS.index(match.group(2)) - weekday) % 7
+        if match.group(1) and ahead == 0:
+            ahead = 7
+        day = today + timedelta(days=ahead)
+        return "range", day, day, time(0)
+
+    day = explicit_date(text, today)
+    if day:
+        return "range", day, day, time(0)
+    return None
+
+
+def explicit_date(text: str, today: date):
+    """'2025-03-05', 'march 5th', '5 march', '5th of march'; dates without a year are the next one."""
+    match = re.search(r"\b(\d{4})-(\d{2})-(\d{2})\b", text)
+    if match:
+        try:
+            return date(*map(int, match.groups()))
+        except ValueError:
+            return None
+
+    match = re.search(r"\b" + MONTH_PATTERN + r"\s+" + DAY_PATTERN + r"\b", text)
+    if match:
+        month_name, day = match.group(1), match.group(2)
+    else:
+        match = re.search(r"\b" + DAY_PATTERN + r"\s+(?:of\s+)?" + MONTH_PATTERN + r"\b", text)
+        if not match:
+            return None
+        day, month_name = match.group(1), match.group(2)
+
+    month = next((i + 1 for i, m in enumerate(MONTHS) if m.startswith(month_name[:3])), None)
+    try:
+        day = date(today.year, month, int(day))
+    except (TypeError, ValueError):
+        return None
+    return day if day >= today else day.replace(year=today.year + 1)
@@ -0,0 +1,42 @@
+"""
+Prompt templates with a stable prefix.
+"""
+import inspect
+
+
+class PromptTemplate:
+    """
+    A static system message followed by a user message holding everything
+    that changes between calls (time, question, data). Keep the
+    instructions in `system`: sent as chat messages, identical system
+    prompts let the Ollama server reuse the already-computed KV cache for
+    that prefix instead of re-reading the whole instruction block on
+    every call.
+    """
+
+    def __init__(self, name: str, system: str, user: str):
+        self.name = name  # label for prefix-reuse statistics
+        self.system = inspect.cleandoc(system)
+        self.user = inspect.cleandoc(user)
+
+    def messages(self, history=(), **values):
+        """
+        Chat messages: the static system prompt, then any earlier turns
+        (`history`, oldest first), then the filled-in user message.
+        """
+        return [
+            {"role": "system", "content": self.system},
+            *history,
+            {"role": "user", "content": self.user.format(**values)},
+        ]
+
+
+def flatten(messages) -> str:
+    """Single-prompt rendering of chat messages, for backends without a chat API."""
+    parts = []
+    for m in messages:
+        if m["role"] == "system":
+            parts.append(m["content"])
+        else:
+            parts.append(f"{m['role'].capitalize()}: {m['content']}")
+    return "\n\n".join(parts) + "\n\nAssistant:"
@@ -0,0 +1,92 @@
+"""
+Process-wide shared resources.
+Every agent asks here for its LLM client and sentence encoder instead of
+creating its own, and heavy libraries are imported on first use only.
+"""
+from pathlib import Path
+import os
+import threading
+import time
+from core.utils.llm_interface import LLMInterface
+
+DEFAULT_LLM_MODEL = "llama3:8b"
+DEFAULT_ENCODER_MODEL = "all-MiniLM-L6-v2"
+
+# (label, seconds) for every lazy import / model load, for --profile-startup
+TIMINGS = []
+
+_lock = threading.RLock()
+_model_lock = threading.Lock()  # separate, so a slow model load does not block get_llm()
+_llms = {}
+_sentence_models = {}
+_encoders = {}
+_response_cache = None
+
+
+def record_timing(label: str, seconds: float):
+    TIMINGS.append((label, seconds))
+
+
+def data_dir() -> Path:
+    """Root for NEXCAI's on-disk stores: $NEXCAI_DATA_DIR, else ~/.cache/nexcai."""
+    return Path(os.environ.get("NEXCAI_DATA_DIR") or os.path.expanduser("~/.cache/nexcai"))
+
+
+def get_llm(model: str = DEFAULT_LLM_MODEL) -> LLMInterface:
+    """Return the shared LLM client for a model."""
+    with _lock:
+        if model not in _llms:
+            _llms[model] = LLMInterface(model=model)
+        return _llms[model]
+
+
+def get_sentence_model(name: str = DEFAULT_ENCODER_MODEL):
+    """Return the shared SentenceTransformer, importing and loading it on first use."""
+    with _model_lock:
+        if name not in _sentence_models:
+            started = time.perf_counter()
+            from sentence_transformers import SentenceTransformer
+            record_timing("import sentence_transformers", time.perf_counter() - started)
+
+            started = time.perf_counter()
+            _sentence_models[name] = SentenceTransformer(name)
+            record_timing(f"load SentenceTransformer({name})", time.perf_counter() - started)
+        return _sentence_models[name]
+
+
+def get_encoder(name: str = DEFAULT_ENCODER_MODEL, max_entries: int = None, cache_dir=None):
+    """
+    Return the shared caching encoder for a model.
+    The underlying model is only loaded once something actually misses the cache.
+    `max_entries` (default 2048) and `cache_dir` configure the encoder when it is
+    first created; asking for different settings later raises ValueError.
+    """
+    from core.memory.embedding_cache import EmbeddingCache
+
+    with _lock:
+        if name not in _encoders:
+            _encoders[name] = EmbeddingCache(
+                None, name, max_entries=max_entries or 2048, cache_dir=cache_dir,
+                loader=lambda: get_sentence_model(name),
+            )
+        encoder = _encoders[name]
+        if ((max_entries is not None and max_entries != encoder.max_entries)
+                or (cache_dir is not None and Path(cache_dir) != encoder.cache_dir)):
+            raise ValueError(f"the shared '{name}' encoder already exists with other cache settings")
+        return encoder
+
+
+def enable_response_cache(threshold: float = 0.95, ttl: float = 3600, max_entries: int = 256):
+    """Turn on the shared answer cache (off by default). Call before agents are created."""
+    from core.memory.response_cache import SemanticResponseCache
+
+    global _response_cache
+    with _lock:
+        _response_cache = SemanticResponseCache(get_encoder(), threshold=threshold, ttl=ttl,
+                                                max_entries=max_entries)
+        return _response_cache
+
+
+def get_response_cache():
+    """The shared answer cache, or None unless `enable_response_cache` was called."""
+    return _response_cache
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+import numpy as np
+import pytest
+
+
+class FakeLLM:
+    """
+    Stand-in for LLMInterface. `answer` is what chat() and chat_stream()
+    return and `json_answer` what chat_json() returns; either may be a
+    callable taking the prompt. Every prompt is recorded in `calls`.
+    """
+
+    def __init__(self, answer: str = "", json_answer=None):
+        self.answer = answer
+        self.json_answer = json_answer
+        self.calls = []
+
+    @staticmethod
+    def text(prompt) -> str:
+        """The prompt as text: a string, or the last of a list of chat messages."""
+        return prompt if isinstance(prompt, str) else prompt[-1]["content"]
+
+    def _reply(self, value, prompt):
+        self.calls.append(prompt)
+        return value(prompt) if callable(value) else value
+
+    def chat(self, prompt, stream: bool = False, label: str = None) -> str:
+        return self._reply(self.answer, prompt)
+
+    def chat_stream(self, prompt, label: str = None):
+        yield self._reply(self.answer, prompt)
+
+    def chat_json(self, prompt, schema: dict = None, **kwargs):
+        return self._reply(self.json_answer, prompt)
+
+
+class FakeEncoder:
+    """
+    Stand-in for the caching sentence encoder: a normalized bag of hashed
+    words, so texts sharing most words are close and unrelated ones are not.
+    `loads` counts how often the (never needed) model was asked for.
+    """
+
+    def __init__(self, dimension: int = 64):
+        self.dimension = dimension
+        self.loads = 0
+
+    @property
+    def model(self):
+        self.loads += 1
+        return self
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dimension] += 1
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-6)
+
+
+class StubServer:
+    """
+    Local HTTP server answering every request with `handler(method, path, params, payload)`,
+    which returns (status, body). `body` is sent as JSON unless it is bytes.
+    Requests are recorded in `requests` as (method, path, params, payload).
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self._answer(None)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self._answer(json.loads(self.rfile.read(length) or b"null"))
+
+            def _answer(self, payload):
+                url = urlsplit(self.path)
+                params = dict(parse_qsl(url.query))
+                stub.requests.append((self.command, url.path, params, payload))
+                status, body = stub.handler(self.command, url.path, params, payload)
+                data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    """Start stub servers with `stub_server(handler)`; all are stopped after the test."""
+    servers = []
+
+    def start(handler):
+        server = StubServer(handler)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
@@ -0,0 +1,152 @@
+"""
+In-memory stand-in for the Google Calendar v3 service object: events().list
+with paging and sync tokens, insert/delete, and batch requests.
+"""
+import itertools
+import json
+import types
+from datetime import datetime
+from googleapiclient.errors import HttpError
+
+
+def http_error(status: int, message: str = "") -> HttpError:
+    resp = types.SimpleNamespace(status=status, reason=message)
+    return HttpError(resp, json.dumps({"error": {"code": status, "message": message}}).encode("utf-8"))
+
+
+def event(event_id: str, summary, start: str, end: str) -> dict:
+    """A timed event; `start`/`end` are ISO 8601 with offset."""
+    e = {"id": event_id, "start": {"dateTime": start}, "end": {"dateTime": end}}
+    if summary is not None:
+        e["summary"] = summary
+    return e
+
+
+class _Request:
+    def __init__(self, service, fn):
+        self.service = service
+        self.fn = fn
+
+    def execute(self):
+        self.service.round_trips += 1
+        return self.fn()
+
+
+class _Batch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self.requests.append((request_id or str(len(self.requests) + 1), request, callback))
+
+    def execute(self):
+        self.service.round_trips += 1
+        self.service.batch_sizes.append(len(self.requests))
+        for request_id, request, callback in self.requests:
+            try:
+                response, error = request.fn(), None
+            except HttpError as e:
+                response, error = None, e
+            (callback or self.callback)(request_id, response, error)
+
+
+class _Events:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, **params):
+        self.service.list_calls.append(params)
+        return _Request(self.service, lambda: self.service._list(**params))
+
+    def insert(self, calendarId, body, **kwargs):
+        return _Request(self.service, lambda: self.service._insert(body))
+
+    def delete(self, calendarId, eventId, **kwargs):
+        return _Request(self.service, lambda: self.service._delete(eventId))
+
+
+class FakeCalendar:
+    """
+    `failures` maps event ids (deletes) or summaries (inserts) to the HTTP
+    status the call should fail with; `expire_tokens` makes every sync
+    token answer 410 Gone.
+    """
+
+    def __init__(self, events=(), page_size: int = None):
+        self.events_by_id = {}
+        self.changes = []  # (sequence, event) in change order; sync tokens are sequence numbers
+        self._sequence = itertools.count(1)
+        self._ids = itertools.count(1)
+        self.page_size = page_size
+        self.expire_tokens = False
+        self.failures = {}
+        self.list_calls = []
+        self.batch_sizes = []
+        self.round_trips = 0
+        for e in events:
+            self._insert(e)
+
+    def events(self):
+        return _Events(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self, callback)
+
+    def cancel(self, event_id: str):
+        """Delete an event behind the store's back (as another client would)."""
+        self._delete(event_id)
+
+    # ---------------------------------------------------------------
+    # Server side
+    # ---------------------------------------------------------------
+    def _insert(self, body):
+        if body.get("summary") in self.failures:
+            raise http_error(self.failures[body["summary"]], "insert failed")
+        e = dict(body)
+        e.setdefault("id", f"new{next(self._ids)}")
+        e["status"] = "confirmed"
+        e["htmlLink"] = f"https://calendar.example/{e['id']}"
+        self.events_by_id[e["id"]] = e
+        self.changes.append((next(self._sequence), e))
+        return e
+
+    def _delete(self, event_id):
+        if event_id in self.failures:
+            raise http_error(self.failures[event_id], "delete failed")
+        if event_id not in self.events_by_id:
+            raise http_error(404, "Not Found")
+        e = self.events_by_id.pop(event_id)
+        self.changes.append((next(self._sequence), {"id": event_id, "status": "cancelled"}))
+        return ""
+
+    def _list(self, calendarId, syncToken=None, pageToken=None, maxResults=250, timeMin=None, timeMax=None, **kwargs):
+        if syncToken:
+            if self.expire_tokens:
+                raise http_error(410, "Sync token is no longer valid")
+            latest = {}
+            for sequence, e in self.changes:
+                if sequence > int(syncToken):
+                    latest[e["id"]] = e
+            items = list(latest.values())
+        else:
+            items = sorted(self.events_by_id.values(), key=lambda e: self._ts(e["start"]))
+            if timeMin:
+                items = [e for e in items if self._ts(e["end"]) > self._ts({"dateTime": timeMin})]
+            if timeMax:
+                items = [e for e in items if self._ts(e["start"]) < self._ts({"dateTime": timeMax})]
+
+        size = self.page_size or maxResults
+        start = int(pageToken or 0)
+        page = {"items": items[start:start + size]}
+        if start + size < len(items):
+            page["nextPageToken"] = str(start + size)
+        else:
+            page["nextSyncToken"] = str(self.changes[-1][0] if self.changes else 0)
+        return page
+
+    @staticmethod
+    def _ts(when: dict) -> float:
+        value = when.get("dateTime") or when["date"] + "T00:00:00+00:00"
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
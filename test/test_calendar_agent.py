@@ -0,0 +1,102 @@
+import sqlite3
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+from core.agents.calendar.agent import CalendarAgent
+from core.agents.calendar.event_store import EventStore
+from core.orchestrator.registry import AGENT_SPECS, AgentRegistry
+from .conftest import FakeLLM
+from .fake_calendar import FakeCalendar, event
+
+
+def create(summary: str, day: int = 7) -> dict:
+    return {"intent": "create", "event": {
+        "summary": summary,
+        "start_time": f"2099-01-{day:02d}T12:00:00+01:00",
+        "end_time": f"2099-01-{day:02d}T13:00:00+01:00",
+    }}
+
+
+def agent_for(calendar: FakeCalendar, actions=()) -> CalendarAgent:
+    return CalendarAgent(llm=FakeLLM(json_answer={"actions": list(actions)}), service=calendar,
+                         store=EventStore(":memory:", sync_interval=0))
+
+
+def test_delete_skips_untitled_events():
+    calendar = FakeCalendar([
+        event("untitled", None, "2099-01-07T09:00:00+00:00", "2099-01-07T10:00:00+00:00"),
+        event("dentist", "Dentist", "2099-01-08T09:00:00+00:00", "2099-01-08T10:00:00+00:00"),
+    ])
+    agent = agent_for(calendar)
+
+    assert agent.delete_event("dentist") == "Deleted events: Dentist"
+    assert list(calendar.events_by_id) == ["untitled"]
+
+
+def test_creates_and_deletes_share_one_round_trip_with_per_item_results():
+    calendar = FakeCalendar([event("old", "Old sync", "2099-01-05T09:00:00+00:00", "2099-01-05T10:00:00+00:00")])
+    agent = agent_for(calendar, [create("Lunch with Anna"), {"intent": "delete", "summary": "old sync"},
+                                 create("Call Bob", 8)])
+    calendar.round_trips = 0
+
+    reply = agent.run("Add lunch with Anna and a call with Bob, and drop the old sync")
+    lines = reply.split("\n\n")
+    assert lines[0].startswith("Event 'Lunch with Anna' created!")
+    assert lines[1] == "Deleted events: Old sync"
+    assert lines[2].startswith("Event 'Call Bob' created!")
+    assert calendar.batch_sizes == [3]
+    assert calendar.round_trips == 2  # the sync, then one batch
+    assert sorted(e["summary"] for e in agent.store.upcoming()) == ["Call Bob", "Lunch with Anna"]
+
+
+def test_a_failing_item_does_not_stop_the_batch():
+    calendar = FakeCalendar()
+    calendar.failures["Broken"] = 403
+    agent = agent_for(calendar, [create("First"), create("Broken"), create("Last")])
+
+    reply = agent.run("Add three events")
+    assert "Event 'First' created!" in reply and "Event 'Last' created!" in reply
+    assert "Could not create 'Broken': " in reply
+    assert sorted(e["summary"] for e in calendar.events_by_id.values()) == ["First", "Last"]
+
+
+def test_deletes_of_events_already_gone_count_as_done():
+    calendar = FakeCalendar([
+        event("a", "Sync A", "2099-01-07T09:00:00+00:00", "2099-01-07T10:00:00+00:00"),
+        event("b", "Sync B", "2099-01-07T11:00:00+00:00", "2099-01-07T12:00:00+00:00"),
+        event("c", "Sync C", "2099-01-07T13:00:00+00:00", "2099-01-07T14:00:00+00:00"),
+        event("d", "Sync D", "2099-01-07T15:00:00+00:00", "2099-01-07T16:00:00+00:00"),
+    ])
+    calendar.failures.update({"b": 404, "c": 410, "d": 500})
+    agent = agent_for(calendar)
+
+    reply = agent.delete_event("sync")
+    deleted, failed = reply.splitlines()
+    assert deleted == "Deleted events: Sync A, Sync B, Sync C"
+    assert failed.startswith("Could not delete: Sync D (")
+    assert [e["id"] for e in agent.store.upcoming()] == ["d"]
+
+
+def test_large_batches_are_split_into_chunks_of_fifty():
+    calendar = FakeCalendar([
+        event(f"e{i}", f"Event {i}", "2099-01-07T09:00:00+00:00", "2099-01-07T10:00:00+00:00") for i in range(120)
+    ])
+    calendar.failures["e77"] = 500
+    agent = agent_for(calendar)
+
+    results = agent._execute_batch([agent._delete_request({"id": f"e{i}"}) for i in range(120)])
+    assert calendar.batch_sizes == [50, 50, 20]
+    assert [error is None for _, error in results] == [i != 77 for i in range(120)]
+    assert list(calendar.events_by_id) == ["e77"]
+
+
+def test_closing_the_registry_closes_the_calendar_store():
+    store = EventStore(":memory:", sync_interval=0)
+    registry = AgentRegistry({"calendar": AGENT_SPECS["calendar"]}, kwargs={
+        "calendar": {"llm": FakeLLM(), "service": FakeCalendar(), "store": store}})
+    assert registry.get("calendar").store is store
+
+    registry.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        store.upcoming()
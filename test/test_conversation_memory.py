@@ -0,0 +1,79 @@
+import threading
+from core.memory.conversation_memory import ConversationMemory, estimate_tokens
+from core.utils import llm_interface
+from .conftest import FakeLLM
+
+
+def message_of(n: int) -> str:
+    """A message of exactly n estimated tokens."""
+    return "x" * (4 * (n - 1))
+
+
+def test_old_turns_are_dropped_to_stay_within_the_token_budget():
+    memory = ConversationMemory(max_length=10, max_tokens=20)
+    for turn in range(4):
+        memory.add("user", f"{turn}" + message_of(6)[1:])
+
+    assert [m["content"][0] for m in memory.get_messages()] == ["1", "2", "3"]
+    assert memory.token_count() == 18
+    assert memory.get_context().startswith("User: 1")
+
+
+def test_the_newest_message_is_kept_even_over_budget():
+    memory = ConversationMemory(max_tokens=20, max_message_tokens=100)
+    memory.add("user", "hello")
+    memory.add("assistant", message_of(50))
+
+    assert [m["role"] for m in memory.get_messages()] == ["assistant"]
+    assert memory.token_count() == 50
+
+
+def test_an_overlong_message_keeps_its_head_and_tail():
+    memory = ConversationMemory(max_message_tokens=10)
+    memory.add("user", "start " + "x" * 200 + " end")
+
+    content = memory.get_messages()[0]["content"]
+    assert content.startswith("start ") and content.endswith(" end") and " […] " in content
+    assert estimate_tokens(content) <= 12
+
+
+def test_evicted_turns_are_summarized_in_the_background():
+    release = threading.Event()
+    prompts = []
+
+    def summarize(prompt):
+        prompts.append((prompt, getattr(llm_interface._background, "active", False)))
+        release.wait(5)
+        return "The user lives in Munich."
+
+    memory = ConversationMemory(max_length=2, llm=FakeLLM(summarize), summarize_every=1)
+    memory.add("user", "I live in Munich")
+    memory.add("assistant", "Nice city")
+    memory.add("user", "What should I wear?")  # evicts the first turn
+
+    # add() returned while the summary is still being written
+    assert memory.summary == ""
+    assert memory.get_context() == "Assistant: Nice city\nUser: What should I wear?"
+
+    release.set()
+    memory.close()
+    (prompt, in_background), = prompts
+    assert "User: I live in Munich" in prompt and "Nice city" not in prompt
+    assert in_background  # queued behind user requests by the scheduler
+    assert memory.get_context().startswith("Earlier in the conversation: The user lives in Munich.\nAssistant: ")
+
+
+def test_turns_evicted_during_a_summary_go_into_the_next_one():
+    release = threading.Event()
+    llm = FakeLLM(lambda prompt: release.wait(5) and "summary")
+    memory = ConversationMemory(max_length=1, llm=llm, summarize_every=1)
+    memory.add("user", "one")
+    memory.add("user", "two")  # starts summarizing "one"
+    memory.add("user", "three")  # "two" waits for the running summary
+
+    release.set()
+    memory.close()
+    memory.add("user", "four")  # the next summary takes "two" and "three"
+    memory.close()
+    assert len(llm.calls) == 2
+    assert "User: two\nUser: three" in llm.calls[1] and "summary" in llm.calls[1]
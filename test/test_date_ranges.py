@@ -0,0 +1,123 @@
+from datetime import date, datetime
+import pytest
+import pytz
+from core.agents.calendar.date_ranges import parse_calendar_query
+from core.agents.weather.agent import query_window
+from core.utils.periods import find_period
+
+TZ = pytz.timezone("Europe/Berlin")
+WEDNESDAY = TZ.localize(datetime(2025, 3, 12, 10, 30))
+SUNDAY = TZ.localize(datetime(2025, 3, 16, 10, 30))
+
+
+def day_range(first: str, last: str = None, start: str = "00:00:00"):
+    offset = "+01:00" if first < "2025-03-30" else "+02:00"
+    last = last or first
+    last_offset = "+01:00" if last < "2025-03-30" else "+02:00"
+    return [{"intent": "list", "start_time": f"{first}T{start}{offset}",
+             "end_time": f"{last}T23:59:59{last_offset}", "days": None}]
+
+
+def days(n):
+    return [{"intent": "list", "start_time": "", "end_time": "", "days": n}]
+
+
+def delete(summary):
+    return [{"intent": "delete", "summary": summary}]
+
+
+# what the LLM would answer on Wednesday 2025-03-12; None means it must be asked
+WEDNESDAY_CORPUS = [
+    ("What's on tomorrow?", day_range("2025-03-13")),
+    ("show me today's events", day_range("2025-03-12")),
+    ("Do I have anything tonight?", day_range("2025-03-12", start="18:00:00")),
+    ("what do i have the day after tomorrow", day_range("2025-03-14")),
+    ("Show my events for the next 3 days", days(3)),
+    ("list appointments for the next three days", days(3)),
+    ("what's coming up in the next 2 weeks", days(14)),
+    ("What's my schedule this week?", day_range("2025-03-10", "2025-03-16")),
+    ("show next week", day_range("2025-03-17", "2025-03-23")),
+    ("am I busy this weekend", day_range("2025-03-15", "2025-03-16")),
+    ("any meetings on Friday?", day_range("2025-03-14")),
+    ("what's on wednesday", day_range("2025-03-12")),
+    ("events next wednesday", day_range("2025-03-19")),
+    ("show my calendar for March 20th", day_range("2025-03-20")),
+    ("what do I have on 2 april", day_range("2025-04-02")),
+    ("list events on 2025-04-01", day_range("2025-04-01")),
+    ("show me all events this month", day_range("2025-03-01", "2025-03-31")),
+    ("show upcoming events", days(None)),
+    ("Cancel the dentist appointment", delete("dentist appointment")),
+    ("please remove team sync from my calendar", delete("team sync")),
+    ("cancel team meeting", delete("team meeting")),
+    ("remove lunch with Anna please", delete("lunch with anna")),
+    ("Add a meeting with Anna tomorrow at 3pm", None),
+    ("schedule a call with Bob on Friday", None),
+    ("cancel that meeting", None),
+    ("delete it", None),
+    ("show tomorrow and delete gym", None),
+    ("what's on after my trip", None),
+    ("move my dentist appointment to Friday", None),
+]
+
+# on Sunday 2025-03-16 "last monday", "yesterday" and plain weekdays are easy to get wrong
+SUNDAY_CORPUS = [
+    ("what's on monday", day_range("2025-03-17")),
+    ("anything today", day_range("2025-03-16")),
+    ("am I busy this weekend", day_range("2025-03-15", "2025-03-16")),
+    ("what meetings did I have yesterday", None),
+    ("show last week", None),
+    ("show events last monday", None),
+    ("what was on my calendar 3 days ago", None),
+    ("show meetings from monday to wednesday", None),
+    ("what's on until friday", None),
+    ("any meetings between tuesday and thursday", None),
+    ("list meetings tomorrow or friday", None),
+    ("what's on before friday", None),
+    ("cancel my appointment at 3pm on Friday", None),
+    ("delete the dentist appointment on March 20th", None),
+    ("cancel standup for the rest of the week", None),
+    ("remove the 9:30 call", None),
+    # deletes match titles by substring: anything scoped by date or quantity goes to the LLM
+    ("delete my gym session tomorrow", None),
+    ("cancel my yoga class this weekend", None),
+    ("delete the standup from tomorrow", None),
+    ("cancel everything tomorrow", None),
+    ("cancel all meetings", None),
+    ("delete my calendar", None),
+    ("remove the meetings", None),
+    ("delete the call with", None),
+]
+
+
+@pytest.mark.parametrize("query,expected", WEDNESDAY_CORPUS)
+def test_wednesday_corpus(query, expected):
+    assert parse_calendar_query(query, WEDNESDAY, TZ) == expected
+
+
+@pytest.mark.parametrize("query,expected", SUNDAY_CORPUS)
+def test_sunday_corpus(query, expected):
+    assert parse_calendar_query(query, SUNDAY, TZ) == expected
+
+
+@pytest.mark.parametrize("query,today,window", [
+    ("weather this weekend", date(2025, 3, 12), (3, 2)),
+    ("weather this weekend", date(2025, 3, 15), (0, 2)),
+    ("weather this weekend", date(2025, 3, 16), (0, 1)),  # Saturday is over
+    ("forecast for this week", date(2025, 3, 12), (0, 5)),
+    ("rain next week?", date(2025, 3, 12), (5, 7)),
+    ("weather on friday", date(2025, 3, 16), (5, 1)),
+    ("weather on March 20th", date(2025, 3, 16), (4, 1)),
+    ("next 30 days", date(2025, 3, 16), (0, 16)),
+    ("is it cold outside", date(2025, 3, 16), (0, 2)),
+])
+def test_weather_window_uses_the_same_periods(query, today, window):
+    assert query_window(query, today) == window
+
+
+def test_weather_and_calendar_agree_on_the_weekend_in_progress():
+    sunday = SUNDAY.date()
+    _, first, last, _ = find_period("this weekend", sunday)
+    start_day, n = query_window("this weekend", sunday)
+    assert (first, last) == (date(2025, 3, 15), sunday)
+    # the forecast covers the part of the same weekend that is still ahead
+    assert (start_day, start_day + n - 1) == (0, (last - sunday).days)
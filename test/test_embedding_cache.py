@@ -0,0 +1,71 @@
+import numpy as np
+from core.memory.embedding_cache import EmbeddingCache
+from .conftest import FakeEncoder
+
+
+class CountingEncoder(FakeEncoder):
+    """Records every text the model is actually run on; `offset` tells models apart."""
+
+    def __init__(self, dimension: int = 16, offset: float = 0.0):
+        super().__init__(dimension)
+        self.offset = offset
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return super().encode(texts) + self.offset
+
+
+def test_the_least_recently_used_entry_is_evicted():
+    model = CountingEncoder()
+    cache = EmbeddingCache(model, "test-model", max_entries=2)
+    cache.encode(["alpha", "beta"])
+    cache.encode(["alpha"])  # alpha is now the most recently used
+    cache.encode(["gamma"])  # ...so beta is evicted
+
+    assert model.encoded == ["alpha", "beta", "gamma"]
+    cache.encode(["alpha", "gamma"])
+    assert model.encoded == ["alpha", "beta", "gamma"]
+    cache.encode(["beta"])
+    assert model.encoded == ["alpha", "beta", "gamma", "beta"]
+    assert cache.stats() == {"hits": 3, "misses": 4, "hit_rate": 3 / 7, "entries": 2}
+
+
+def test_repeats_and_respellings_are_encoded_once():
+    model = CountingEncoder()
+    cache = EmbeddingCache(model, "test-model")
+    vectors = cache.encode(["I live in Munich", "i  live in MUNICH", "I live in Munich"])
+
+    assert model.encoded == ["I live in Munich"]
+    np.testing.assert_array_equal(vectors[0], vectors[1])
+    np.testing.assert_array_equal(vectors[0], vectors[2])
+
+
+def test_embeddings_survive_a_restart_on_disk(tmp_path):
+    first = EmbeddingCache(CountingEncoder(), "test-model", cache_dir=tmp_path)
+    expected = first.encode(["I live in Munich", "My sister is called Anna"])
+
+    def load_model():
+        raise AssertionError("the model was loaded for cached texts")
+
+    restarted = EmbeddingCache(None, "test-model", cache_dir=tmp_path, loader=load_model)
+    np.testing.assert_array_equal(restarted.encode(["My sister is called Anna", "i live in munich"]),
+                                  expected[::-1])
+    assert restarted.stats()["hits"] == 2
+
+
+def test_models_sharing_a_cache_dir_do_not_share_entries(tmp_path):
+    small, large = CountingEncoder(offset=0.0), CountingEncoder(offset=1.0)
+    small_cache = EmbeddingCache(small, "small-model", cache_dir=tmp_path)
+    large_cache = EmbeddingCache(large, "large-model", cache_dir=tmp_path)
+
+    assert small_cache.key("I live in Munich") != large_cache.key("I live in Munich")
+    from_small = small_cache.encode(["I live in Munich"])
+    from_large = large_cache.encode(["I live in Munich"])
+    assert small.encoded == large.encoded == ["I live in Munich"]
+    assert not np.array_equal(from_small, from_large)
+
+    # after a restart each model still reads back its own vector
+    np.testing.assert_array_equal(EmbeddingCache(large, "large-model", cache_dir=tmp_path)
+                                  .encode(["I live in Munich"]), from_large)
+    assert large.encoded == ["I live in Munich"]
@@ -0,0 +1,147 @@
+import time
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+from core.agents.calendar.event_store import EventStore, iter_pages
+from .fake_calendar import FakeCalendar, event
+
+
+@pytest.fixture
+def calendar():
+    return FakeCalendar([
+        event("standup", "Standup", "2030-01-07T09:00:00+00:00", "2030-01-07T09:15:00+00:00"),
+        event("lunch", "Lunch with Anna", "2030-01-07T12:00:00+00:00", "2030-01-07T13:00:00+00:00"),
+        event("review", "Design review", "2030-01-08T15:00:00+00:00", "2030-01-08T16:00:00+00:00"),
+    ], page_size=2)
+
+
+@pytest.fixture
+def store():
+    store = EventStore(":memory:", sync_interval=0)
+    yield store
+    store.close()
+
+
+def ids(events):
+    return [e["id"] for e in events]
+
+
+def test_first_sync_downloads_every_page(calendar, store):
+    store.sync(calendar)
+
+    assert ids(store.upcoming()) == ["standup", "lunch", "review"]
+    assert len(calendar.list_calls) == 2  # two pages of two
+    assert "syncToken" not in calendar.list_calls[0]
+
+
+def test_later_syncs_only_fetch_changes(calendar, store):
+    store.sync(calendar)
+    calendar._insert(event("retro", "Retro", "2030-01-09T10:00:00+00:00", "2030-01-09T11:00:00+00:00"))
+    calendar.cancel("lunch")
+    calendar.list_calls.clear()
+
+    store.sync(calendar)
+    assert calendar.list_calls[0]["syncToken"]
+    assert ids(store.upcoming()) == ["standup", "review", "retro"]
+
+
+def test_sync_is_skipped_within_the_interval(calendar):
+    store = EventStore(":memory:", sync_interval=60)
+    store.sync(calendar)
+    store.sync(calendar)
+    assert len(calendar.list_calls) == 2  # only the first sync's two pages
+    store.sync(calendar, force=True)
+    assert len(calendar.list_calls) == 3
+
+
+def focus_block(day: int) -> dict:
+    return event(f"day{day}", "Focus", f"2030-01-{day:02d}T10:00:00+00:00", f"2030-01-{day:02d}T11:00:00+00:00")
+
+
+def test_iter_pages_follows_next_page_tokens(calendar):
+    for day in (9, 10):
+        calendar._insert(focus_block(day))
+
+    pages = iter_pages(calendar, calendarId="primary", singleEvents=True)
+    first = next(pages)
+    assert len(calendar.list_calls) == 1  # later pages are only fetched on demand
+    rest = list(pages)
+
+    assert [ids(page["items"]) for page in [first] + rest] == [
+        ["standup", "lunch"], ["review", "day9"], ["day10"]]
+    assert [call.get("pageToken") for call in calendar.list_calls] == [None, "2", "4"]
+    assert all(call["calendarId"] == "primary" and call["singleEvents"] for call in calendar.list_calls)
+    assert "nextPageToken" not in rest[-1] and rest[-1]["nextSyncToken"]
+
+
+def test_incremental_changes_span_several_pages(calendar, store):
+    store.sync(calendar)
+    for day in (9, 10, 11):
+        calendar._insert(focus_block(day))
+    calendar.list_calls.clear()
+
+    store.sync(calendar)
+    assert [call.get("pageToken") for call in calendar.list_calls] == [None, "2"]
+    assert calendar.list_calls[0]["syncToken"] == calendar.list_calls[1]["syncToken"]
+    assert ids(store.upcoming()) == ["standup", "lunch", "review", "day9", "day10", "day11"]
+
+
+def test_expired_token_downloads_everything_again(calendar, store):
+    store.sync(calendar)
+    calendar.cancel("standup")
+    calendar.expire_tokens = True
+    store.put(event("stale", "Only in the local copy", "2030-01-07T08:00:00+00:00", "2030-01-07T08:30:00+00:00"))
+    calendar.list_calls.clear()
+
+    store.sync(calendar)
+    assert "syncToken" in calendar.list_calls[0]
+    assert all("syncToken" not in call for call in calendar.list_calls[1:])
+    assert ids(store.upcoming()) == ["lunch", "review"]  # the local copy was replaced
+
+
+def test_between_returns_overlapping_events_in_start_order(calendar, store):
+    store.sync(calendar)
+
+    # the lunch overlaps the window's start; the review starts exactly at its end
+    assert ids(store.between("2030-01-07T12:30:00+00:00", "2030-01-08T15:00:00+00:00")) == ["lunch"]
+    assert ids(store.between("2030-01-07T00:00:00Z", "2030-01-09T00:00:00Z")) == ["standup", "lunch", "review"]
+    assert ids(store.between("2030-01-07T00:00:00Z", "2030-01-09T00:00:00Z", limit=2)) == ["standup", "lunch"]
+
+
+def test_upcoming_skips_finished_events(store):
+    now = time.time()
+    iso = lambda t: time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(t))
+    store.put(event("past", "Done", iso(now - 7200), iso(now - 3600)))
+    store.put(event("running", "Running", iso(now - 600), iso(now + 600)))
+    store.put(event("later", "Later", iso(now + 3600), iso(now + 7200)))
+    store.put(event("soon", None, iso(now + 60), iso(now + 120)))
+
+    assert ids(store.upcoming()) == ["running", "soon", "later"]
+    assert ids(store.upcoming(limit=1)) == ["running"]
+
+
+def test_a_reset_after_an_expired_token_pages_from_the_start(calendar, store):
+    store.sync(calendar)
+    calendar.expire_tokens = True
+    calendar.list_calls.clear()
+
+    store.sync(calendar)
+    expired, *full = calendar.list_calls
+    assert expired["syncToken"] and "pageToken" not in expired
+    assert [(call.get("syncToken"), call.get("pageToken")) for call in full] == [(None, None), (None, "2")]
+
+    # the new token from the full download works for the next incremental sync
+    calendar.expire_tokens = False
+    calendar.cancel("review")
+    calendar.list_calls.clear()
+    store.sync(calendar)
+    assert len(calendar.list_calls) == 1 and calendar.list_calls[0]["syncToken"]
+    assert ids(store.upcoming()) == ["standup", "lunch"]
+
+
+def test_the_default_database_lives_in_the_data_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("NEXCAI_DATA_DIR", str(tmp_path))
+    store = EventStore()
+    assert store.path == tmp_path / "calendar.sqlite3" and store.path.exists()
+    store.close()
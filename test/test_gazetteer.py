@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from core.agents.weather.gazetteer import DEFAULT_SOURCE, Gazetteer, fold
+
+
+@pytest.fixture(scope="module")
+def gazetteer(tmp_path_factory):
+    return Gazetteer(DEFAULT_SOURCE, cache_dir=tmp_path_factory.mktemp("gazetteer"))
+
+
+def names(cities):
+    return [(c["name"], c["country"]) for c in cities]
+
+
+def test_homonyms_are_listed_most_populous_first(gazetteer):
+    assert names(gazetteer.lookup("Valencia")) == [("Valencia", "VE"), ("Valencia", "ES")]
+    assert names(gazetteer.lookup("paris")) == [("Paris", "FR"), ("Paris", "US")]
+
+
+def test_only_a_dominant_homonym_resolves_on_its_own(gazetteer):
+    assert gazetteer.resolve("What's the weather in Valencia?") == (None, True)
+    city, ambiguous = gazetteer.resolve("Is it raining in Paris?")
+    assert (city["name"], city["country"], ambiguous) == ("Paris", "FR", False)
+    assert (city["lat"], city["lon"]) == (48.8566, 2.3522)
+
+
+def test_diacritics_and_transliterations_find_the_same_city(gazetteer):
+    assert fold("München") == fold("MUNCHEN") == "munchen"
+    for spelling in ("Munich", "München", "Muenchen", "MUNCHEN"):
+        assert names(gazetteer.lookup(spelling)) == [("Munich", "DE")], spelling
+    assert [(phrase, names(cities)) for phrase, cities in gazetteer.find("Wetter in Zürich und Köln?")] == [
+        ("Zürich", [("Zurich", "CH")]), ("Köln", [("Cologne", "DE")])]
+
+
+def test_misspellings_are_matched_fuzzily(gazetteer):
+    assert names(gazetteer.fuzzy_lookup("Munchn")) == [("Munich", "DE")]
+    assert gazetteer.fuzzy_lookup("Mxyzptlk") == []
+
+
+def test_misses(gazetteer):
+    assert gazetteer.lookup("Atlantis") == []
+    assert gazetteer.find("what's the weather like tomorrow?") == []
+    assert gazetteer.resolve("weather in Atlantis") == (None, False)
+    # everyday words only count as places when capitalized
+    assert gazetteer.find("nice weather today") == []
+    assert names(gazetteer.find("weather in Nice")[0][1]) == [("Nice", "FR")]
+
+
+def test_later_loads_memory_map_the_compiled_index(tmp_path):
+    source = tmp_path / "cities.tsv"
+    source.write_text("Springfield\t\t39.7817\t-89.6501\tUS\t114000\n"
+                      "Springfield\t\t37.2090\t-93.2923\tUS\t169000\n", encoding="utf-8")
+    first = Gazetteer(source, cache_dir=tmp_path / "cache")
+    assert not isinstance(first._arrays["lat"], np.memmap)  # compiled from the source
+
+    second = Gazetteer(source, cache_dir=tmp_path / "cache")
+    assert isinstance(second._arrays["lat"], np.memmap)
+    assert second.lookup("springfield") == first.lookup("springfield")
+    assert [c["population"] for c in second.lookup("springfield")] == [169000, 114000]
+
+    # an edited source is compiled again rather than served from the stale cache
+    source.write_text("Shelbyville\t\t39.4067\t-88.7901\tUS\t4700\n", encoding="utf-8")
+    edited = Gazetteer(source, cache_dir=tmp_path / "cache")
+    assert edited.lookup("springfield") == [] and len(edited.lookup("Shelbyville")) == 1
+
+
+def test_geonames_dumps_are_read_too(tmp_path):
+    row = ["2867714", "Munich", "Munich", "Muenchen,München", "48.13743", "11.57549", "P", "PPLA", "DE",
+           "", "02", "091", "09162", "09162000", "1260391", "", "524", "Europe/Berlin", "2023-10-12"]
+    source = tmp_path / "cities15000.txt"
+    source.write_text("\t".join(row) + "\n", encoding="utf-8")
+
+    city, ambiguous = Gazetteer(source, cache_dir=tmp_path / "cache").resolve("Wetter in München")
+    assert (city["name"], city["country"], city["population"], ambiguous) == ("Munich", "DE", 1260391, False)
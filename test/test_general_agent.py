@@ -0,0 +1,44 @@
+import numpy as np
+from core.agents.general.agent import GeneralAgent
+from core.memory.conversation_memory import ConversationMemory
+from core.memory.response_cache import SemanticResponseCache
+from .conftest import FakeLLM
+
+
+class BagOfWords:
+    """Embeds by word counts, so identical questions are identical vectors."""
+
+    def encode(self, texts):
+        return [np.array([t.lower().count(w) for w in ("tomorrow", "and", "what", "about", "paris")],
+                         dtype=np.float32) + 1e-3 for t in texts]
+
+
+class FakeLongTermMemory:
+    def search(self, query, k=3):
+        return []
+
+    def add_async(self, text):
+        pass
+
+
+def agent_with(cache) -> GeneralAgent:
+    llm = FakeLLM(lambda messages: f"answer {len(llm.calls)}")
+    return GeneralAgent(FakeLongTermMemory(), llm=llm, memory=ConversationMemory(max_length=10, max_tokens=1500),
+                        response_cache=cache)
+
+
+def test_cached_answers_are_tied_to_the_conversation():
+    cache = SemanticResponseCache(BagOfWords())
+    first, second = agent_with(cache), agent_with(cache)
+
+    assert first.run("and tomorrow?") == "answer 1"
+    # a fresh conversation asking the same thing gets the cached answer
+    assert second.run("and tomorrow?") == "answer 1"
+    assert second.llm.calls == []
+
+    # the same words after other turns are a different question
+    second.memory.add("user", "what about Paris")
+    second.memory.add("assistant", "Paris is nice")
+    second.run("and tomorrow?")
+    assert len(second.llm.calls) == 1
+    assert cache.stats()["hits"] == 1
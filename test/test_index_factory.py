@@ -0,0 +1,27 @@
+import faiss
+import pytest
+from benchmarks.bench_memory_index import make_vectors
+from core.memory.index_factory import INDEX_TYPES, build_index, index_kind, recall_at_k
+
+
+@pytest.fixture(scope="module")
+def data():
+    vectors = make_vectors(6000, 64, clusters=30)
+    return vectors[:5000], vectors[5000:]
+
+
+@pytest.mark.parametrize("kind", INDEX_TYPES)
+def test_every_kind_keeps_recall_with_inner_product(data, kind):
+    vectors, queries = data
+    exact = build_index("flat", 64, vectors, metric=faiss.METRIC_INNER_PRODUCT)
+    index = build_index(kind, 64, vectors, metric=faiss.METRIC_INNER_PRODUCT, pq_m=8)
+
+    assert index_kind(index) == kind
+    assert index.metric_type == faiss.METRIC_INNER_PRODUCT
+    assert recall_at_k(exact.search(queries, 10)[1], index.search(queries, 10)[1]) >= 0.9
+
+
+def test_kind_survives_a_snapshot(data, tmp_path):
+    index = build_index("ivfpq", 64, data[0], metric=faiss.METRIC_INNER_PRODUCT, pq_m=8)
+    faiss.write_index(index, str(tmp_path / "index"))
+    assert index_kind(faiss.read_index(str(tmp_path / "index"))) == "ivfpq"
@@ -0,0 +1,91 @@
+import json
+import socket
+import stat
+import pytest
+from core.utils.llm_interface import LLMInterface
+
+
+def ndjson(*chunks) -> bytes:
+    return b"".join(json.dumps(c).encode("utf-8") + b"\n" for c in chunks)
+
+
+def ollama(method, path, params, payload):
+    """Minimal Ollama API: echoes the model name, streams three pieces."""
+    if payload["stream"]:
+        pieces = [{"response": p, "done": False} for p in ("Hel", "lo", "!")]
+        return 200, ndjson(*pieces, {"response": "", "done": True, "eval_count": 3, "eval_duration": 3_000_000})
+    if path == "/api/chat":
+        return 200, {"message": {"role": "assistant", "content": " chat reply "}, "done": True}
+    return 200, {"response": f" reply from {payload['model']} ", "done": True}
+
+
+@pytest.fixture
+def unused_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def fake_cli(tmp_path):
+    """An `ollama` executable that ignores the prompt and prints a fixed answer."""
+    path = tmp_path / "ollama"
+    path.write_text("#!/bin/sh\ncat > /dev/null\necho 'cli answer'\n")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+def test_chat_over_http(stub_server):
+    server = stub_server(ollama)
+    llm = LLMInterface(model="tiny", host=server.url)
+
+    assert llm.chat("Hi") == "reply from tiny"
+    method, path, _, payload = server.requests[-1]
+    assert (method, path) == ("POST", "/api/generate")
+    assert payload["prompt"] == "Hi" and payload["keep_alive"] == "30m" and not payload["stream"]
+
+
+def test_messages_go_to_chat_endpoint(stub_server):
+    server = stub_server(ollama)
+    llm = LLMInterface(host=server.url)
+
+    messages = [{"role": "system", "content": "Be brief."}, {"role": "user", "content": "Hi"}]
+    assert llm.chat(messages) == "chat reply"
+    assert server.requests[-1][1] == "/api/chat"
+    assert server.requests[-1][3]["messages"] == messages
+
+
+def test_clients_share_a_session_per_host(stub_server):
+    server = stub_server(ollama)
+    assert LLMInterface(host=server.url).session is LLMInterface(host=server.url + "/").session
+
+
+def test_stream_yields_ndjson_pieces(stub_server):
+    server = stub_server(ollama)
+    llm = LLMInterface(host=server.url)
+
+    assert list(llm.chat_stream("Hi")) == ["Hel", "lo", "!"]
+    assert llm.last_metrics["transport"] == "http"
+    assert llm.last_metrics["tokens"] == 3
+    assert llm.last_metrics["tokens_per_sec"] == pytest.approx(1000)
+
+
+def test_falls_back_to_cli_when_server_is_down(unused_port, fake_cli):
+    llm = LLMInterface(host=f"127.0.0.1:{unused_port}")
+    llm.ollama_path = fake_cli
+
+    assert llm.chat("Hi") == "cli answer"
+    assert not llm._http_enabled()  # the server is not retried on every call
+    assert "".join(llm.chat_stream("Hi")).strip() == "cli answer"
+    assert llm.last_metrics["transport"] == "cli"
+
+
+def test_chat_json_checks_the_schema(stub_server):
+    answers = iter([{"intent": "weather"}, {"intent": "sports"}])
+    server = stub_server(lambda *_: (200, {"response": json.dumps(next(answers)), "done": True}))
+    llm = LLMInterface(host=server.url)
+    schema = {"type": "object", "properties": {"intent": {"enum": ["weather", "calendar"]}}, "required": ["intent"]}
+
+    assert llm.chat_json("Classify", schema) == {"intent": "weather"}
+    assert server.requests[-1][3]["format"] == schema
+    assert llm.chat_json("Classify", schema) is None
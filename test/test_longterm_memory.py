@@ -0,0 +1,152 @@
+import threading
+import time
+import pytest
+from core.memory.index_factory import build_index, index_kind
+from core.memory.longterm_memory import LongTermMemory
+from core.utils.shared import get_encoder
+from .conftest import FakeEncoder, FakeLLM
+
+
+def remember_everything(prompt) -> str:
+    """The memorability filter's answer: yes to every text, single or batched."""
+    if "For each numbered statement" in prompt:
+        return "\n".join(f"{i}: yes" for i in range(1, 1000))
+    return "YES"
+
+
+def open_memory(base_dir, encoder=None, **kwargs) -> LongTermMemory:
+    return LongTermMemory(base_dir=base_dir, encoder=encoder or FakeEncoder(),
+                          llm=FakeLLM(remember_everything), **kwargs)
+
+
+def test_opening_a_saved_store_does_not_load_the_model(tmp_path):
+    memory = open_memory(tmp_path)
+    memory.add("I live in Munich")
+    memory.close()
+
+    encoder = FakeEncoder()
+    reopened = open_memory(tmp_path, encoder)
+    assert reopened.memories == ["I live in Munich"]
+    assert reopened.dimension == 64
+    assert encoder.loads == 0
+
+
+def test_the_shared_encoder_refuses_conflicting_settings(tmp_path):
+    encoder = get_encoder("test-only-encoder", max_entries=16)
+    assert get_encoder("test-only-encoder") is encoder
+    assert get_encoder("test-only-encoder", max_entries=16) is encoder
+    with pytest.raises(ValueError):
+        get_encoder("test-only-encoder", max_entries=4096)
+    with pytest.raises(ValueError):
+        get_encoder("test-only-encoder", cache_dir=tmp_path)
+
+
+def distinct(i: int) -> str:
+    return f"note w{i} x{i}"
+
+
+def test_writes_during_a_promotion_reach_the_new_index(tmp_path, monkeypatch):
+    import core.memory.longterm_memory as ltm
+
+    building, proceed = threading.Event(), threading.Event()
+    builds = []
+
+    def slow_build_index(kind, *args, **kwargs):
+        if kind == "hnsw":
+            builds.append(kind)
+            building.set()
+            proceed.wait(5)
+        return build_index(kind, *args, **kwargs)
+
+    monkeypatch.setattr(ltm, "build_index", slow_build_index)
+    # wide enough that no two of the notes hash their words into the same buckets
+    memory = open_memory(tmp_path, FakeEncoder(1024), index_type="auto", promote_to="hnsw", promote_at=50)
+    memory.add_many([distinct(i) for i in range(49)])
+
+    promoting = threading.Thread(target=memory.add, args=(distinct(49),))
+    promoting.start()
+    assert building.wait(5)
+    # a second writer stores its memory while the HNSW index is being built
+    writing = threading.Thread(target=memory.add, args=(distinct(50),))
+    writing.start()
+    while len(memory.memories) < 51:
+        time.sleep(0.01)
+    proceed.set()
+    promoting.join(5)
+    writing.join(5)
+
+    assert builds == ["hnsw"]  # the second writer did not rebuild again
+    assert index_kind(memory.index) == "hnsw"
+    assert memory.index.ntotal == len(memory.memories) == 51
+    assert memory.search(distinct(50), k=1) == [distinct(50)]
+
+
+def test_add_many_keeps_the_last_wording_of_an_in_batch_duplicate(tmp_path):
+    memory = open_memory(tmp_path)
+    stored = memory.add_many(["I live in Munich", "My sister is called Anna", "i live in MUNICH!"])
+
+    assert stored == ["i live in MUNICH!", "My sister is called Anna"]
+    assert memory.memories == stored and memory.index.ntotal == 2
+
+
+def test_add_many_merges_duplicates_of_stored_memories(tmp_path):
+    memory = open_memory(tmp_path)
+    memory.add("My sister is called Anna")
+
+    assert memory.add_many(["my sister is called anna.", "I live in Munich"]) == ["I live in Munich"]
+    assert memory.memories == ["my sister is called anna.", "I live in Munich"]
+    assert memory.index.ntotal == 2
+    memory.close()
+    assert open_memory(tmp_path).memories == ["my sister is called anna.", "I live in Munich"]
+
+
+def test_a_bulk_insert_promotes_the_index(tmp_path):
+    # wide enough that no two of the notes hash their words into the same buckets
+    memory = open_memory(tmp_path, FakeEncoder(1024), index_type="auto", promote_to="hnsw", promote_at=50)
+    memory.add_many([distinct(i) for i in range(40)])
+    assert index_kind(memory.index) == "flat"
+
+    stored = memory.add_many([distinct(i) for i in range(40, 60)])
+    assert len(stored) == 20
+    assert len(memory.llm.calls) == 3  # memorability judged 25 texts per call
+    assert index_kind(memory.index) == "hnsw"
+    assert memory.index.ntotal == len(memory.memories) == 60
+    assert memory.search(distinct(55), k=1) == [distinct(55)]
+
+
+def test_a_close_rewording_is_merged_into_the_memory(tmp_path):
+    # the two texts share 4 of their 5 words: cosine 0.89
+    memory = open_memory(tmp_path, dedup_threshold=0.85)
+    memory.add("I live in Munich")
+    memory.add("I live in Munich now")
+
+    assert memory.memories == ["I live in Munich now"]
+    assert memory.index.ntotal == 1
+    memory.close()
+    assert open_memory(tmp_path).memories == ["I live in Munich now"]
+
+
+def test_texts_below_the_cosine_threshold_stay_separate(tmp_path):
+    memory = open_memory(tmp_path)
+    memory.add("I live in Munich")
+    memory.add("I live in Munich now")
+    memory.add("I work in Munich")
+
+    assert memory.memories == ["I live in Munich", "I live in Munich now", "I work in Munich"]
+    assert memory.index.ntotal == 3
+
+
+def test_matching_fingerprints_merge_without_the_cosine_check(tmp_path):
+    # a threshold above 1 turns the cosine check off, leaving only SimHash
+    memory = open_memory(tmp_path, dedup_threshold=1.01, text_fingerprints=True)
+    memory.add("I live in Munich.")
+    memory.add("i LIVE in munich")
+    memory.add("I live in Berlin")
+
+    assert memory.memories == ["i LIVE in munich", "I live in Berlin"]
+    memory.close()
+
+    # fingerprints are rebuilt from the log on reopen
+    reopened = open_memory(tmp_path, dedup_threshold=1.01, text_fingerprints=True)
+    reopened.add("I LIVE IN BERLIN!")
+    assert reopened.memories == ["i LIVE in munich", "I LIVE IN BERLIN!"]
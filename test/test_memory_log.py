@@ -0,0 +1,101 @@
+import json
+import faiss
+import numpy as np
+from core.memory.longterm_memory import LongTermMemory
+from core.memory.memory_log import MemoryLog
+from .conftest import FakeEncoder, FakeLLM
+
+DIMENSION = 8
+
+
+def rows(n: int, seed: int = 0):
+    return np.random.default_rng(seed).random((n, DIMENSION), dtype=np.float32)
+
+
+def test_a_torn_tail_is_truncated_on_reopen(tmp_path):
+    log = MemoryLog(tmp_path, DIMENSION)
+    vectors = rows(3)
+    log.append(vectors, ["one", "two", "three"])
+    complete_vectors, complete_texts = log.vectors_path.stat().st_size, log.texts_path.stat().st_size
+
+    # a crash mid-append: a whole vector row and half of the next, but only half of a text record
+    with open(log.vectors_path, "ab") as f:
+        f.write(rows(1, seed=1).tobytes() + b"\x00" * 6)
+    with open(log.texts_path, "ab") as f:
+        f.write(b'{"text": "fo')
+
+    loaded, texts = MemoryLog(tmp_path, DIMENSION).load()
+    assert texts == ["one", "two", "three"]
+    np.testing.assert_array_equal(loaded, vectors)
+    assert log.vectors_path.stat().st_size == complete_vectors
+    assert log.texts_path.stat().st_size == complete_texts
+
+    # the next append lands right after the last complete record
+    log.append(rows(1, seed=2), ["four"])
+    assert MemoryLog(tmp_path, DIMENSION).load()[1] == ["one", "two", "three", "four"]
+
+
+def test_a_record_whose_vector_never_landed_is_dropped(tmp_path):
+    log = MemoryLog(tmp_path, DIMENSION)
+    log.append(rows(2), ["one", "two"])
+    with open(log.texts_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"text": "orphan"}) + "\n")
+
+    loaded, texts = MemoryLog(tmp_path, DIMENSION).load()
+    assert texts == ["one", "two"] and len(loaded) == 2
+
+
+def test_compaction_keeps_the_latest_texts_and_drops_the_snapshot(tmp_path):
+    log = MemoryLog(tmp_path, DIMENSION)
+    vectors = rows(3)
+    log.append(vectors, ["one", "two", "three"])
+    log.snapshot(faiss.IndexFlatIP(DIMENSION))
+    log.update(1, "two, reworded")
+    log.update(1, "two, reworded again")
+    assert MemoryLog(tmp_path, DIMENSION).load()[1] == ["one", "two, reworded again", "three"]
+
+    reopened = MemoryLog(tmp_path, DIMENSION)
+    loaded, texts = reopened.load()
+    assert reopened.superseded == 2
+    reopened.compact(np.array(loaded), texts)
+
+    assert reopened.superseded == 0
+    assert len(reopened.texts_path.read_text(encoding="utf-8").splitlines()) == 3
+    assert not reopened.manifest_path.exists()  # the snapshot described the old log
+    assert reopened.load_snapshot() == (None, 0)
+    loaded, texts = MemoryLog(tmp_path, DIMENSION).load()
+    assert texts == ["one", "two, reworded again", "three"]
+    np.testing.assert_array_equal(loaded, vectors)
+
+
+def write_legacy_store(base_dir, vectors, texts):
+    index = faiss.IndexFlatL2(DIMENSION)
+    index.add(vectors)
+    faiss.write_index(index, str(base_dir / "faiss_index.bin"))
+    with open(base_dir / "memories.json", "w") as f:
+        json.dump(texts, f)
+
+
+def test_a_legacy_store_is_migrated_once(tmp_path):
+    vectors = rows(3)
+    write_legacy_store(tmp_path, vectors, ["one", "two", "three"])
+
+    loaded, texts = MemoryLog(tmp_path, DIMENSION).load()
+    assert texts == ["one", "two", "three"]
+    np.testing.assert_array_equal(loaded, vectors)
+    assert not (tmp_path / "memories.json").exists() and (tmp_path / "memories.json.bak").exists()
+    assert not (tmp_path / "faiss_index.bin").exists() and (tmp_path / "faiss_index.bin.bak").exists()
+
+    # the backups are left alone on the next load
+    assert MemoryLog(tmp_path, DIMENSION).load()[1] == ["one", "two", "three"]
+
+
+def test_long_term_memory_opens_a_legacy_store(tmp_path):
+    encoder = FakeEncoder(DIMENSION)
+    texts = ["I live in Munich", "My sister is called Anna"]
+    write_legacy_store(tmp_path, np.array(encoder.encode(texts), dtype=np.float32), texts)
+
+    memory = LongTermMemory(base_dir=tmp_path, encoder=encoder, llm=FakeLLM("YES"))
+    assert memory.memories == texts
+    assert memory.search("where do I live", k=1) == ["I live in Munich"]
+    memory.close()
@@ -0,0 +1,85 @@
+import threading
+import faiss
+import numpy as np
+import pytest
+from core.memory import shards
+from core.memory.index_factory import build_index, index_kind
+from core.memory.longterm_memory import LongTermMemory, MemoryClosed
+from core.memory.memory_log import MemoryLog
+from .conftest import FakeEncoder, FakeLLM
+
+
+class FakeStore:
+    """Records calls; `gate` holds search() until set."""
+
+    def __init__(self, base_dir=None, **kwargs):
+        self.base_dir = base_dir
+        self.closed = False
+        self.gate = None
+        self.searching = threading.Event()
+
+    def search(self, query, k=3):
+        self.searching.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        assert not self.closed, "searched a closed store"
+        return [query]
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def memory_shards(monkeypatch, tmp_path):
+    monkeypatch.setattr(shards, "LongTermMemory", FakeStore)
+    return shards.MemoryShards(root=tmp_path, max_open=1)
+
+
+def test_eviction_waits_for_the_call_using_the_store(memory_shards):
+    alice = memory_shards.handle("alice")
+    store = memory_shards.get("alice")
+    store.gate = threading.Event()
+    results = []
+    searching = threading.Thread(target=lambda: results.append(alice.search("hello")))
+    searching.start()
+    store.searching.wait(5)
+
+    # opening bob's store evicts alice's, but only closes it once the search is done
+    evicting = threading.Thread(target=memory_shards.get, args=("bob",))
+    evicting.start()
+    evicting.join(0.2)
+    assert evicting.is_alive() and not store.closed
+
+    store.gate.set()
+    searching.join(5)
+    evicting.join(5)
+    assert results == [["hello"]]
+    assert store.closed
+    assert memory_shards.get("alice") is not store  # reopened
+
+
+def test_a_closed_store_rejects_writes(tmp_path):
+    llm = FakeLLM("YES")
+    memory = LongTermMemory(base_dir=tmp_path, encoder=FakeEncoder(), llm=llm)
+    memory.close()
+    for write in (lambda: memory.add("I live in Munich"), lambda: memory.add_async("I live in Munich"),
+                  lambda: memory.add_many(["I live in Munich"])):
+        with pytest.raises(MemoryClosed):
+            write()
+    assert memory._writer is None  # no writer was started for the rejected write
+    assert llm.calls == [] and memory.memories == []
+
+
+def test_ivf_snapshots_are_loaded_writable(tmp_path):
+    dimension, n = 16, 2000
+    vectors = np.random.default_rng(0).random((n, dimension), dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    log = MemoryLog(tmp_path, dimension)
+    log.append(vectors, [f"memory {i}" for i in range(n)])
+    log.snapshot(build_index("ivf", dimension, vectors, metric=faiss.METRIC_INNER_PRODUCT))
+
+    memory = LongTermMemory(base_dir=tmp_path, encoder=FakeEncoder(dimension), llm=FakeLLM("YES"),
+                            index_type="ivf", mmap=True)
+    assert index_kind(memory.index) == "ivf" and len(memory.memories) == n
+    memory.add("a brand new memory")  # fails on memory-mapped inverted lists
+    assert memory.index.ntotal == n + 1
@@ -0,0 +1,44 @@
+import pytest
+from core.orchestrator.router import IntentRouter
+from .conftest import FakeLLM
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("What's the weather like in Munich?", "weather"),
+    ("weather tomorrow", "weather"),
+    ("Forecast for Berlin this weekend", "weather"),
+    ("Will it rain tomorrow?", "weather"),
+    ("Is it going to be sunny on Saturday?", "weather"),
+    ("Do I need an umbrella today?", "weather"),
+    ("What's on my calendar tomorrow?", "calendar"),
+    ("what's on friday", "calendar"),
+    ("Show me my meetings this week", "calendar"),
+    ("Create a meeting with Anna at 3pm", "calendar"),
+    ("Cancel my dentist appointment", "calendar"),
+    ("Do I have any meetings on Monday?", "calendar"),
+    ("Remind me to call mom tomorrow", "calendar"),
+    ("Hello!", "general"),
+    ("thanks", "general"),
+])
+def test_keyword_tier_routes_unambiguous_requests(message, intent):
+    assert IntentRouter._classify_keywords(message) == {"intent": intent, "confidence": 0.9, "tier": "keyword"}
+
+
+@pytest.mark.parametrize("message", [
+    "Explain cloud computing to me",
+    "Write a poem about rain",
+    "I have two degrees in physics",
+    "What events led to World War 1?",
+    "How do I schedule a cron job in Linux?",
+    "Remind me what my name is",
+    "What is the temperature of the sun?",
+    "Weather is a chaotic system, right?",
+    "Am I free to quit my job?",
+])
+def test_topic_words_alone_are_left_to_later_tiers(message):
+    llm = FakeLLM(json_answer={"intent": "general"})
+    router = IntentRouter(llm=llm)
+
+    assert IntentRouter._classify_keywords(message) is None
+    assert router.route(message) == {"intent": "general", "confidence": None, "tier": "llm"}
+    assert len(llm.calls) == 1
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import threading
+import pytest
+from core.server import SERVER_AGENTS, AssistantServer
+from core.utils.llm_interface import set_scheduler
+from core.utils.llm_scheduler import LLMScheduler, SchedulerFull
+
+
+class FakeRouter:
+    def route(self, message):
+        intent = "calendar" if "calendar" in message else "general"
+        return {"intent": intent, "confidence": 1.0, "tier": "test"}
+
+
+class FakeAgent:
+    def __init__(self, reply=None, error=None, gate=None):
+        self.reply, self.error, self.gate = reply, error, gate
+        self.started = threading.Event()
+
+    def run(self, message):
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.reply
+
+
+class FakeRegistry:
+    specs = SERVER_AGENTS
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    def get(self, intent):
+        return self.agent
+
+    def close(self):
+        pass
+
+
+class FakeMemories:
+    def stats(self):
+        return {}
+
+
+@pytest.fixture(autouse=True)
+def no_scheduler():
+    yield
+    set_scheduler(None)  # the server installs its scheduler process-wide
+
+
+def server_with(agent, max_active: int = 4) -> AssistantServer:
+    return AssistantServer(llm_concurrency=1, llm_queue=max_active - 1, router=FakeRouter(),
+                           memories=FakeMemories(), make_registry=lambda user_id: FakeRegistry(agent))
+
+
+async def post(port: int, body: bytes):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"POST /chat HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+    await writer.drain()
+    response = await asyncio.wait_for(reader.read(), 10)
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload) if payload else None
+
+
+def chat(session: str, user: str = None, message: str = "hello") -> bytes:
+    return json.dumps({"session": session, "user": user, "message": message, "stream": False}).encode()
+
+
+def serving(server, scenario):
+    async def main():
+        listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        try:
+            return await scenario(listener.sockets[0].getsockname()[1])
+        finally:
+            listener.close()
+            server.executor.shutdown(wait=False)
+    return asyncio.run(main())
+
+
+def test_a_body_that_is_not_an_object_is_a_bad_request():
+    async def scenario(port):
+        return [await post(port, body) for body in (b"[1, 2]", b'"hi"', b"null", b"{")]
+
+    responses = serving(server_with(FakeAgent("unused")), scenario)
+    assert [status for status, _ in responses] == [400, 400, 400, 400]
+    assert responses[0][1] == {"error": "the body must be a JSON object"}
+
+
+def test_an_agent_error_is_a_server_error():
+    async def scenario(port):
+        return await post(port, chat("s1"))
+
+    status, payload = serving(server_with(FakeAgent(error=RuntimeError("backend exploded"))), scenario)
+    assert (status, payload) == (500, {"error": "backend exploded"})
+
+
+def test_messages_beyond_the_limit_are_rejected():
+    gate = threading.Event()
+    agent = FakeAgent("done", gate=gate)
+
+    async def scenario(port):
+        first = asyncio.create_task(post(port, chat("s1")))
+        second = asyncio.create_task(post(port, chat("s2")))
+        await asyncio.get_running_loop().run_in_executor(None, agent.started.wait, 5)
+        while server.active < 2:
+            await asyncio.sleep(0.01)
+        rejected = await post(port, chat("s3"))
+        gate.set()
+        return rejected, await first, await second
+
+    server = server_with(agent, max_active=2)
+    rejected, first, second = serving(server, scenario)
+    assert rejected[0] == 503
+    assert first == (200, {"session": "s1", "intent": "general", "reply": "done"})
+    assert second == (200, {"session": "s2", "intent": "general", "reply": "done"})
+    assert server.active == 0
+
+
+def test_background_requests_wait_behind_user_requests_instead_of_failing():
+    scheduler = LLMScheduler(max_concurrent=1, max_queue=1, queue_timeout=5)
+    order = []
+    running = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with scheduler.slot():
+            running.set()
+            release.wait(5)
+
+    def request(name, background=False):
+        with scheduler.slot(background=background):
+            order.append(name)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    running.wait(5)
+    summary = threading.Thread(target=request, args=("summary", True))
+    summary.start()
+    while scheduler.stats()["background"] < 1:
+        threading.Event().wait(0.01)
+    user = threading.Thread(target=request, args=("user",))
+    user.start()
+    while scheduler.stats()["queued"] < 1:
+        threading.Event().wait(0.01)
+
+    # the queue is full for users, but background work still gets in line
+    with pytest.raises(SchedulerFull):
+        with scheduler.slot():
+            pass
+    late = threading.Thread(target=request, args=("memory write", True))
+    late.start()
+    while scheduler.stats()["background"] < 2:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in (holder, summary, user, late):
+        thread.join(5)
+    assert order == ["user", "summary", "memory write"]
+    assert scheduler.stats()["rejected"] == 1
+
+
+def test_a_session_only_answers_for_its_user():
+    async def scenario(port):
+        return [await post(port, chat("s1", "alice")), await post(port, chat("s1", "mallory")),
+                await post(port, chat("s1"))]
+
+    alice, mallory, anonymous = serving(server_with(FakeAgent("hi alice")), scenario)
+    assert alice == (200, {"session": "s1", "intent": "general", "reply": "hi alice"})
+    assert mallory == anonymous == (403, {"error": "this session belongs to another user"})
+
+
+def test_the_calendar_is_not_served():
+    agent = FakeAgent(error=AssertionError("the calendar agent must not run"))
+
+    async def scenario(port):
+        return await post(port, chat("s1", message="delete everything in my calendar"))
+
+    status, payload = serving(server_with(agent), scenario)
+    assert status == 200 and payload["intent"] == "calendar"
+    assert "only available in the local assistant" in payload["reply"]
+    assert "calendar" not in SERVER_AGENTS
@@ -0,0 +1,95 @@
+import threading
+import time
+import pytest
+from core.agents.weather.fetcher import WeatherClient
+
+
+class OpenMeteo:
+    """Stub Open-Meteo answering with a version number that changes on demand."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.version = 1
+        self.status = 200
+
+    def __call__(self, method, path, params, payload):
+        time.sleep(self.delay)
+        if self.status != 200:
+            return self.status, {"error": True}
+        latitudes = params["latitude"].split(",")
+        answers = [{"latitude": float(lat), "version": self.version} for lat in latitudes]
+        return 200, answers if len(answers) > 1 else answers[0]
+
+
+@pytest.fixture
+def meteo(stub_server):
+    api = OpenMeteo()
+    server = stub_server(api)
+    client = WeatherClient(base_url=server.url + "/v1/forecast", retries=0)
+    return api, server, client
+
+
+def expire(client):
+    for key, (_, data) in list(client._cache.items()):
+        client._cache[key] = (time.time() - 1, data)
+
+
+def test_repeated_request_is_served_from_cache(meteo):
+    api, server, client = meteo
+
+    first = client.get_weather(48.137, 11.576, forecast_days=2)
+    assert client.get_weather(48.139, 11.579, forecast_days=2) == first  # rounds to the same cell
+    assert len(server.requests) == 1
+    client.get_weather(48.137, 11.576, forecast_days=3)
+    assert len(server.requests) == 2  # different request, different entry
+
+
+def test_concurrent_requests_share_one_call(meteo):
+    api, server, client = meteo
+    api.delay = 0.3
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.get_weather(52.52, 13.4)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(server.requests) == 1
+    assert len(results) == 5 and all(r == results[0] for r in results)
+
+
+def test_expired_entry_is_served_while_refreshing(meteo):
+    api, server, client = meteo
+    client.get_weather(40.4, -3.7)
+    expire(client)
+    api.version = 2
+
+    assert client.get_weather(40.4, -3.7)["version"] == 1  # stale answer, immediately
+    deadline = time.time() + 5
+    while client.get_weather(40.4, -3.7)["version"] != 2:
+        assert time.time() < deadline, "background refresh did not land"
+        time.sleep(0.05)
+    assert len(server.requests) == 2
+
+
+def test_falls_back_to_last_answer_on_errors(meteo):
+    api, server, client = meteo
+    assert client.get_weather(51.5, -0.1, forecast_days=1)["version"] == 1
+
+    client.stale_grace = 0  # too old to serve while refreshing: a fresh fetch is needed
+    expire(client)
+    api.status = 500
+    assert client.get_weather(51.5, -0.1, forecast_days=1)["version"] == 1
+    assert client.get_weather(0.0, 0.0, forecast_days=1) == {}  # nothing to fall back to
+
+
+def test_many_locations_in_one_request(meteo):
+    api, server, client = meteo
+    client.get_weather(48.14, 11.58)
+
+    results = client.get_weather_many([(52.52, 13.4), (48.14, 11.58), (53.55, 9.99)])
+    assert [r["latitude"] for r in results] == [52.52, 48.14, 53.55]
+    assert len(server.requests) == 2  # only the two uncached cities, together
+    assert server.requests[-1][2]["latitude"] == "52.52,53.55"
@@ -0,0 +1,39 @@
+import json
+import re
+from benchmarks.bench_weather_payload import load_fixture, planned_payload
+from core.agents.weather.agent import SUMMARY_DAILY_FIELDS, SUMMARY_HOURLY_FIELDS, WeatherAgent, plan_forecast_request
+from core.agents.weather.frame import WeatherFrame
+
+
+def payload(days: int = 3, current_hour: int = 0) -> dict:
+    data = planned_payload(load_fixture(), days, SUMMARY_HOURLY_FIELDS, SUMMARY_DAILY_FIELDS)
+    data["current_weather"]["time"] = data["hourly"]["time"][current_hour]
+    return data
+
+
+def test_summary_numbers_keep_the_api_precision():
+    summary = WeatherAgent.preprocess_weather_data(payload(), window=(0, 3))
+    text = json.dumps(summary)
+
+    assert not re.search(r"\d\.\d{2,}", text)  # no float32 noise like 28.600000381469727
+    data = payload()
+    assert summary["today"]["t_min"] == data["daily"]["temperature_2m_min"][0]
+
+
+def test_compare_locations_rounds_too():
+    frames = [WeatherFrame(payload()), WeatherFrame(load_fixture())]
+    assert not re.search(r"\d\.\d{2,}", json.dumps(WeatherAgent.compare_locations(["A", "B"], frames)))
+
+
+def test_same_day_questions_fetch_tomorrow_for_the_next_24_hours():
+    plan = plan_forecast_request("Will it rain tonight?")
+    assert plan["forecast_days"] == 2
+
+    late = WeatherFrame(payload(plan["forecast_days"], current_hour=22))
+    assert late.current_hour_index() == 22
+    assert late.hour_slice(late.current_hour_index(), 24) == slice(22, 46)  # a full day of hours
+
+
+def test_forecast_days_cover_the_requested_period():
+    assert plan_forecast_request("weather in the next 5 days")["forecast_days"] == 5
+    assert plan_forecast_request("weather tomorrow")["forecast_days"] == 2
@@ -0,0 +1,51 @@
+from core.agents.weather import agent as weather_agent
+from core.agents.weather.agent import WeatherAgent
+from .conftest import FakeLLM
+
+
+VALENCIA_VENEZUELA = {"city": "Valencia", "lat": 10.16, "lon": -68.0}
+
+
+def prompts(llm):
+    return [FakeLLM.text(call) for call in llm.calls]
+
+
+def test_homonyms_are_resolved_with_the_whole_question():
+    llm = FakeLLM(json_answer=VALENCIA_VENEZUELA)
+    agent = WeatherAgent(llm=llm)
+
+    places = agent.extract_places("Compare the weather in Valencia, Venezuela and Munich")
+    assert [p[0] for p in places] == ["Valencia", "Munich"]
+    assert "Compare the weather in Valencia, Venezuela and Munich" in prompts(llm)[0]
+    assert '"Valencia"' in prompts(llm)[0].splitlines()[-1]
+
+
+def test_homonym_guesses_are_not_reused_for_other_questions():
+    llm = FakeLLM(json_answer=VALENCIA_VENEZUELA)
+    agent = WeatherAgent(llm=llm)
+
+    agent.extract_places("weather in Valencia, Venezuela and Munich")
+    agent.extract_city_and_coords("weather in Valencia, Spain")
+    assert len(llm.calls) == 2
+    assert prompts(llm)[1] == 'Question: "weather in Valencia, Spain"'
+    assert "valencia" not in agent.known_places
+
+
+def test_a_single_homonym_costs_one_llm_call(monkeypatch):
+    fetched = []
+    monkeypatch.setattr(weather_agent, "get_weather", lambda lat, lon, **kwargs: fetched.append((lat, lon)) or {})
+    llm = FakeLLM(json_answer=VALENCIA_VENEZUELA)
+    agent = WeatherAgent(llm=llm)
+    agent.summarize_weather = lambda city, query, data: f"weather for {city}"
+
+    assert agent.run("Is it raining in Valencia, Venezuela?") == "weather for Valencia"
+    assert len(llm.calls) == 1
+    assert fetched == [(10.16, -68.0)]
+
+
+def test_a_place_the_llm_cannot_locate_is_not_asked_twice():
+    llm = FakeLLM(json_answer={"city": None, "lat": None, "lon": None})
+    agent = WeatherAgent(llm=llm)
+
+    assert agent.run("Is it raining in Valencia?") == "Please specify a city first."
+    assert len(llm.calls) == 1